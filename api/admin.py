@@ -0,0 +1,188 @@
+"""
+Admin routes for runtime diagnostics (profiling, memory, logging) and webhook subscribers
+"""
+import secrets
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, field_validator
+
+from config import settings, GAME_TYPES
+from database import (
+    create_webhook_subscriber, delete_webhook_subscriber, list_webhook_subscribers, update_webhook_subscriber
+)
+from services.logs import rate_limiter
+from services.memory import memory_monitor
+from services.profiler import profiler
+from services.webhooks import webhook_dispatcher
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject requests without the configured admin token"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profiler")
+async def get_profiler_status():
+    """Get profiler configuration and sample counts"""
+    return profiler.status()
+
+@router.post("/profiler/start")
+async def start_profiler(
+    request_sample_rate: Optional[float] = Query(None, ge=0.0, le=1.0, description="Fraction of API requests to profile"),
+    crawl_cycles: Optional[int] = Query(None, ge=0, description="Number of upcoming crawl cycles to profile"),
+    interval_ms: Optional[float] = Query(None, ge=1.0, le=1000.0, description="Sampling interval in milliseconds")
+):
+    """Enable profiling for sampled requests and/or crawl cycles; parameters left out keep their setting"""
+    if request_sample_rate is None and crawl_cycles is None:
+        raise HTTPException(status_code=400, detail="Set request_sample_rate and/or crawl_cycles")
+    profiler.configure(
+        request_sample_rate=request_sample_rate,
+        crawl_cycles=crawl_cycles,
+        interval=interval_ms / 1000 if interval_ms is not None else None
+    )
+    return profiler.status()
+
+@router.post("/profiler/stop")
+async def stop_profiler():
+    """Stop selecting new work for profiling; collected samples are kept"""
+    profiler.disable()
+    return profiler.status()
+
+@router.get("/profiler/flamegraph", response_class=PlainTextResponse)
+async def get_flamegraph(scope: Optional[str] = Query(None, description="Only stacks rooted at this scope")):
+    """Folded stacks for flamegraph.pl / speedscope"""
+    return PlainTextResponse(profiler.folded(scope))
+
+@router.delete("/profiler/samples")
+async def reset_profiler_samples():
+    """Discard collected samples"""
+    profiler.reset()
+    return profiler.status()
+
+@router.get("/memory")
+async def get_memory_status(recent: int = Query(20, ge=0, le=1000, description="Per-cycle samples to include")):
+    """RSS of this worker and its browser processes, per-cycle history and tracemalloc state"""
+    return memory_monitor.status(recent)
+
+@router.post("/memory/tracemalloc/start")
+async def start_tracemalloc(frames: int = Query(1, ge=1, le=50, description="Stack frames stored per allocation")):
+    """Start tracing allocations and take the baseline snapshot diffs are taken against"""
+    memory_monitor.start_tracing(frames)
+    return memory_monitor.status(0)
+
+@router.post("/memory/tracemalloc/stop")
+async def stop_tracemalloc():
+    """Stop tracing and discard the baseline"""
+    memory_monitor.stop_tracing()
+    return memory_monitor.status(0)
+
+@router.post("/memory/snapshot")
+async def take_memory_snapshot():
+    """Replace the baseline snapshot with the current heap"""
+    try:
+        memory_monitor.take_baseline()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return memory_monitor.status(0)
+
+@router.get("/memory/diff")
+async def get_memory_diff(
+    limit: int = Query(20, ge=1, le=500, description="Allocation sites to return"),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="Group allocations by")
+):
+    """Allocation sites that grew most since the baseline snapshot"""
+    try:
+        return {"key_type": key_type, "sites": memory_monitor.diff(limit, key_type)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/memory/top")
+async def get_top_allocations(
+    limit: int = Query(20, ge=1, le=500, description="Allocation sites to return"),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="Group allocations by")
+):
+    """Largest live allocation sites"""
+    try:
+        return {"key_type": key_type, "sites": memory_monitor.top(limit, key_type)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/logging")
+async def get_logging_status(limit: int = Query(20, ge=1, le=500, description="Call sites to return")):
+    """Log rate limit settings and the call sites with the most suppressed records"""
+    return rate_limiter.status(limit)
+
+class WebhookSubscriberUpdate(BaseModel):
+    """Fields of a webhook subscriber (all optional when updating)"""
+    url: Optional[str] = Field(None, pattern=r"^https?://", max_length=500)
+    secret: Optional[str] = Field(None, max_length=255, description="HMAC signing key (default: WEBHOOK_SECRET)")
+    game_types: Optional[List[str]] = Field(None, description="Games to deliver; empty = every game")
+    description: Optional[str] = Field(None, max_length=255)
+    active: Optional[bool] = None
+
+    @field_validator("game_types")
+    @classmethod
+    def known_game_types(cls, game_types):
+        unknown = sorted(set(game_types or ()) - set(GAME_TYPES))
+        if unknown:
+            raise ValueError(f"Unknown game types: {', '.join(unknown)}")
+        return game_types
+
+class WebhookSubscriberCreate(WebhookSubscriberUpdate):
+    url: str = Field(..., pattern=r"^https?://", max_length=500)
+    active: bool = True
+
+def _with_delivery_state(subscriber) -> dict:
+    data = subscriber.to_dict()
+    # Delivery state lives in the process that saves results (the crawler leader)
+    data["delivery"] = webhook_dispatcher.subscriber_status(subscriber.id)
+    return data
+
+@router.get("/webhooks")
+async def get_webhook_subscribers():
+    """Registered subscribers, with queue/retry state when deliveries run in this process"""
+    subscribers = await list_webhook_subscribers()
+    return {
+        "dispatcher": webhook_dispatcher.status(),
+        "subscribers": [_with_delivery_state(subscriber) for subscriber in subscribers],
+    }
+
+@router.post("/webhooks", status_code=201)
+async def add_webhook_subscriber(subscriber: WebhookSubscriberCreate):
+    """Register a subscriber for new-result webhooks"""
+    try:
+        created = await create_webhook_subscriber(**subscriber.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    webhook_dispatcher.invalidate()
+    return created.to_dict()
+
+@router.patch("/webhooks/{subscriber_id}")
+async def change_webhook_subscriber(subscriber_id: int, changes: WebhookSubscriberUpdate):
+    """Change a subscriber's URL, secret, games, description or active flag"""
+    try:
+        fields = changes.model_dump(exclude_unset=True)
+        # url and active cannot be cleared; null for secret/description/game_types resets them
+        fields = {name: value for name, value in fields.items() if value is not None or name not in ("url", "active")}
+        updated = await update_webhook_subscriber(subscriber_id, **fields)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    webhook_dispatcher.invalidate()
+    return _with_delivery_state(updated)
+
+@router.delete("/webhooks/{subscriber_id}")
+async def remove_webhook_subscriber(subscriber_id: int):
+    """Unregister a subscriber (events still queued for it are discarded)"""
+    if not await delete_webhook_subscriber(subscriber_id):
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    webhook_dispatcher.invalidate()
+    return {"deleted": subscriber_id}
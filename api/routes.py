@@ -3,28 +3,68 @@ API routes for 68GB Game data
 """
 from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
+import re
 import time
 
-from database import get_db, get_latest_results, GameResult, APILog
+from database import (
+    get_db, get_latest_results, get_latest_results_batch, get_result_timeseries, get_api_timeseries,
+    count_api_requests_since, find_results_by_md5, find_results_by_session, GameResult, APILog
+)
 from config import settings, GAME_TYPES
+from services.bloom import known_md5s
+from services.freshness import freshness_tracker
+from services.latency import latency_tracker, WINDOWS
+from services.metrics import metrics
 from services.notification_service import NotificationService
+from services.profiler import profiler
+from services.result_listener import result_listener
+from services.snapshot import read_latest_results
+from services.workers import loads_many, worker_pool
 
 router = APIRouter()
 
-# Global instances
-notification_service = NotificationService()
+# Global instances (created on first use to keep import cheap)
+notification_service: Optional[NotificationService] = None
+
+def get_notification_service() -> NotificationService:
+    """Return the shared notification service, creating it on first use"""
+    global notification_service
+    if notification_service is None:
+        notification_service = NotificationService()
+    return notification_service
+
+API_REQUEST_SECONDS = metrics.histogram(
+    "api_request_duration_seconds", "API request latency by route template", ["method", "route"]
+)
+API_REQUESTS_TOTAL = metrics.counter(
+    "api_requests_total", "API requests by route template and status", ["method", "route", "status"]
+)
 
-@router.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all API requests"""
+    """Log all API requests (registered as app-level HTTP middleware in main.py)"""
     start_time = time.time()
     
-    response = await call_next(request)
+    if profiler.request_sample_rate and profiler.should_profile_request():
+        with profiler.profile(f"request:{request.url.path}"):
+            response = await call_next(request)
+    else:
+        response = await call_next(request)
     
     process_time = time.time() - start_time
     
+    # Label by route template rather than raw path to keep cardinality bounded
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    API_REQUEST_SECONDS.labels(request.method, route_path).observe(process_time)
+    API_REQUESTS_TOTAL.labels(request.method, route_path, response.status_code).inc()
+    latency_tracker.observe(route_path, response.status_code, process_time)
+    
+    if not request.url.path.startswith(settings.API_PREFIX):
+        return response
+    
     # Log the request (async, don't wait)
     try:
         from database import log_api_request
@@ -34,13 +74,20 @@ async def log_requests(request: Request, call_next):
             ip_address=request.client.host if request.client else "unknown",
             user_agent=request.headers.get("user-agent", ""),
             response_status=response.status_code,
-            response_time=process_time
+            response_time=process_time,
+            route=route_path
         )
     except Exception:
         pass  # Don't fail the request if logging fails
     
     return response
 
+async def _results_to_dicts(results) -> List[Dict]:
+    """to_dict() of stored rows; the result_data of large pages is decoded in a worker process"""
+    texts = [result.result_data for result in results]
+    decoded = await worker_pool.run_in_process(loads_many, texts, size=sum(len(text) for text in texts if text))
+    return [result.to_dict(result_data) for result, result_data in zip(results, decoded)]
+
 @router.get("/games")
 async def get_supported_games():
     """Get list of supported games"""
@@ -79,32 +126,22 @@ async def get_latest_game_result(game_type: str, limit: int = Query(1, ge=1, le=
         raise HTTPException(status_code=404, detail="Game type not found")
     
     try:
-        results = await get_latest_results(game_type=game_type, limit=limit)
+        # Served from NOTIFY-fed memory or the crawler's shared-memory snapshot when they cover the request
+        formatted_results = result_listener.read(game_type, limit)
+        if formatted_results is None:
+            formatted_results = read_latest_results(game_type, limit)
+        if formatted_results is None:
+            results = await get_latest_results(game_type=game_type, limit=limit)
+            formatted_results = await _results_to_dicts(results)
+        freshness_tracker.served(formatted_results)
         
-        if not results:
+        if not formatted_results:
             return {
                 "game_type": game_type,
                 "results": [],
                 "message": "No results found"
             }
         
-        formatted_results = []
-        for result in results:
-            try:
-                import json
-                result_data = json.loads(result.result_data) if result.result_data else {}
-            except:
-                result_data = {}
-            
-            formatted_results.append({
-                "id": result.id,
-                "game_type": result.game_type,
-                "session_id": result.session_id,
-                "result_md5": result.result_md5,
-                "result_data": result_data,
-                "timestamp": result.timestamp.isoformat() if result.timestamp else None
-            })
-        
         return {
             "game_type": game_type,
             "results": formatted_results,
@@ -130,24 +167,9 @@ async def get_game_history(
         # For now, use the simple get_latest_results function
         # In a real implementation, you'd add date filtering to the database query
         results = await get_latest_results(game_type=game_type, limit=limit)
+        formatted_results = await _results_to_dicts(results[offset:])
         
-        formatted_results = []
-        for result in results[offset:]:
-            try:
-                import json
-                result_data = json.loads(result.result_data) if result.result_data else {}
-            except:
-                result_data = {}
-            
-            formatted_results.append({
-                "id": result.id,
-                "game_type": result.game_type,
-                "session_id": result.session_id,
-                "result_md5": result.result_md5,
-                "result_data": result_data,
-                "timestamp": result.timestamp.isoformat() if result.timestamp else None
-            })
-        
+        freshness_tracker.served(formatted_results)
         return {
             "game_type": game_type,
             "results": formatted_results,
@@ -159,6 +181,58 @@ async def get_game_history(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
 
+class BatchQuery(BaseModel):
+    """One latest/history query inside a batch request"""
+    game_type: str
+    limit: int = Field(1, ge=1, le=1000)
+    # Rows are read from the newest on, so a deep offset costs as much as returning every row before it
+    offset: int = Field(0, ge=0, le=1000)
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=20)
+
+@router.post("/games/batch")
+async def get_games_batch(batch: BatchRequest):
+    """Latest/history results for several games in one request"""
+    unknown = sorted({query.game_type for query in batch.queries} - set(GAME_TYPES))
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Game type not found: {', '.join(unknown)}")
+    
+    try:
+        # Rows needed per game to answer every query for it
+        rows_needed: Dict[str, int] = {}
+        for query in batch.queries:
+            rows_needed[query.game_type] = max(rows_needed.get(query.game_type, 0), query.offset + query.limit)
+        
+        # Memory first; whatever it cannot cover goes to the DB in a single query
+        rows: Dict[str, List[Dict]] = {}
+        for game_type, needed in rows_needed.items():
+            cached = result_listener.read(game_type, needed)
+            if cached is None:
+                cached = read_latest_results(game_type, needed)
+            if cached is not None:
+                rows[game_type] = cached
+        missing = {game_type: needed for game_type, needed in rows_needed.items() if game_type not in rows}
+        for game_type, results in (await get_latest_results_batch(missing)).items():
+            rows[game_type] = await _results_to_dicts(results)
+        
+        answers = []
+        for query in batch.queries:
+            results = rows[query.game_type][query.offset:query.offset + query.limit]
+            freshness_tracker.served(results)
+            answers.append({
+                "game_type": query.game_type,
+                "results": results,
+                "count": len(results),
+                "offset": query.offset,
+                "limit": query.limit
+            })
+        
+        return {"results": answers, "count": len(answers)}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving batch: {str(e)}")
+
 @router.get("/games/{game_type}/current")
 async def get_current_game_result(game_type: str):
     """Get current/live result for a specific game (triggers fresh crawl)"""
@@ -166,11 +240,13 @@ async def get_current_game_result(game_type: str):
         raise HTTPException(status_code=404, detail="Game type not found")
     
     try:
-        # Import here to avoid circular imports
-        from crawler.game_crawler import GameCrawler
-        
-        crawler = GameCrawler()
-        current_result = await crawler._crawl_game(game_type)
+        current_result = None
+        if settings.CRAWLER_ENABLED:
+            # Import here to avoid circular imports and to keep API-only replicas light
+            from crawler.game_crawler import GameCrawler
+            
+            crawler = GameCrawler()
+            current_result = await crawler._crawl_game(game_type)
         
         if not current_result:
             # Fallback to latest from database
@@ -208,6 +284,67 @@ async def get_current_game_result(game_type: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting current result: {str(e)}")
 
+MD5_LOOKUP = re.compile(r"^[0-9a-f]{4,32}$")
+
+@router.get("/results/by-md5/{md5}")
+async def get_results_by_md5(
+    md5: str,
+    game_type: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Results by full MD5, or by MD5 prefix (at least 4 hex characters)"""
+    md5 = md5.lower()
+    if not MD5_LOOKUP.match(md5):
+        raise HTTPException(status_code=422, detail="md5 must be 4-32 hexadecimal characters")
+    if game_type and game_type not in GAME_TYPES:
+        raise HTTPException(status_code=404, detail="Game type not found")
+    
+    exact = len(md5) == 32
+    # A full MD5 the Bloom filter has never seen is definitely not stored: answer without a query
+    if exact and not await known_md5s.might_contain(md5):
+        raise HTTPException(status_code=404, detail="No results with this MD5")
+    
+    try:
+        results = await find_results_by_md5(md5, game_type=game_type, limit=limit, prefix=not exact)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving results: {str(e)}")
+    
+    if not results:
+        if exact and not game_type:
+            known_md5s.false_positive()
+        raise HTTPException(status_code=404, detail="No results with this MD5")
+    
+    return {
+        "md5": md5,
+        "match": "exact" if exact else "prefix",
+        "results": await _results_to_dicts(results),
+        "count": len(results)
+    }
+
+@router.get("/results/by-session/{session_id}")
+async def get_results_by_session(
+    session_id: str,
+    game_type: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Results recorded under a session id, newest first"""
+    if game_type and game_type not in GAME_TYPES:
+        raise HTTPException(status_code=404, detail="Game type not found")
+    
+    try:
+        results = await find_results_by_session(session_id, game_type=game_type, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving results: {str(e)}")
+    
+    if not results:
+        raise HTTPException(status_code=404, detail="No results for this session")
+    
+    return {
+        "session_id": session_id,
+        "results": await _results_to_dicts(results),
+        "count": len(results)
+    }
+
 @router.get("/stats")
 async def get_api_stats():
     """Get API usage statistics"""
@@ -231,11 +368,8 @@ async def get_api_stats():
                 ).scalar() or 0
                 game_counts[game_type] = count
             
-            # API usage stats (last 24 hours)
-            yesterday = datetime.now() - timedelta(days=1)
-            api_calls_24h = db.query(func.count(APILog.id)).filter(
-                APILog.timestamp >= yesterday
-            ).scalar() or 0
+            # API usage stats (last 24 hours, from the hourly rollups)
+            api_calls_24h = await count_api_requests_since(datetime.utcnow() - timedelta(days=1))
             
             return {
                 "total_game_results": total_results,
@@ -254,11 +388,63 @@ async def get_api_stats():
             "server_time": datetime.now().isoformat()
         }
 
+@router.get("/stats/results/timeseries")
+async def get_results_timeseries(
+    resolution: str = Query("minute", pattern="^(minute|hour)$"),
+    game_type: Optional[str] = Query(None),
+    from_time: Optional[datetime] = Query(None, description="ISO 8601, UTC (default: `buckets` buckets back)"),
+    to_time: Optional[datetime] = Query(None, description="ISO 8601, UTC (default: now)"),
+    buckets: int = Query(60, ge=1, le=10080, description="Window size when from_time is omitted")
+):
+    """Results stored per minute/hour bucket, served from the rollup table"""
+    if game_type and game_type not in GAME_TYPES:
+        raise HTTPException(status_code=404, detail="Game type not found")
+    
+    points = await get_result_timeseries(resolution, from_time, to_time, game_type, buckets)
+    return {"resolution": resolution, "game_type": game_type, "points": points, "count": len(points)}
+
+@router.get("/stats/api/timeseries")
+async def get_api_traffic_timeseries(
+    resolution: str = Query("minute", pattern="^(minute|hour)$"),
+    route: Optional[str] = Query(None, description="Route template, e.g. /api/v1/games/{game_type}/latest"),
+    method: Optional[str] = Query(None),
+    from_time: Optional[datetime] = Query(None, description="ISO 8601, UTC (default: `buckets` buckets back)"),
+    to_time: Optional[datetime] = Query(None, description="ISO 8601, UTC (default: now)"),
+    buckets: int = Query(60, ge=1, le=10080, description="Window size when from_time is omitted")
+):
+    """API requests and latency per minute/hour bucket, route and status class, served from the rollup table"""
+    points = await get_api_timeseries(resolution, from_time, to_time, route, method, buckets)
+    return {"resolution": resolution, "route": route, "method": method, "points": points, "count": len(points)}
+
+@router.get("/stats/latency")
+async def get_latency_quantiles(
+    window: str = Query("5m", pattern=f"^({'|'.join(WINDOWS)})$"),
+    route: Optional[str] = Query(None, description="Route template, e.g. /api/v1/games/{game_type}/latest"),
+    scope: str = Query("cluster", pattern="^(cluster|worker)$",
+                       description="cluster merges every worker's last checkpoint; worker is this process only")
+):
+    """p50/p95/p99 latency per route and status class over a sliding window"""
+    return latency_tracker.summary(window, route, scope)
+
+@router.get("/stats/freshness")
+async def get_result_freshness(
+    window: str = Query("15m", pattern=f"^({'|'.join(WINDOWS)})$"),
+    game_type: Optional[str] = Query(None)
+):
+    """Lag of each pipeline stage behind the upstream timestamp (and behind the previous stage), per game"""
+    if game_type and game_type not in GAME_TYPES:
+        raise HTTPException(status_code=404, detail="Game type not found")
+    
+    summary = await freshness_tracker.summary(window, WINDOWS[window])
+    if game_type:
+        summary = {**summary, "games": {key: value for key, value in summary["games"].items() if key == game_type}}
+    return summary
+
 @router.post("/test-notification")
 async def test_notification():
     """Test notification system"""
     try:
-        await notification_service.send_test_notification()
+        await get_notification_service().send_test_notification()
         return {"message": "Test notification sent successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send test notification: {str(e)}")
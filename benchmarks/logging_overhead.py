@@ -0,0 +1,123 @@
+"""
+Logging overhead: per-call cost and event-loop stalls per sink setup
+
+Measures the caller-side cost of one log call with a synchronous file
+sink, an enqueued text sink, an enqueued JSON sink and for records the
+per-call-site rate limit drops, then the event-loop lag while a coroutine
+logs steadily to a sink that takes `--disk-ms` per write (a slow disk),
+synchronously vs enqueued:
+
+    python -m benchmarks.logging_overhead --calls 20000 --disk-ms 5 --output logging.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+
+class SlowFile:
+    """File-like sink whose every write blocks for `delay` seconds"""
+
+    def __init__(self, path: str, delay: float):
+        self.file = open(path, "a")
+        self.delay = delay
+
+    def write(self, message: str):
+        time.sleep(self.delay)
+        self.file.write(message)
+
+    def flush(self):
+        self.file.flush()
+
+
+def per_call_us(calls: int) -> float:
+    from loguru import logger
+
+    start = time.perf_counter()
+    for number in range(calls):
+        logger.warning(f"Method cloudscraper failed for tai_xiu: HTTP 503 ({number})")
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def setup(sink, enqueue: bool, json_lines: bool, burst: int):
+    from loguru import logger
+    from services import logs
+
+    logs.rate_limiter.burst = burst
+    logs.rate_limiter.sites.clear()
+    logger.remove()
+    logger.configure(patcher=logs.rate_limiter)
+    return logger.add(sink, level="INFO", enqueue=enqueue, filter=logs._keep,
+                      format=logs._json_format if json_lines else logs._text_format)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)] if ordered else 0.0
+
+
+async def loop_lag(seconds: float, rate: float) -> Dict[str, float]:
+    """Lag of a 5 ms ticker while another task logs `rate` records per second"""
+    from loguru import logger
+
+    lags: List[float] = []
+    stop = time.perf_counter() + seconds
+
+    async def ticker():
+        while time.perf_counter() < stop:
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    async def producer():
+        number = 0
+        while time.perf_counter() < stop:
+            logger.warning(f"Endpoint /api/tai-xiu failed: timeout ({number})")
+            number += 1
+            await asyncio.sleep(1 / rate)
+
+    await asyncio.gather(ticker(), producer())
+    return {"p50_ms": percentile(lags, 0.5) * 1000, "p99_ms": percentile(lags, 0.99) * 1000,
+            "max_ms": max(lags) * 1000 if lags else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000, help="Log calls per per-call measurement")
+    parser.add_argument("--disk-ms", type=float, default=5.0, help="Milliseconds per write of the slow sink")
+    parser.add_argument("--rate", type=float, default=100.0, help="Records per second in the lag test")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each lag test")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    from loguru import logger
+
+    report: Dict = {"calls": args.calls, "per_call_us": {}, "loop_lag": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.log")
+        for name, enqueue, json_lines in (("sync_text", False, False), ("enqueued_text", True, False),
+                                          ("enqueued_json", True, True)):
+            setup(path, enqueue, json_lines, burst=0)
+            report["per_call_us"][name] = per_call_us(args.calls)
+            logger.remove()  # Waits for the queue to drain
+        # Everything past the first record of the window is dropped by the rate limit
+        setup(path, True, True, burst=1)
+        report["per_call_us"]["rate_limited"] = per_call_us(args.calls)
+        logger.remove()
+
+        for name, enqueue in (("sync_slow_disk", False), ("enqueued_slow_disk", True)):
+            setup(SlowFile(path, args.disk_ms / 1000), enqueue, True, burst=0)
+            report["loop_lag"][name] = asyncio.run(loop_lag(args.seconds, args.rate))
+            logger.remove()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Performance regression suite for the hot paths, against a seeded database
+
+Seeds a throwaway SQLite database with `--rows` crawler-shaped results
+(payloads compressed as in production, see services/payloads.py), then
+times each case in-process (the FastAPI app is called through an ASGI
+transport, no network):
+
+    get_latest_results     database helper behind /latest and /history
+    latest                 GET /api/v1/games/{game}/latest?limit=10
+    history                GET /api/v1/games/{game}/history?limit=100
+    parse_html             GameCrawler._parse_html_for_game_data on a stand-in page
+    format_message         NotificationService._format_result_message
+    process_game_result    GameCrawler._process_game_result with a new result each call
+
+Cases run `--rounds` times in turn and each keeps its fastest round, which
+damps noise from other load on the machine. The latest-results snapshot
+is disabled, so /latest measures the database path and
+process_game_result excludes the snapshot rebuild.
+
+The tracked metric is the median time per call. `--save-baseline` writes
+the run to the baseline file; otherwise the run is compared with it and
+the exit status is 1 when a case is slower than baseline * (1 + budget).
+Budgets live in the baseline file ("budgets": default and per case) and
+`--budget` overrides the default. Baselines are machine-specific: record
+them on the machine that runs the comparison.
+
+    python -m benchmarks.regression --rows 20000 --save-baseline
+    python -m benchmarks.regression --rows 20000 --output regression.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "regression.json"
+DEFAULT_BUDGET = 0.25
+SEED_BATCH = 2000
+TRAINING_ROWS = 2000  # Seeded plain, used to train the payload dictionaries the remaining rows are compressed with
+
+
+def _payload(game, game_type: str, number: int) -> Dict:
+    """What the crawler stores for round `number`: the round plus the recent-history list"""
+    history = [game.round_data(game_type, previous) for previous in range(number, max(number - game.history, -1), -1)]
+    return {**game.round_data(game_type, number), "history": history}
+
+
+def seed(rows: int, game) -> Dict[str, int]:
+    """Insert `rows` results spread over the game types; returns the next round number per game"""
+    from datetime import datetime
+    from config import GAME_TYPES
+    from database import engine, GameResult, train_payload_dictionaries
+    from services.payloads import payload_codec
+
+    table = GameResult.__table__
+    game_types = list(GAME_TYPES)
+    per_game = rows // len(game_types)
+    created_at = datetime.utcnow()
+    for start in range(0, per_game, SEED_BATCH):
+        if start == TRAINING_ROWS:
+            train_payload_dictionaries()
+        batch = []
+        for game_type in game_types:
+            for number in range(start, min(start + SEED_BATCH, per_game)):
+                data = _payload(game, game_type, number)
+                plain, codec, blob = (json.dumps(data), None, None) if number < TRAINING_ROWS else \
+                    payload_codec.encode(game_type, json.dumps(data))
+                batch.append({
+                    "game_type": game_type, "session_id": data["session_id"], "result_md5": data["result_md5"],
+                    "result_data": plain, "payload_codec": codec, "payload_blob": blob,
+                    "timestamp": datetime.fromisoformat(data["timestamp"]), "created_at": created_at,
+                })
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+    return {game_type: per_game for game_type in game_types}
+
+
+def _summary(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "calls": len(ordered),
+        "median_us": statistics.median(ordered) * 1e6,
+        "p95_us": ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)] * 1e6,
+        "mean_us": statistics.fmean(ordered) * 1e6,
+    }
+
+
+async def _time_async(function: Callable, calls: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        await function()
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await function()
+        durations.append(time.perf_counter() - start)
+    return _summary(durations)
+
+
+def _time_sync(function: Callable, calls: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        function()
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return _summary(durations)
+
+
+async def run_cases(game, next_round: Dict[str, int], calls: int, warmup: int,
+                    rounds: int) -> Dict[str, Dict[str, float]]:
+    """Every case `rounds` times in turn; per case, the round with the lowest median is kept"""
+    import httpx
+    from crawler.game_crawler import GameCrawler
+    from database import get_latest_results
+    from main import app
+    from services.notification_service import NotificationService
+
+    game_type = "tai_xiu"
+    crawler = GameCrawler()
+    service = NotificationService()
+    game.response_format = "html"
+    html = game.render(game_type).decode()
+    message_data = _payload(game, game_type, next_round[game_type])
+
+    async def process():
+        # A new row each call
+        number = next_round[game_type]
+        next_round[game_type] += 1
+        await crawler._process_game_result(game_type, _payload(game, game_type, number))
+
+    results: Dict[str, Dict[str, float]] = {}
+    async with app.router.lifespan_context(app):
+        # identity: measure the route, not the response compression middleware
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"Accept-Encoding": "identity"}) as client:
+            async def request(path: str):
+                response = await client.get(path)
+                response.raise_for_status()
+
+            # (name, function, is coroutine function, calls)
+            cases = [
+                ("get_latest_results", lambda: get_latest_results(game_type=game_type, limit=10), True, calls),
+                ("latest", lambda: request(f"/api/v1/games/{game_type}/latest?limit=10"), True, calls),
+                ("history", lambda: request(f"/api/v1/games/{game_type}/history?limit=100"), True, calls),
+                ("parse_html", lambda: crawler._parse_html_for_game_data(html, game_type), False, calls),
+                ("format_message", lambda: service._format_result_message(
+                    game_type, message_data, message_data["result_md5"]), False, calls * 10),
+                ("process_game_result", process, True, calls),
+            ]
+            for _ in range(rounds):
+                for name, function, is_async, count in cases:
+                    if is_async:
+                        summary = await _time_async(function, count, warmup)
+                    else:
+                        summary = _time_sync(function, count, warmup)
+                    if name not in results or summary["median_us"] < results[name]["median_us"]:
+                        results[name] = summary
+    return results
+
+
+def compare(results: Dict, baseline: Dict, default_budget: float = None) -> List[Dict]:
+    """One entry per case present in both runs; `regressed` when past its budget"""
+    budgets = baseline.get("budgets", {})
+    default = default_budget if default_budget is not None else budgets.get("default", DEFAULT_BUDGET)
+    report = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        budget = budgets.get("cases", {}).get(name, default)
+        change = current["median_us"] / previous["median_us"] - 1
+        report.append({"case": name, "baseline_us": previous["median_us"], "current_us": current["median_us"],
+                       "change": change, "budget": budget, "regressed": change > budget})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="Results seeded into the database (all games)")
+    parser.add_argument("--calls", type=int, default=300, help="Timed calls per case")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls before each case")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds over all cases; the fastest is kept per case")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the baseline")
+    parser.add_argument("--budget", type=float, help="Allowed slowdown (0.25 = 25%%) for cases without their own")
+    parser.add_argument("--output", help="Write the run (and comparison) as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+            # Otherwise /latest would be served from the snapshot the first process_game_result round publishes
+            SNAPSHOT_ENABLED="false",
+            CRAWLER_ENABLED="false",
+            LOG_LEVEL="WARNING",
+        )
+        from loguru import logger
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+        from database import init_database
+        from loadtest.stand_in_server import StandInGame
+
+        # Rounds one second apart ending now, so seeded timestamps look like a live history
+        game = StandInGame(cadence=1.0)
+        game.started_at = time.time() - args.rows
+        asyncio.run(init_database())
+        seed_start = time.perf_counter()
+        next_round = seed(args.rows, game)
+        seed_seconds = time.perf_counter() - seed_start
+        cases = asyncio.run(run_cases(game, next_round, args.calls, args.warmup, args.rounds))
+
+    results = {
+        "rows": args.rows,
+        "calls": args.calls,
+        "rounds": args.rounds,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed_seconds": seed_seconds,
+        "cases": cases,
+    }
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    exit_code = 0
+    if args.save_baseline:
+        results["budgets"] = (baseline or {}).get("budgets", {"default": DEFAULT_BUDGET, "cases": {}})
+        if args.budget is not None:
+            results["budgets"]["default"] = args.budget
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}", file=sys.stderr)
+    elif baseline is None:
+        print(f"No baseline at {baseline_path}; run with --save-baseline first", file=sys.stderr)
+    else:
+        if baseline.get("rows") != args.rows:
+            print(f"Baseline was recorded with --rows {baseline.get('rows')}, this run used {args.rows}",
+                  file=sys.stderr)
+        results["comparison"] = compare(results, baseline, args.budget)
+        for entry in results["comparison"]:
+            status = "REGRESSED" if entry["regressed"] else "ok"
+            print(f"{entry['case']:<22} {entry['baseline_us']:>10.1f} us -> {entry['current_us']:>10.1f} us "
+                  f"({entry['change']:+.1%}, budget {entry['budget']:.0%}) {status}", file=sys.stderr)
+        if any(entry["regressed"] for entry in results["comparison"]):
+            exit_code = 1
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Offline crawler benchmark over a recorded fixture corpus
+
+`record` runs crawl cycles against a live upstream (by default the local
+stand-in server) with CRAWLER_FIXTURE_MODE=record; `replay` feeds the
+corpus back through GameCrawler into a throwaway SQLite database and
+reports time spent per stage (fetch+parse, DB, snapshot, notification):
+
+    python -m benchmarks.replay record --fixtures fixtures/ --cycles 20 --cadence 0.5
+    python -m benchmarks.replay replay --fixtures fixtures/ --cycles 200 --speed 0 --output replay.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict
+
+
+def summarize(text: str, name: str) -> Dict[str, Dict[str, float]]:
+    """Per-label-set sum/count of histogram `name` from Prometheus text"""
+    summary: Dict[str, Dict[str, float]] = {}
+    pattern = re.compile(rf"^{re.escape(name)}_(sum|count)(\{{[^}}]*\}})? (\S+)$", re.MULTILINE)
+    for kind, labels, value in pattern.findall(text):
+        summary.setdefault(labels or "{}", {})[kind] = float(value)
+    for stats in summary.values():
+        stats["mean_ms"] = stats["sum"] / stats["count"] * 1000 if stats.get("count") else 0.0
+    return summary
+
+
+async def run_cycles(cycles: int, interval: float) -> float:
+    from crawler.game_crawler import GameCrawler
+    from database import init_database
+
+    await init_database()
+    crawler = GameCrawler()
+    start = time.perf_counter()
+    for _ in range(cycles):
+        await crawler._crawl_all_games()
+        if interval:
+            await asyncio.sleep(interval)
+    elapsed = time.perf_counter() - start
+    await crawler.stop_crawling()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--fixtures", default="fixtures", help="Corpus directory")
+    parser.add_argument("--cycles", type=int, default=20, help="Crawl cycles to run")
+    parser.add_argument("--game-url", help="Upstream to record (default: a local stand-in server)")
+    parser.add_argument("--cadence", type=float, default=0.5, help="Stand-in seconds between rounds (record)")
+    parser.add_argument("--format", choices=["json", "html"], default="json", help="Stand-in page format (record)")
+    parser.add_argument("--page-kb", type=int, default=0, help="Stand-in page padding (record)")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed; 0 = as fast as possible")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read at import time, so configure the environment first
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{tmp}/replay.db",
+            "SNAPSHOT_PATH": f"{tmp}/latest_snapshot.bin",
+            "CRAWLER_FIXTURE_MODE": args.mode,
+            "CRAWLER_FIXTURE_DIR": args.fixtures,
+            "CRAWLER_REPLAY_SPEED": str(args.speed),
+            "REQUEST_TIMEOUT": "5",
+        })
+        interval = 0.0
+        if args.mode == "record":
+            if args.game_url:
+                os.environ["GAME_URL"] = args.game_url
+            else:
+                from config import settings
+                from loadtest.stand_in_server import StandInGame, start_in_thread
+                game = StandInGame(cadence=args.cadence, response_format=args.format, page_kb=args.page_kb)
+                server = start_in_thread(game)
+                settings.GAME_URL = f"http://127.0.0.1:{server.server_address[1]}/"
+            interval = args.cadence
+
+        from services.metrics import metrics
+        elapsed = asyncio.run(run_cycles(args.cycles, interval))
+
+        import sqlite3
+        with sqlite3.connect(f"{tmp}/replay.db") as conn:
+            stored = dict(conn.execute("SELECT game_type, COUNT(*) FROM game_results GROUP BY game_type"))
+
+    text = metrics.render()
+    report = {
+        "mode": args.mode,
+        "cycles": args.cycles,
+        "speed": args.speed,
+        "elapsed_seconds": elapsed,
+        "cycles_per_second": args.cycles / elapsed if elapsed else 0.0,
+        "results_stored": stored,
+        "stages": {
+            "cycle": summarize(text, "crawler_cycle_duration_seconds"),
+            "crawl_method": summarize(text, "crawler_method_duration_seconds"),
+            "db_call": summarize(text, "db_call_duration_seconds"),
+            "snapshot_publish": summarize(text, "snapshot_publish_duration_seconds"),
+            "notification": summarize(text, "notification_duration_seconds"),
+        },
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Import-time and RSS benchmark for the application entry points
+
+Each measurement runs in a fresh interpreter so module caches do not leak
+between runs. "import" covers the module imports of the entry point;
+"startup" additionally runs the FastAPI lifespan (database init and, unless
+API-only, leader election and crawler construction) and records RSS afterwards:
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["cloudscraper", "undetected_chromedriver", "selenium", "telegram", "bs4", "crawler.game_crawler"]
+
+# Code executed in the child interpreter; prints one JSON line
+PROBE = """
+import json, os, sys, time
+t0 = time.perf_counter()
+{imports}
+import_elapsed = time.perf_counter() - t0
+import asyncio
+ELECTION_TIMEOUT = 30
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+def sample():
+    return time.perf_counter() - t0, rss_kb(), [name for name in {heavy!r} if name in sys.modules]
+async def startup():
+    if os.environ["CRAWLER_ENABLED"] != "true":
+        async with main.app.router.lifespan_context(main.app):
+            return sample()
+    # The crawler is constructed once this process wins the leader election, after the lifespan
+    # started; sample right then, before the crawl task it creates gets a chance to run
+    elected = asyncio.get_running_loop().create_future()
+    start_crawler = main.start_crawler
+    async def start_and_sample():
+        await start_crawler()
+        elected.set_result(sample())
+    main.start_crawler = start_and_sample
+    async with main.app.router.lifespan_context(main.app):
+        return await asyncio.wait_for(elected, ELECTION_TIMEOUT)
+startup_elapsed, rss, heavy_modules = asyncio.run(startup())
+print(json.dumps({{
+    "import_seconds": import_elapsed,
+    "startup_seconds": startup_elapsed,
+    "rss_mb": rss / 1024,
+    "heavy_modules": heavy_modules,
+}}))
+"""
+
+# Entry point -> statements that reproduce what it imports before serving
+ENTRY_POINTS = {
+    "main.py": "import main",
+    "run_local.py": "import run_local\nimport main",  # `run_local.py server` loads main:app
+}
+
+MODES = {
+    "full": {"CRAWLER_ENABLED": "true"},
+    "api_only": {"CRAWLER_ENABLED": "false"},
+}
+
+
+def measure(imports: str, env_overrides: dict, database_url: str) -> dict:
+    # Unroutable upstream: the crawler task is cancelled before it fetches anything
+    env = dict(os.environ, DATABASE_URL=database_url, GAME_URL="http://127.0.0.1:9/", **env_overrides)
+    code = PROBE.format(imports=imports, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{tmp}/bench.db"
+        for entry_point, imports in ENTRY_POINTS.items():
+            for mode, env_overrides in MODES.items():
+                runs = [measure(imports, env_overrides, database_url) for _ in range(args.runs)]
+                results[f"{entry_point}:{mode}"] = summarize(runs)
+
+    for name, result in results.items():
+        print(f"{name:24} import {result['import_seconds_median'] * 1000:7.1f} ms"
+              f"  startup {result['startup_seconds_median'] * 1000:7.1f} ms"
+              f"  rss {result['rss_mb_median']:6.1f} MB  heavy={','.join(result['heavy_modules']) or '-'}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+def summarize(runs: list) -> dict:
+    return {
+        "import_seconds_median": statistics.median(run["import_seconds"] for run in runs),
+        "startup_seconds_median": statistics.median(run["startup_seconds"] for run in runs),
+        "rss_mb_median": statistics.median(run["rss_mb"] for run in runs),
+        "heavy_modules": runs[-1]["heavy_modules"],
+        "runs": len(runs),
+    }
+
+
+if __name__ == "__main__":
+    main()
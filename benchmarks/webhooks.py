@@ -0,0 +1,184 @@
+"""
+Webhook fan-out throughput against local stand-in receivers
+
+Registers `--subscribers` receivers (a share of them slow, a share failing
+with 500) in a throwaway SQLite database, publishes `--events` results
+through the dispatcher and reports deliveries per second, per-group
+delivery latency (publish -> received) and signature checks, so it shows
+whether slow endpoints hold back the healthy ones:
+
+    python -m benchmarks.webhooks --subscribers 200 --events 50 --slow 0.05 --slow-delay 2 --output webhooks.json
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+SECRET = "benchmark-secret"
+
+
+class Receivers:
+    """HTTP/1.1 keep-alive receivers on one background event loop, one port each"""
+
+    def __init__(self, count: int, slow: int, failing: int, slow_delay: float):
+        self.behaviour = ["slow"] * slow + ["failing"] * failing + ["fast"] * (count - slow - failing)
+        self.slow_delay = slow_delay
+        self.ports: List[int] = []
+        self.arrivals: Dict[int, List] = {index: [] for index in range(count)}  # (event id, perf_counter)
+        self.bad_signatures = 0
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        threading.Thread(target=self._serve, args=(started,), daemon=True).start()
+        started.wait()
+
+    def _serve(self, started: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        for index in range(len(self.behaviour)):
+            server = self.loop.run_until_complete(
+                asyncio.start_server(lambda r, w, index=index: self._handle(index, r, w), "127.0.0.1", 0)
+            )
+            self.ports.append(server.sockets[0].getsockname()[1])
+        started.set()
+        self.loop.run_forever()
+
+    async def _handle(self, index: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = {}
+                for line in head.decode("latin-1").split("\r\n")[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                expected = hmac.new(SECRET.encode(), headers["x-webhook-timestamp"].encode() + b"." + body,
+                                    hashlib.sha256).hexdigest()
+                if headers.get("x-webhook-signature") != f"sha256={expected}":
+                    self.bad_signatures += 1
+                behaviour = self.behaviour[index]
+                if behaviour == "slow":
+                    await asyncio.sleep(self.slow_delay)
+                if behaviour == "failing":
+                    writer.write(b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\n\r\n")
+                else:
+                    self.arrivals[index].append((headers["x-webhook-id"], time.perf_counter()))
+                    writer.write(b"HTTP/1.1 204 No Content\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+async def run(args, receivers: Receivers) -> Dict:
+    from database import create_webhook_subscriber, init_database
+    from services.webhooks import webhook_dispatcher
+
+    await init_database()
+    for port in receivers.ports:
+        await create_webhook_subscriber(f"http://127.0.0.1:{port}/hook", secret=SECRET)
+
+    published: Dict[str, float] = {}
+    start = time.perf_counter()
+    for number in range(args.events):
+        event = await webhook_dispatcher.publish(
+            "tai_xiu", {"game_type": "tai_xiu", "result_data": {"round": number}, "result_md5": f"{number:032x}"}
+        )
+        published[event.id] = time.perf_counter()
+        if args.interval:
+            await asyncio.sleep(args.interval)
+    publish_seconds = time.perf_counter() - start
+
+    drained = await webhook_dispatcher.drain(args.timeout)
+    elapsed = time.perf_counter() - start
+    status = {queue.id: queue.status() for queue in webhook_dispatcher.queues.values()}
+    await webhook_dispatcher.close()
+
+    groups: Dict[str, List[float]] = {"fast": [], "slow": []}
+    delivered, last_arrival = 0, start
+    for index, arrivals in receivers.arrivals.items():
+        behaviour = receivers.behaviour[index]
+        delivered += len(arrivals)
+        for event_id, arrived in arrivals:
+            last_arrival = max(last_arrival, arrived)
+            if event_id in published:
+                groups[behaviour].append(arrived - published[event_id])
+    return {
+        "subscribers": len(receivers.ports),
+        "slow_subscribers": receivers.behaviour.count("slow"),
+        "failing_subscribers": receivers.behaviour.count("failing"),
+        "events": args.events,
+        "drained": drained,
+        "elapsed_seconds": elapsed,
+        "publish_seconds": publish_seconds,
+        "deliveries": delivered,
+        "deliveries_per_second": delivered / (last_arrival - start) if last_arrival > start else 0.0,
+        "failed_deliveries": sum(item["failed"] for item in status.values()),
+        "bad_signatures": receivers.bad_signatures,
+        "latency_ms": {
+            group: {
+                "count": len(values),
+                "p50": percentile(values, 0.5) * 1000,
+                "p95": percentile(values, 0.95) * 1000,
+                "p99": percentile(values, 0.99) * 1000,
+                "max": max(values) * 1000 if values else 0.0,
+            }
+            for group, values in groups.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--slow", type=float, default=0.05, help="Share of receivers that respond slowly")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds a slow receiver takes")
+    parser.add_argument("--failing", type=float, default=0.05, help="Share of receivers that answer 500")
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between published events")
+    parser.add_argument("--concurrency", type=int, help="WEBHOOK_CONCURRENCY (default: the setting)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for queues to drain")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    slow = int(args.subscribers * args.slow)
+    failing = int(args.subscribers * args.failing)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read at import time, so configure the environment first
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{tmp}/webhooks.db",
+            "WEBHOOK_MAX_ATTEMPTS": "2",
+            "WEBHOOK_RETRY_BACKOFF": "0.1",
+            "WEBHOOK_MAX_BACKOFF": "1",
+            "WEBHOOK_QUEUE_SIZE": str(max(args.events, 1000)),
+            "LOG_LEVEL": "ERROR",
+        })
+        if args.concurrency:
+            os.environ["WEBHOOK_CONCURRENCY"] = str(args.concurrency)
+        from loguru import logger
+        logger.remove()
+
+        receivers = Receivers(args.subscribers, slow, failing, args.slow_delay)
+        report = asyncio.run(run(args, receivers))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
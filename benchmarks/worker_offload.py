@@ -0,0 +1,168 @@
+"""
+API latency while the crawler parses large pages, with and without the worker pool
+
+Seeds a throwaway SQLite database, then for each mode parses a large
+stand-in results page (`--history` table rows plus `--page-kb` of
+padding) every `--pause` seconds for `--seconds`, the way a crawl does, while
+GET /api/v1/games/{game}/latest is requested every `--interval` seconds
+through an ASGI transport (no network):
+
+    idle      no parsing: the latency floor
+    inline    parsing on the event loop (WorkerPool with no processes)
+    process   parsing in `--processes` worker processes (services/workers.py)
+
+Reported per mode: probe latency quantiles and the pages parsed. Inline,
+a probe that arrives during a parse waits for it to finish; with the
+pool it only shares the CPU with the worker.
+
+    python -m benchmarks.worker_offload --history 5000 --page-kb 1024 --output worker_offload.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+MODES = ("idle", "inline", "process")
+SEED_ROWS = 600
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"probes": 0}
+    return {
+        "probes": len(ordered),
+        "p50_ms": statistics.median(ordered) * 1e3,
+        "p99_ms": ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)] * 1e3,
+        "max_ms": ordered[-1] * 1e3,
+    }
+
+
+async def run_mode(client, pool, html: str, game_type: str, mode: str, seconds: float, interval: float,
+                   pause: float) -> Dict:
+    from crawler import parsing
+
+    stop = time.perf_counter() + seconds
+    parsed = 0
+
+    async def parse_pages():
+        nonlocal parsed
+        while time.perf_counter() < stop:
+            await pool.run_in_process(parsing.parse_html_for_game_data, html, game_type, size=len(html))
+            parsed += 1
+            # Between pages a crawl waits on fetches and database writes
+            await asyncio.sleep(pause)
+
+    async def probe() -> List[float]:
+        latencies = []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            response = await client.get(f"/api/v1/games/{game_type}/latest")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(interval)
+        return latencies
+
+    parser = asyncio.create_task(parse_pages()) if mode != "idle" else None
+    latencies = await probe()
+    if parser is not None:
+        await parser
+    return {**_summary(latencies), "pages_parsed": parsed}
+
+
+async def run(game, args) -> Dict[str, Dict]:
+    import httpx
+    from crawler import parsing
+    from main import app
+    from services.workers import WorkerPool
+
+    game_type = "tai_xiu"
+    game.response_format = "html"
+    html = game.render(game_type).decode()
+    start = time.perf_counter()
+    parsing.parse_html_for_game_data(html, game_type)
+    parse_seconds = time.perf_counter() - start
+
+    results: Dict[str, Dict] = {"page": {"bytes": len(html), "parse_ms": parse_seconds * 1e3}}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"Accept-Encoding": "identity"}) as client:
+            for mode in MODES:
+                pool = WorkerPool(args.processes if mode == "process" else 0, 0, args.processes * 2, 0,
+                                  len(html) + 1, 0)
+                await pool.start()
+                try:
+                    results[mode] = await run_mode(client, pool, html, game_type, mode, args.seconds, args.interval,
+                                                   args.pause)
+                finally:
+                    await pool.close()
+                if mode == "process":
+                    results[mode]["warm_up_seconds"] = pool.warm_up_seconds
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--history", type=int, default=5000, help="Result table rows on the parsed page")
+    parser.add_argument("--page-kb", type=int, default=1024, help="Padding added to the parsed page")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes in the process mode")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each mode")
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between probe requests")
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds between parsed pages")
+    parser.add_argument("--output", help="Write the run as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+            # Probes go to the database, not the snapshot or NOTIFY-fed memory
+            SNAPSHOT_ENABLED="false",
+            CRAWLER_ENABLED="false",
+            # The modes bring their own pools; the application's would be an idle extra process
+            WORKER_PROCESSES="0",
+            LOG_LEVEL="WARNING",
+        )
+        from loguru import logger
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+        from benchmarks.regression import seed
+        from database import init_database
+        from loadtest.stand_in_server import StandInGame
+
+        game = StandInGame(cadence=1.0, page_kb=args.page_kb, history=args.history)
+        game.started_at = time.time() - max(SEED_ROWS, args.history)
+        asyncio.run(init_database())
+        seed(SEED_ROWS, game)
+        modes = asyncio.run(run(game, args))
+
+    results = {
+        "history": args.history,
+        "page_kb": args.page_kb,
+        "processes": args.processes,
+        "seconds": args.seconds,
+        "interval": args.interval,
+        "pause": args.pause,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        **modes,
+    }
+    for mode in MODES:
+        summary = results[mode]
+        print(f"{mode:<8} p50 {summary['p50_ms']:>8.1f} ms  p99 {summary['p99_ms']:>8.1f} ms  "
+              f"max {summary['max_ms']:>8.1f} ms  pages {summary['pages_parsed']}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Batch compression of stored result payloads, with a size/latency report
+
+Compresses game_results.result_data in place (see services/payloads.py),
+optionally training a fresh dictionary per game first:
+
+    python compress_results.py --report               # sizes and read latency on a sample, no writes
+    python compress_results.py --train                # train dictionaries, then compress plain rows
+    python compress_results.py --recompress           # also re-encode rows from older dictionaries/codecs
+    python compress_results.py --decompress           # back to plain JSON (e.g. before removing zstandard)
+
+Rows are processed in id order, --batch-size per transaction. The job
+only rewrites rows whose stored form changes, so an interrupted run is
+simply started again. SQLite keeps the freed pages in the file until a
+VACUUM.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _decoded(row, codec) -> Optional[str]:
+    return codec.decode(row.payload_codec, row.payload_blob) if row.payload_codec else row.result_data
+
+
+def migrate(batch_size: int, recompress: bool, decompress: bool, progress_interval: float) -> Dict:
+    from sqlalchemy import bindparam, select
+    from database import engine, GameResult
+    from services.payloads import payload_codec
+
+    table = GameResult.__table__
+    query = select(table.c.id, table.c.game_type, table.c.result_data, table.c.payload_codec, table.c.payload_blob)
+    if decompress:
+        query = query.where(table.c.payload_codec.isnot(None))
+    elif not recompress:
+        query = query.where(table.c.payload_codec.is_(None), table.c.result_data.isnot(None))
+    update = table.update().where(table.c.id == bindparam("row_id")).values(
+        result_data=bindparam("new_text"), payload_codec=bindparam("new_codec"), payload_blob=bindparam("new_blob")
+    )
+
+    summary = {"scanned": 0, "rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+    started = last_progress = time.perf_counter()
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(query.where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for row in rows:
+            summary["scanned"] += 1
+            plain = _decoded(row, payload_codec)
+            if decompress:
+                new_text, new_codec, new_blob = plain, None, None
+            else:
+                new_text, new_codec, new_blob = payload_codec.encode(row.game_type, plain)
+            if new_codec == row.payload_codec and (new_codec is not None or new_text == row.result_data):
+                continue
+            summary["bytes_before"] += len(row.payload_blob) if row.payload_codec else len((row.result_data or "").encode())
+            summary["bytes_after"] += len(new_blob) if new_codec else len((new_text or "").encode())
+            changes.append({"row_id": row.id, "new_text": new_text, "new_codec": new_codec, "new_blob": new_blob})
+        if changes:
+            with engine.begin() as conn:
+                conn.execute(update, changes)
+            summary["rewritten"] += len(changes)
+        if time.perf_counter() - last_progress >= progress_interval:
+            last_progress = time.perf_counter()
+            print(f"{summary['scanned']} scanned, {summary['rewritten']} rewritten (id {last_id})", file=sys.stderr)
+
+    summary["elapsed_seconds"] = time.perf_counter() - started
+    summary["ratio"] = summary["bytes_after"] / summary["bytes_before"] if summary["bytes_before"] else None
+    return summary
+
+
+def _median_us(function, payloads: List, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            function(payload)
+        timings.append((time.perf_counter() - start) / len(payloads) * 1e6)
+    return statistics.median(timings)
+
+
+def report(sample: int) -> Dict:
+    """Stored bytes per game and state, and size/decode cost per codec on recent payloads"""
+    from sqlalchemy import func, select
+    from database import engine, IS_POSTGRES, GameResult, PayloadDictionary, SessionLocal
+    from services.payloads import PayloadCodec, payload_codec, train_dictionary, zstandard
+
+    table = GameResult.__table__
+    storage = []
+    with engine.connect() as conn:
+        for row in conn.execute(
+            select(table.c.game_type, table.c.payload_codec, func.count(),
+                   func.coalesce(func.sum(func.length(table.c.result_data)), 0),
+                   func.coalesce(func.sum(func.length(table.c.payload_blob)), 0))
+            .group_by(table.c.game_type, table.c.payload_codec)
+        ):
+            storage.append({"game_type": row[0], "codec": row[1] or "plain", "rows": row[2],
+                            "text_bytes": row[3], "blob_bytes": row[4]})
+        if IS_POSTGRES:
+            database_bytes = conn.exec_driver_sql("SELECT pg_total_relation_size('game_results')").scalar()
+        else:
+            database_bytes = (conn.exec_driver_sql("PRAGMA page_count").scalar()
+                              * conn.exec_driver_sql("PRAGMA page_size").scalar())
+
+    codecs = ["zlib"] + (["zstd"] if zstandard is not None else [])
+    games = {}
+    with SessionLocal() as db:
+        for game_type in sorted({item["game_type"] for item in storage}):
+            rows = (db.query(GameResult).filter(GameResult.game_type == game_type)
+                    .order_by(GameResult.id.desc()).limit(sample * 2).all())
+            payloads = [row.result_data.encode() for row in rows if row.result_data]
+            if len(payloads) < 20:
+                continue
+            # Train on the older half, measure on the newer half (as live rows would be)
+            measured, training = payloads[:len(payloads) // 2], payloads[len(payloads) // 2:]
+            texts = [payload.decode() for payload in measured]
+            plain_bytes = sum(map(len, measured))
+            result = {"rows_measured": len(measured), "mean_plain_bytes": plain_bytes / len(measured),
+                      "json_loads_us": _median_us(json.loads, texts), "codecs": {}}
+            for codec_name in codecs:
+                for dictionary_size in (0, 4096, 16384):
+                    codec = PayloadCodec(codec_name, min_size=0)
+                    if dictionary_size:
+                        codec.register(1, codec_name, train_dictionary(codec_name, training, dictionary_size), game_type)
+                    encoded = [codec.encode(game_type, text) for text in texts]
+                    blobs = [(tag, blob) for _, tag, blob in encoded if tag]
+                    stored = sum(len(blob) for _, blob in blobs) + sum(
+                        len(plain.encode()) for plain, tag, _ in encoded if not tag)
+                    name = f"{codec_name}+dict{dictionary_size // 1024}k" if dictionary_size else codec_name
+                    result["codecs"][name] = {
+                        "mean_stored_bytes": stored / len(measured),
+                        "ratio": stored / plain_bytes,
+                        "decode_us": _median_us(lambda item: codec.decode(*item), blobs) if blobs else None,
+                        "encode_us": _median_us(lambda text: codec.encode(game_type, text), texts),
+                    }
+            games[game_type] = result
+        dictionaries = [{"id": item.id, "game_type": item.game_type, "codec": item.codec, "bytes": len(item.data),
+                         "samples": item.sample_count}
+                        for item in db.query(PayloadDictionary).order_by(PayloadDictionary.id)]
+
+    return {
+        "codec_for_new_rows": payload_codec.codec,
+        "current_dictionaries": payload_codec.current,
+        "dictionaries": dictionaries,
+        "storage": storage,
+        "table_bytes" if IS_POSTGRES else "database_file_bytes": database_bytes,
+        "sample": games,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--report", action="store_true", help="Only report sizes and codec trade-offs")
+    parser.add_argument("--sample", type=int, default=1000, help="Recent payloads per game measured by --report")
+    parser.add_argument("--train", action="store_true", help="Train a new dictionary per game before compressing")
+    parser.add_argument("--recompress", action="store_true",
+                        help="Also re-encode compressed rows whose codec or dictionary is not the current one")
+    parser.add_argument("--decompress", action="store_true", help="Store every payload as plain JSON again")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per transaction")
+    parser.add_argument("--progress-interval", type=float, default=2.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    import asyncio
+    from database import init_database, train_payload_dictionaries
+
+    asyncio.run(init_database())
+    if args.report:
+        print(json.dumps(report(args.sample), indent=2))
+        return
+
+    output = {}
+    if args.train and not args.decompress:
+        output["trained"] = train_payload_dictionaries()
+    output["migration"] = migrate(args.batch_size, args.recompress, args.decompress, args.progress_interval)
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+pytest setup for the test scripts: a throwaway database, set before any test module loads the settings
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("SNAPSHOT_ENABLED", "false")
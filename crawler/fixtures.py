@@ -0,0 +1,192 @@
+"""
+Record-and-replay fixtures for deterministic crawler benchmarks
+
+Recording saves every raw HTTP response and browser page source the
+crawler sees, with timing metadata, under
+
+    <CRAWLER_FIXTURE_DIR>/<game_type>/<source>/<sequence>.json
+
+where `source` is the cloudscraper endpoint template (slugified) or the
+browser method name. Replay feeds the corpus back to GameCrawler instead
+of touching the network, so parsing, dedup, persistence and notification
+can be measured offline.
+
+Replay speed: 0 serves the next recorded entry on every request (as fast
+as possible); a positive value replays recorded time scaled by that
+factor (1.0 = real time, 10.0 = ten times faster), serving whichever
+entry was current at that point and simulating the recorded latency.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+
+def source_slug(source: str) -> str:
+    """Directory name for an endpoint template or method name"""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", source.replace("{game_type}", "game")).strip("_")
+    return slug or "root"
+
+
+class FixtureRecorder:
+    """Appends raw responses and page sources to an on-disk corpus"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._sequences: Dict[Path, int] = {}
+
+    def _next_path(self, game_type: str, source: str) -> Path:
+        directory = self.root / game_type / source_slug(source)
+        if directory not in self._sequences:
+            directory.mkdir(parents=True, exist_ok=True)
+            existing = [int(path.stem) for path in directory.glob("*.json") if path.stem.isdigit()]
+            self._sequences[directory] = max(existing, default=-1) + 1
+        sequence = self._sequences[directory]
+        self._sequences[directory] += 1
+        return directory / f"{sequence:08d}.json"
+
+    def _write(self, game_type: str, source: str, entry: Dict):
+        path = self._next_path(game_type, source)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False))
+        os.replace(tmp_path, path)
+
+    def record_response(self, game_type: str, source: str, url: str, response, elapsed: float):
+        """Save a requests/cloudscraper response"""
+        self._write(game_type, source, {
+            "kind": "http",
+            "url": url,
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "body": response.text,
+            "elapsed": elapsed,
+            "recorded_at": time.time(),
+        })
+
+    def record_page_source(self, game_type: str, source: str, url: str, page_source: str, elapsed: float):
+        """Save the page source a browser method extracted data from"""
+        self._write(game_type, source, {
+            "kind": "page_source",
+            "url": url,
+            "status_code": 200,
+            "headers": {},
+            "body": page_source,
+            "elapsed": elapsed,
+            "recorded_at": time.time(),
+        })
+
+
+class ReplayResponse:
+    """Just enough of requests.Response for the crawler"""
+
+    def __init__(self, entry: Dict):
+        self.status_code = entry["status_code"]
+        self.headers = entry.get("headers", {})
+        self.text = entry["body"]
+        self.content = self.text.encode()
+        self.url = entry.get("url")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _ReplayElement:
+    """Selenium WebElement stand-in backed by a BeautifulSoup tag"""
+
+    def __init__(self, tag):
+        self._tag = tag
+        self.text = tag.get_text()
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        if name == "textContent":
+            return self.text
+        value = self._tag.get(name)
+        return " ".join(value) if isinstance(value, list) else value
+
+
+class ReplayDriver:
+    """WebDriver stand-in over a recorded page source (CSS selectors only)"""
+
+    def __init__(self, page_source: str):
+        self.page_source = page_source
+        self._soup = None
+
+    def find_elements(self, by, selector: str) -> List[_ReplayElement]:
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+            self._soup = BeautifulSoup(self.page_source, "html.parser")
+        return [_ReplayElement(tag) for tag in self._soup.select(selector)]
+
+    def quit(self):
+        pass
+
+
+class ReplayTransport:
+    """Serves a recorded corpus back to the crawler"""
+
+    def __init__(self, root: str, speed: float = 0.0):
+        self.root = Path(root)
+        self.speed = speed
+        self.started_at = time.monotonic()
+        self._entries: Dict[tuple, List[Dict]] = {}
+        self._offsets: Dict[tuple, List[float]] = {}
+        self._cursors: Dict[tuple, int] = {}
+        self._load()
+
+    def _load(self):
+        for path in sorted(self.root.glob("*/*/*.json")):
+            key = (path.parent.parent.name, path.parent.name)
+            self._entries.setdefault(key, []).append(json.loads(path.read_text()))
+        for key, entries in self._entries.items():
+            first = entries[0]["recorded_at"]
+            self._offsets[key] = [entry["recorded_at"] - first for entry in entries]
+        logger.info(f"Loaded {sum(len(e) for e in self._entries.values())} fixtures from {self.root}")
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _next_entry(self, game_type: str, source: str) -> Optional[Dict]:
+        key = (game_type, source_slug(source))
+        entries = self._entries.get(key)
+        if not entries:
+            return None
+        if self.speed > 0:
+            # Whatever was current at this point of the (scaled) recording
+            elapsed = (time.monotonic() - self.started_at) * self.speed
+            return entries[max(bisect_right(self._offsets[key], elapsed) - 1, 0)]
+        cursor = self._cursors.get(key, 0)
+        self._cursors[key] = cursor + 1
+        return entries[cursor % len(entries)]
+
+    async def _simulate_latency(self, entry: Dict):
+        if self.speed > 0 and entry.get("elapsed"):
+            await asyncio.sleep(entry["elapsed"] / self.speed)
+
+    async def get(self, game_type: str, source: str) -> Optional[ReplayResponse]:
+        entry = self._next_entry(game_type, source)
+        if entry is None:
+            return None
+        await self._simulate_latency(entry)
+        return ReplayResponse(entry)
+
+    async def driver(self, game_type: str, source: str) -> Optional[ReplayDriver]:
+        entry = self._next_entry(game_type, source)
+        if entry is None:
+            return None
+        await self._simulate_latency(entry)
+        return ReplayDriver(entry["body"])
+
+
+def create_fixture_transport(mode: Optional[str], root: str, speed: float):
+    """(recorder, replay) pair for CRAWLER_FIXTURE_MODE"""
+    if mode == "record":
+        return FixtureRecorder(root), None
+    if mode == "replay":
+        return None, ReplayTransport(root, speed)
+    return None, None
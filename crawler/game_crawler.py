@@ -6,19 +6,111 @@ import json
 import hashlib
 import time
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from loguru import logger
 
-import cloudscraper
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
+# cloudscraper, selenium and undetected_chromedriver are imported inside the
+# methods that use them so importing this module stays cheap
 
 from config import settings, GAME_TYPES
-from database import save_game_result
+from crawler import parsing
+from crawler.fixtures import create_fixture_transport
+from crawler.parsing import ROUND_LIST_FIELDS
+from database import find_stored_rounds, mark_results_notified, save_game_results
+from services.bloom import known_md5s
+from services.compression import response_cache
+from services import freshness
+from services.memory import browser_processes, memory_monitor, process_rss, release_memory, terminate_browsers
+from services.metrics import metrics
 from services.notification_service import NotificationService
+from services.polling import poll_scheduler
+from services.profiler import profiler
+from services.snapshot import keep_snapshot_fresh, publish_latest_results
+from services.workers import worker_pool
+
+CRAWL_METHOD_SECONDS = metrics.histogram(
+    "crawler_method_duration_seconds", "Duration of each crawl method attempt", ["game_type", "method"]
+)
+CRAWL_METHOD_TOTAL = metrics.counter(
+    "crawler_method_attempts_total", "Crawl method attempts by outcome (success, empty, failure)",
+    ["game_type", "method", "outcome"]
+)
+ENDPOINT_PROBE_SECONDS = metrics.histogram(
+    "crawler_endpoint_probe_duration_seconds", "Duration of cloudscraper endpoint probes",
+    ["game_type", "endpoint"]
+)
+ENDPOINT_PROBE_TOTAL = metrics.counter(
+    "crawler_endpoint_probes_total", "Endpoint probes by outcome (hit, miss, http_error, error)",
+    ["game_type", "endpoint", "outcome"]
+)
+CRAWL_CYCLE_SECONDS = metrics.histogram(
+    "crawler_cycle_duration_seconds", "Duration of a full crawl cycle over all games"
+)
+CRAWL_LAST_SUCCESS = metrics.gauge(
+    "crawler_last_success_timestamp_seconds", "Unix time of the last successful crawl", ["game_type"]
+)
+CRAWL_LAG = metrics.gauge(
+    "crawler_lag_seconds", "Seconds since the last successful crawl", ["game_type"]
+)
+
+CHANGE_DETECTION_TOTAL = metrics.counter(
+    "crawler_change_detection_total",
+    "Successful endpoint fetches by change state (not_modified, identical_body, changed)",
+    ["game_type", "state"]
+)
+CYCLE_SKIPS_TOTAL = metrics.counter(
+    "crawler_unchanged_skips_total", "Games skipped in a crawl cycle because upstream did not change",
+    ["game_type"]
+)
+RESULTS_INGESTED_TOTAL = metrics.counter(
+    "crawler_results_ingested_total",
+    "Results stored by the crawler (latest: newest round of a fetch, catch_up: older rounds it listed)",
+    ["game_type", "kind"]
+)
+
+# Endpoint templates probed by cloudscraper, relative to GAME_URL
+CLOUDSCRAPER_ENDPOINTS = [
+    "api/{game_type}",
+    "game/{game_type}/results",
+    "{game_type}",
+    "api/game-results/{game_type}",
+    "",  # Fallback to main page
+]
+
+
+def _body_hash(content: bytes) -> bytes:
+    """Digest of a response body for change detection (hashlib releases the GIL on large buffers)"""
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+def _lag_function(game_type: str):
+    """Build a scrape-time lag callback for a game type"""
+    def lag():
+        last_success = CRAWL_LAST_SUCCESS.labels(game_type).value
+        return time.time() - last_success if last_success else None
+    return lag
+
+for _game_type in GAME_TYPES:
+    CRAWL_LAG.labels(_game_type).set_function(_lag_function(_game_type))
+
+class UnchangedResult(dict):
+    """Game data re-served from the endpoint cache (304 or byte-identical body)"""
+
+    def __init__(self, original: Dict):
+        super().__init__(original)
+        self.original = original
+
+
+class _EndpointState:
+    """Validators, body hash and parsed data of the last good response from one endpoint"""
+    __slots__ = ("etag", "last_modified", "body_hash", "data")
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], body_hash: bytes, data: Dict):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.data = data
+
 
 class GameCrawler:
     """Main crawler class for 68GB game data"""
@@ -29,16 +121,32 @@ class GameCrawler:
         self.driver = None
         self.notification_service = NotificationService()
         self.last_results = {}  # Store last results to detect changes
+        self.last_payloads: Dict[str, Dict] = {}  # Data objects already processed, per game
+        self._endpoint_state: Dict[tuple, _EndpointState] = {}
+        self._stage_times: Dict[str, Dict[str, datetime]] = {}  # fetched_at/parsed_at of the current crawl, per game
+        self.fixture_recorder, self.replay = create_fixture_transport(
+            settings.CRAWLER_FIXTURE_MODE, settings.CRAWLER_FIXTURE_DIR, settings.CRAWLER_REPLAY_SPEED
+        )
         
     async def start_crawling(self):
         """Start the crawling process"""
         self.is_running = True
         logger.info("Starting game crawler...")
+        await poll_scheduler.start()
         
         while self.is_running:
             try:
-                await self._crawl_all_games()
-                await asyncio.sleep(settings.CRAWL_INTERVAL)
+                # Only the games whose next poll is due (all of them every CRAWL_INTERVAL without CRAWL_ADAPTIVE)
+                game_types = poll_scheduler.due()
+                if game_types:
+                    if profiler.crawl_cycles_remaining and profiler.should_profile_crawl_cycle():
+                        with profiler.profile("crawl_cycle"):
+                            await self._crawl_all_games(game_types)
+                    else:
+                        await self._crawl_all_games(game_types)
+                    self._check_memory()
+                await keep_snapshot_fresh()
+                await asyncio.sleep(poll_scheduler.delay())
             except Exception as e:
                 logger.error(f"Error in crawling loop: {e}")
                 await asyncio.sleep(settings.CRAWL_INTERVAL)
@@ -52,15 +160,48 @@ class GameCrawler:
             self.session.close()
         logger.info("Game crawler stopped")
     
-    async def _crawl_all_games(self):
-        """Crawl all supported games"""
-        for game_type, game_config in GAME_TYPES.items():
-            try:
-                result = await self._crawl_game(game_type)
-                if result:
-                    await self._process_game_result(game_type, result)
-            except Exception as e:
-                logger.error(f"Error crawling {game_type}: {e}")
+    def _check_memory(self):
+        """Sample memory for this cycle and recycle whatever crossed its ceiling"""
+        sample = memory_monitor.record_cycle()
+        for component in memory_monitor.check_ceilings(sample):
+            if component == "browser":
+                before = sample["browser_rss_bytes"]
+                terminate_browsers()
+                after = sum(child["rss_bytes"] for child in browser_processes())
+            else:
+                before = sample["rss_bytes"]
+                self._recycle_state()
+                after = process_rss()
+            memory_monitor.recycled(component, before, after)
+    
+    def _recycle_state(self):
+        """Drop the scraper session and per-endpoint caches; dedup state survives"""
+        if self.session:
+            self.session.close()
+            self.session = None
+        self._endpoint_state.clear()
+        self.last_payloads.clear()
+        self.notification_service = NotificationService()
+        release_memory()
+    
+    async def _crawl_all_games(self, game_types: Optional[List[str]] = None):
+        """Crawl all supported games (or the given ones)"""
+        with CRAWL_CYCLE_SECONDS.labels().time():
+            for game_type in game_types if game_types is not None else GAME_TYPES:
+                poll_scheduler.polling(game_type)
+                try:
+                    self._stage_times.pop(game_type, None)
+                    result = await self._crawl_game(game_type)
+                    if isinstance(result, UnchangedResult) and result.original is self.last_payloads.get(game_type):
+                        # Same upstream response as last cycle: nothing to parse, encode or store
+                        CYCLE_SKIPS_TOTAL.labels(game_type).inc()
+                        continue
+                    if result:
+                        await self._process_game_result(game_type, result)
+                except Exception as e:
+                    logger.error(f"Error crawling {game_type}: {e}")
+                finally:
+                    poll_scheduler.polled(game_type)
     
     async def _crawl_game(self, game_type: str) -> Optional[Dict]:
         """Crawl specific game data"""
@@ -72,13 +213,21 @@ class GameCrawler:
         ]
         
         for method in methods:
+            method_name = method.__name__
+            start = time.perf_counter()
             try:
                 result = await method(game_type)
+                CRAWL_METHOD_SECONDS.labels(game_type, method_name).observe(time.perf_counter() - start)
                 if result:
-                    logger.info(f"Successfully crawled {game_type} using {method.__name__}")
+                    CRAWL_METHOD_TOTAL.labels(game_type, method_name, "success").inc()
+                    CRAWL_LAST_SUCCESS.labels(game_type).set(time.time())
+                    logger.info(f"Successfully crawled {game_type} using {method_name}")
                     return result
+                CRAWL_METHOD_TOTAL.labels(game_type, method_name, "empty").inc()
             except Exception as e:
-                logger.warning(f"Method {method.__name__} failed for {game_type}: {e}")
+                CRAWL_METHOD_SECONDS.labels(game_type, method_name).observe(time.perf_counter() - start)
+                CRAWL_METHOD_TOTAL.labels(game_type, method_name, "failure").inc()
+                logger.warning(f"Method {method_name} failed for {game_type}: {e}")
                 continue
         
         logger.error(f"All crawling methods failed for {game_type}")
@@ -86,7 +235,8 @@ class GameCrawler:
     
     async def _crawl_with_cloudscraper(self, game_type: str) -> Optional[Dict]:
         """Crawl using cloudscraper (fastest method)"""
-        if not self.session:
+        if not self.session and not self.replay:
+            import cloudscraper
             self.session = cloudscraper.create_scraper(
                 browser={
                     'browser': 'chrome',
@@ -96,49 +246,111 @@ class GameCrawler:
             )
         
         # Try to find game-specific endpoints
-        endpoints_to_try = [
-            f"{settings.GAME_URL}api/{game_type}",
-            f"{settings.GAME_URL}game/{game_type}/results",
-            f"{settings.GAME_URL}{game_type}",
-            f"{settings.GAME_URL}api/game-results/{game_type}",
-            settings.GAME_URL  # Fallback to main page
-        ]
-        
-        for endpoint in endpoints_to_try:
+        for template in CLOUDSCRAPER_ENDPOINTS:
+            endpoint = settings.GAME_URL + template.format(game_type=game_type)
+            label = template or "/"
+            outcome = "miss"
+            start = time.perf_counter()
             try:
-                response = self.session.get(
-                    endpoint,
-                    timeout=settings.REQUEST_TIMEOUT,
-                    headers={
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                        'Accept': 'application/json, text/html, */*',
-                        'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
-                        'Referer': settings.GAME_URL
-                    }
-                )
+                state = self._endpoint_state.get((game_type, label))
+                response = await self._fetch(game_type, label, endpoint, state)
+                if response is None:
+                    continue
+                
+                if response.status_code == 304 and state:
+                    outcome = "hit"
+                    CHANGE_DETECTION_TOTAL.labels(game_type, "not_modified").inc()
+                    return UnchangedResult(state.data)
                 
                 if response.status_code == 200:
-                    # Try to parse as JSON first
-                    try:
-                        data = response.json()
-                        if self._is_valid_game_data(data, game_type):
-                            return data
-                    except:
-                        # If not JSON, parse HTML
-                        html_data = self._parse_html_for_game_data(response.text, game_type)
-                        if html_data:
-                            return html_data
+                    self._stage_times[game_type] = {"fetched_at": datetime.utcnow()}
+                    body_hash = await worker_pool.run_in_thread(_body_hash, response.content, size=len(response.content))
+                    if state and state.body_hash == body_hash:
+                        outcome = "hit"
+                        CHANGE_DETECTION_TOTAL.labels(game_type, "identical_body").inc()
+                        return UnchangedResult(state.data)
+                    
+                    # JSON, or the game data of the HTML page; large bodies are parsed in a worker process
+                    data = await worker_pool.run_in_process(
+                        parsing.parse_body, response.content, getattr(response, "encoding", None), game_type,
+                        size=len(response.content)
+                    )
+                    if not self._is_valid_game_data(data, game_type):
+                        data = None
+                    elif isinstance(data, list):
+                        data = self._with_history(data)
+                    if data:
+                        outcome = "hit"
+                        self._stage_times[game_type]["parsed_at"] = datetime.utcnow()
+                        CHANGE_DETECTION_TOTAL.labels(game_type, "changed").inc()
+                        self._endpoint_state[(game_type, label)] = _EndpointState(
+                            response.headers.get("ETag"), response.headers.get("Last-Modified"), body_hash, data
+                        )
+                        return data
+                else:
+                    outcome = "http_error"
                             
             except Exception as e:
+                outcome = "error"
                 logger.debug(f"Endpoint {endpoint} failed: {e}")
                 continue
+            finally:
+                ENDPOINT_PROBE_SECONDS.labels(game_type, label).observe(time.perf_counter() - start)
+                ENDPOINT_PROBE_TOTAL.labels(game_type, label, outcome).inc()
         
         return None
     
+    async def _fetch(self, game_type: str, source: str, endpoint: str, state: Optional[_EndpointState] = None):
+        """GET an endpoint through cloudscraper, or from the fixture corpus in replay mode.
+
+        With a previous good response (`state`), sends its validators so an
+        upstream that supports conditional requests can answer 304.
+        """
+        if self.replay:
+            return await self.replay.get(game_type, source)
+        
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'application/json, text/html, */*',
+            'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
+            'Referer': settings.GAME_URL
+        }
+        if state and settings.CRAWLER_CONDITIONAL_REQUESTS:
+            if state.etag:
+                headers['If-None-Match'] = state.etag
+            if state.last_modified:
+                headers['If-Modified-Since'] = state.last_modified
+        
+        start = time.perf_counter()
+        response = self.session.get(endpoint, timeout=settings.REQUEST_TIMEOUT, headers=headers)
+        if self.fixture_recorder:
+            self.fixture_recorder.record_response(
+                game_type, source, endpoint, response, time.perf_counter() - start
+            )
+        return response
+    
+    def _record_page(self, game_type: str, method_name: str, driver, start: float):
+        """Save the page a browser method parsed (record mode only)"""
+        if self.fixture_recorder:
+            self.fixture_recorder.record_page_source(
+                game_type, method_name, settings.GAME_URL, driver.page_source, time.perf_counter() - start
+            )
+    
+    async def _replay_page(self, game_type: str, method_name: str) -> Optional[Dict]:
+        """Extract game data from a recorded page source instead of launching a browser"""
+        driver = await self.replay.driver(game_type, method_name)
+        if driver is None:
+            return None
+        return await self._extract_with_stage_times(driver, game_type)
+    
     async def _crawl_with_selenium(self, game_type: str) -> Optional[Dict]:
         """Crawl using regular Selenium"""
+        if self.replay:
+            return await self._replay_page(game_type, "selenium")
+        
         from selenium import webdriver
         from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.support.ui import WebDriverWait
         
         options = Options()
         if settings.HEADLESS_BROWSER:
@@ -149,6 +361,7 @@ class GameCrawler:
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         
+        start = time.perf_counter()
         driver = webdriver.Chrome(options=options)
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         
@@ -162,20 +375,29 @@ class GameCrawler:
             )
             
             # Look for game data in page
-            game_data = self._extract_game_data_from_page(driver, game_type)
+            self._record_page(game_type, "selenium", driver, start)
+            game_data = await self._extract_with_stage_times(driver, game_type)
             return game_data
             
         finally:
+            memory_monitor.record_browser("selenium")
             driver.quit()
     
     async def _crawl_with_undetected_chrome(self, game_type: str) -> Optional[Dict]:
         """Crawl using undetected Chrome (most reliable for Cloudflare)"""
+        if self.replay:
+            return await self._replay_page(game_type, "undetected_chrome")
+        
+        import undetected_chromedriver as uc
+        from selenium.webdriver.support.ui import WebDriverWait
+
         options = uc.ChromeOptions()
         if settings.HEADLESS_BROWSER:
             options.add_argument('--headless')
         options.add_argument('--no-sandbox')
         options.add_argument('--disable-dev-shm-usage')
         
+        start = time.perf_counter()
         driver = uc.Chrome(options=options)
         
         try:
@@ -191,14 +413,35 @@ class GameCrawler:
             )
             
             # Extract game data
-            game_data = self._extract_game_data_from_page(driver, game_type)
+            self._record_page(game_type, "undetected_chrome", driver, start)
+            game_data = await self._extract_with_stage_times(driver, game_type)
             return game_data
             
         finally:
+            memory_monitor.record_browser("undetected_chrome")
             driver.quit()
     
+    async def _extract_with_stage_times(self, driver, game_type: str) -> Optional[Dict]:
+        """Extract game data from a loaded page, stamping fetched_at (page loaded) and parsed_at"""
+        stages = self._stage_times[game_type] = {"fetched_at": datetime.utcnow()}
+        data = self._extract_game_data_from_page(driver, game_type)
+        if data is None:
+            # Fallback: parse the whole page source, in a worker process when it is large
+            try:
+                page_source = driver.page_source
+                data = await worker_pool.run_in_process(
+                    parsing.parse_html_for_game_data, page_source, game_type, size=len(page_source)
+                )
+            except Exception as e:
+                logger.error(f"Error parsing page source: {e}")
+        if data:
+            stages["parsed_at"] = datetime.utcnow()
+        return data
+    
     def _extract_game_data_from_page(self, driver, game_type: str) -> Optional[Dict]:
         """Extract game data from loaded page"""
+        from selenium.webdriver.common.by import By
+
         try:
             # Look for common game data patterns
             selectors_to_try = [
@@ -227,7 +470,7 @@ class GameCrawler:
                                     data = json.loads(text)
                                 
                                 if self._is_valid_game_data(data, game_type):
-                                    return data
+                                    return self._with_history(data) if isinstance(data, list) else data
                             except:
                                 # Create data from text
                                 if text and any(char.isdigit() for char in text):
@@ -235,43 +478,16 @@ class GameCrawler:
                 except:
                     continue
             
-            # Fallback: look for any numeric patterns that might be results
-            page_source = driver.page_source
-            return self._parse_html_for_game_data(page_source, game_type)
+            # Nothing in the selected elements: the caller parses the whole page source
+            return None
             
         except Exception as e:
             logger.error(f"Error extracting game data: {e}")
             return None
 
     def _parse_html_for_game_data(self, html: str, game_type: str) -> Optional[Dict]:
-        """Parse HTML content for game data"""
-        from bs4 import BeautifulSoup
-        import re
-
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Look for patterns that might contain game results
-        patterns = [
-            r'result["\']?\s*:\s*["\']?(\w+)',
-            r'md5["\']?\s*:\s*["\']?([a-f0-9]{32})',
-            r'session["\']?\s*:\s*["\']?(\w+)',
-            r'"result_md5"\s*:\s*"([a-f0-9]{32})"',
-            r'data-result["\']?\s*=\s*["\']([^"\']+)',
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, html, re.IGNORECASE)
-            if matches:
-                # Create game data from matches
-                return {
-                    'game_type': game_type,
-                    'result': matches[0] if matches else None,
-                    'timestamp': datetime.now().isoformat(),
-                    'session_id': f"{game_type}_{int(time.time())}",
-                    'result_md5': self._generate_md5(str(matches[0]) if matches else str(time.time()))
-                }
-
-        return None
+        """Parse HTML content for game data (inline; crawls run it through the worker pool)"""
+        return parsing.parse_html_for_game_data(html, game_type)
 
     def _create_game_data_from_text(self, text: str, game_type: str) -> Dict:
         """Create game data structure from text"""
@@ -287,11 +503,14 @@ class GameCrawler:
             'timestamp': datetime.now().isoformat(),
             'session_id': f"{game_type}_{int(time.time())}",
             'result_md5': self._generate_md5(result_value),
-            'raw_text': text
+            'raw_text': text,
+            parsing.FALLBACK_FIELD: True,
         }
 
     def _is_valid_game_data(self, data: Dict, game_type: str) -> bool:
-        """Check if data is valid game data"""
+        """Check if data is valid game data (an object, or a list of recent rounds)"""
+        if isinstance(data, list):
+            return any(self._is_round(item) for item in data)
         if not isinstance(data, dict):
             return False
 
@@ -306,45 +525,141 @@ class GameCrawler:
 
     def _generate_md5(self, data: str) -> str:
         """Generate MD5 hash for data"""
-        return hashlib.md5(data.encode()).hexdigest()
+        return parsing.generate_md5(data)
+
+    _is_round = staticmethod(parsing.is_round)
+
+    _round_md5 = staticmethod(parsing.round_md5)
+
+    def _with_history(self, rounds: List) -> Dict:
+        """Game data object for a bare list of rounds: the latest round, with the list as its history"""
+        ordered = self._extract_rounds({"history": rounds})
+        return dict(ordered[-1][0], history=rounds)
+
+    def _extract_rounds(self, result_data: Dict) -> List[Tuple[Dict, str]]:
+        """(round, md5) for the object itself and every round in its history lists, oldest first
+
+        Duplicates (same MD5 or round id) keep their first, most complete occurrence.
+        Rounds are ordered by timestamp when all have one, else taken to be listed latest first.
+        """
+        candidates = [result_data] if self._is_round(result_data) else []
+        for field in ROUND_LIST_FIELDS:
+            items = result_data.get(field)
+            if isinstance(items, list):
+                candidates.extend(item for item in items if self._is_round(item))
+
+        rounds, seen = [], set()
+        for round_data in candidates:
+            result_md5, session_id = self._round_md5(round_data), round_data.get('session_id')
+            if result_md5 in seen or (session_id and ('session', session_id) in seen):
+                continue
+            seen.add(result_md5)
+            if session_id:
+                seen.add(('session', session_id))
+            rounds.append((round_data, result_md5))
+            if len(rounds) >= settings.CRAWLER_CATCHUP_MAX_ROUNDS:
+                break
+
+        times = [freshness.upstream_time(round_data) for round_data, _ in rounds]
+        if all(times):
+            return [entry for _, entry in sorted(zip(times, rounds), key=lambda pair: pair[0])]
+        return rounds[::-1]
+
+    async def _missing_rounds(self, game_type: str, rounds: List[Tuple[Dict, str]]) -> List[Tuple[Dict, str]]:
+        """Rounds not stored yet; brand-new MD5s (Bloom filter negatives) skip the lookup"""
+        maybe_stored = [result_md5 for _, result_md5 in rounds if await known_md5s.might_contain(result_md5)]
+        if not maybe_stored:
+            return rounds
+        stored_md5s, stored_sessions = await find_stored_rounds(
+            game_type, [(result_md5, round_data.get('session_id')) for round_data, result_md5 in rounds]
+        )
+        for result_md5 in maybe_stored:
+            if result_md5 not in stored_md5s:
+                known_md5s.false_positive()
+        return [
+            (round_data, result_md5) for round_data, result_md5 in rounds
+            if result_md5 not in stored_md5s and round_data.get('session_id') not in stored_sessions
+        ]
 
     async def _process_game_result(self, game_type: str, result_data: Dict):
-        """Process and save game result"""
+        """Process and save game result, with any earlier rounds it lists that are not stored yet"""
+        payload = getattr(result_data, "original", result_data)
         try:
-            # Generate session ID if not present
-            session_id = result_data.get('session_id', f"{game_type}_{int(time.time())}")
-
-            # Generate MD5 if not present
-            result_md5 = result_data.get('result_md5')
-            if not result_md5:
-                result_str = str(result_data.get('result', '')) + str(result_data.get('timestamp', ''))
-                result_md5 = self._generate_md5(result_str)
+            rounds = self._extract_rounds(result_data)
+            if not rounds:
+                logger.debug(f"No rounds in {game_type} data")
+                return
+            result_md5 = rounds[-1][1]
 
             # Check if this is a new result
             last_md5 = self.last_results.get(game_type)
             if last_md5 == result_md5:
                 logger.debug(f"No new result for {game_type}")
+                self.last_payloads[game_type] = payload
                 return
 
-            # Save to database
-            db_result = await save_game_result(
-                game_type=game_type,
-                session_id=session_id,
-                result_md5=result_md5,
-                result_data=json.dumps(result_data)
-            )
+            # Rounds up to the last one this process stored are done; the rest may have been
+            # stored earlier (before a restart, or by another crawler)
+            md5s = [round_md5 for _, round_md5 in rounds]
+            if last_md5 in md5s:
+                rounds = rounds[md5s.index(last_md5) + 1:]
+            if result_data.get(parsing.FALLBACK_FIELD):
+                # A value made up from page text comes up again in later rounds, so only the
+                # consecutive check above applies, not the history-wide one
+                missing = rounds
+            else:
+                missing = await self._missing_rounds(game_type, rounds)
+            if not missing:
+                logger.debug(f"{game_type} result {result_md5} already stored")
+                self.last_results[game_type] = result_md5
+                self.last_payloads[game_type] = payload
+                return
 
-            # Update last result
+            # Save to database in one transaction, oldest first, with the times this fetch passed each crawl stage
+            stages = self._stage_times.pop(game_type, {})
+            default_session_id = f"{game_type}_{int(time.time())}"
+            db_results = await save_game_results(game_type, [
+                {
+                    "session_id": round_data.get('session_id', default_session_id),
+                    "result_md5": round_md5,
+                    # The latest round keeps the whole object (with its history), as before
+                    "result_data": json.dumps(result_data if round_data is result_data else round_data),
+                    "stages": {**stages, "upstream_at": freshness.upstream_time(round_data)},
+                }
+                for round_data, round_md5 in missing
+            ])
             self.last_results[game_type] = result_md5
+            self.last_payloads[game_type] = payload
+            poll_scheduler.found(game_type, [(db_result.upstream_at, db_result.fetched_at) for db_result in db_results])
+            for (round_data, round_md5), db_result in zip(missing, db_results):
+                for stage in ("fetched", "parsed", "persisted"):
+                    freshness.observe(game_type, stage, db_result.upstream_at, getattr(db_result, f"{stage}_at"))
+                known_md5s.add(round_md5, db_result.id)
+                kind = "latest" if round_md5 == result_md5 else "catch_up"
+                RESULTS_INGESTED_TOTAL.labels(game_type, kind).inc()
 
-            # Send notifications
-            await self.notification_service.send_new_result_notification(
-                game_type=game_type,
-                result_data=result_data,
-                result_md5=result_md5
-            )
+            # Let API workers serve the new results from shared memory
+            await publish_latest_results()
+            response_cache.invalidate()
+
+            # Send notifications, oldest first, for the newest CRAWLER_CATCHUP_NOTIFY_MAX rounds
+            notify = list(zip(missing, db_results))[-max(1, settings.CRAWLER_CATCHUP_NOTIFY_MAX):]
+            notified: Dict[int, datetime] = {}
+            for (round_data, round_md5), db_result in notify:
+                await self.notification_service.send_new_result_notification(
+                    game_type=game_type,
+                    result_data=result_data if round_data is result_data else round_data,
+                    result_md5=round_md5
+                )
+                notified_at = datetime.utcnow()
+                freshness.observe(game_type, "notified", db_result.upstream_at, notified_at)
+                notified[db_result.id] = notified_at
+            await mark_results_notified(notified)
 
-            logger.info(f"New {game_type} result saved: {result_md5}")
+            if len(missing) > 1:
+                logger.info(f"New {game_type} result saved: {result_md5} (+{len(missing) - 1} earlier rounds caught up)")
+            else:
+                logger.info(f"New {game_type} result saved: {result_md5}")
 
         except Exception as e:
             logger.error(f"Error processing game result for {game_type}: {e}")
@@ -1,18 +1,96 @@
 """
 Database models and initialization
 """
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, Float
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, Float, Index, LargeBinary, case, delete, inspect, select, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.orm import aliased, sessionmaker
 from sqlalchemy.sql import func
-from datetime import datetime
+from datetime import datetime, timedelta
+import functools
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 from config import settings
+from services.metrics import metrics
+from services.payloads import payload_codec, train_dictionary
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+T = TypeVar("T")
+
+# Channel the crawler NOTIFYs on after inserting a result (PostgreSQL only)
+RESULTS_CHANNEL = "game_results"
+# NOTIFY payloads are capped at 8000 bytes; larger rows are announced by id only
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+DATABASE_URL = make_url(settings.DATABASE_URL)
+IS_POSTGRES = DATABASE_URL.get_backend_name() in ("postgresql", "postgres")
+
+def database_url(driver: str) -> str:
+    """DATABASE_URL for a given PostgreSQL driver (also accepts the postgres:// scheme)"""
+    return DATABASE_URL.set(drivername=f"postgresql+{driver}").render_as_string(hide_password=False)
+
+def _pool_options() -> dict:
+    """Pool sizing for a server database; SQLite keeps SQLAlchemy's defaults"""
+    if not IS_POSTGRES:
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        # Replace connections the server or a proxy closed while they sat idle
+        "pool_pre_ping": True,
+    }
+
+# Create database engines. The sync engine serves startup, stats, leader
+# election and the importer; with PostgreSQL the request/crawler helpers run
+# on an asyncpg pool so they never block the event loop.
+if IS_POSTGRES:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    
+    engine = create_engine(
+        database_url("psycopg2"), echo=settings.DEBUG,
+        connect_args={"application_name": settings.APP_NAME}, **_pool_options()
+    )
+    async_engine = create_async_engine(
+        database_url("asyncpg"), echo=settings.DEBUG,
+        connect_args={"server_settings": {"application_name": settings.APP_NAME}}, **_pool_options()
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+    async_engine = None
+    AsyncSessionLocal = None
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+DB_CALL_SECONDS = metrics.histogram(
+    "db_call_duration_seconds", "Duration of database helper calls", ["operation"]
+)
+DB_CALL_ERRORS = metrics.counter(
+    "db_call_errors_total", "Database helper calls that raised", ["operation"]
+)
+
+def _instrumented(func):
+    """Record duration and failures of an async database helper"""
+    histogram = DB_CALL_SECONDS.labels(func.__name__)
+    errors = DB_CALL_ERRORS.labels(func.__name__)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
 class GameResult(Base):
     """Game result model"""
     __tablename__ = "game_results"
@@ -20,10 +98,63 @@ class GameResult(Base):
     id = Column(Integer, primary_key=True, index=True)
     game_type = Column(String(50), nullable=False, index=True)  # tai_xiu, ban_do
     session_id = Column(String(100), nullable=False, index=True)
-    result_md5 = Column(String(32), nullable=False)
-    result_data = Column(Text)  # JSON string of full result
+    result_md5 = Column(String(32), nullable=False, index=True)  # exact and prefix (range) lookups
+    _result_data = Column("result_data", Text)  # JSON string of full result (NULL when compressed)
+    payload_codec = Column(String(20))  # NULL = plain JSON; "zstd:3", "zlib:1", ... (services.payloads)
+    payload_blob = Column(LargeBinary)  # compressed result_data
     timestamp = Column(DateTime, default=func.now(), index=True)
     created_at = Column(DateTime, default=func.now())
+    # When the result passed each pipeline stage, UTC (services.freshness); NULL for imported rows
+    upstream_at = Column(DateTime)
+    fetched_at = Column(DateTime)
+    parsed_at = Column(DateTime)
+    persisted_at = Column(DateTime)
+    notified_at = Column(DateTime)
+    first_served_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Serves "latest N for a game" (single and batch) straight from the index
+        Index("ix_game_results_game_type_timestamp_id", "game_type", "timestamp", "id"),
+    )
+    # Fetch the SQL-side timestamp defaults with the INSERT (RETURNING) for rollups and NOTIFY
+    __mapper_args__ = {"eager_defaults": True}
+    
+    @property
+    def result_data(self) -> Optional[str]:
+        """Payload JSON text, decompressed on first access"""
+        if self.payload_codec is None:
+            return self._result_data
+        decoded = self.__dict__.get("_decoded_payload")
+        if decoded is None:
+            decoded = self.__dict__["_decoded_payload"] = payload_codec.decode(self.payload_codec, self.payload_blob)
+        return decoded
+    
+    @result_data.setter
+    def result_data(self, value: Optional[str]):
+        """Store the payload uncompressed"""
+        self._result_data, self.payload_codec, self.payload_blob = value, None, None
+        self.__dict__.pop("_decoded_payload", None)
+    
+    def store_payload(self, value: Optional[str]):
+        """Store the payload compressed with the current dictionary of this game (when it shrinks)"""
+        self._result_data, self.payload_codec, self.payload_blob = payload_codec.encode(self.game_type, value)
+        self.__dict__["_decoded_payload"] = value
+    
+    def to_dict(self, result_data: Optional[dict] = None) -> dict:
+        """API representation with result_data decoded (or `result_data`, when already decoded)"""
+        if result_data is None:
+            try:
+                result_data = json.loads(self.result_data) if self.result_data else {}
+            except ValueError:
+                result_data = {}
+        return {
+            "id": self.id,
+            "game_type": self.game_type,
+            "session_id": self.session_id,
+            "result_md5": self.result_md5,
+            "result_data": result_data,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None
+        }
     
 class GameSession(Base):
     """Game session model"""
@@ -66,10 +197,203 @@ class APILog(Base):
     response_status = Column(Integer)
     response_time = Column(Float)  # in seconds
     timestamp = Column(DateTime, default=func.now(), index=True)
+    
+    __mapper_args__ = {"eager_defaults": True}
+
+class ResultRollup(Base):
+    """Results stored per game per minute/hour bucket, maintained as results are saved"""
+    __tablename__ = "result_rollups"
+    
+    resolution = Column(String(6), primary_key=True)  # minute, hour
+    bucket_start = Column(DateTime, primary_key=True)
+    game_type = Column(String(50), primary_key=True)
+    result_count = Column(Integer, nullable=False, default=0)
+
+class APIRollup(Base):
+    """API requests per route/status class per minute/hour bucket, maintained as requests are logged"""
+    __tablename__ = "api_rollups"
+    
+    resolution = Column(String(6), primary_key=True)  # minute, hour
+    bucket_start = Column(DateTime, primary_key=True)
+    method = Column(String(10), primary_key=True)
+    route = Column(String(255), primary_key=True)  # route template (raw path for rows rebuilt from api_logs)
+    status_class = Column(String(3), primary_key=True)  # 2xx, 4xx, ...
+    request_count = Column(Integer, nullable=False, default=0)
+    total_response_time = Column(Float, nullable=False, default=0.0)
+    max_response_time = Column(Float, nullable=False, default=0.0)
+
+class LatencySketch(Base):
+    """One worker's latency sketch for a route/status class over one minute (merged across workers on read)"""
+    __tablename__ = "latency_sketches"
+    
+    bucket_start = Column(DateTime, primary_key=True)
+    route = Column(String(255), primary_key=True)
+    status_class = Column(String(3), primary_key=True)
+    worker_id = Column(String(100), primary_key=True)
+    sketch = Column(Text, nullable=False)  # JSON (services.sketch.DDSketch.to_dict)
+
+class PayloadDictionary(Base):
+    """Compression dictionary trained on one game's result payloads"""
+    __tablename__ = "payload_dictionaries"
+    
+    id = Column(Integer, primary_key=True)
+    game_type = Column(String(50), nullable=False, index=True)
+    codec = Column(String(10), nullable=False)  # zstd, zlib
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer)
+    created_at = Column(DateTime, default=func.now())
+
+class WebhookSubscriber(Base):
+    """Registered receiver of new-result webhooks"""
+    __tablename__ = "webhook_subscribers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(500), unique=True, nullable=False)
+    secret = Column(String(255))  # HMAC-SHA256 signing key; WEBHOOK_SECRET when empty
+    game_types = Column(String(255))  # comma-separated; empty = every game
+    description = Column(String(255))
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __mapper_args__ = {"eager_defaults": True}
+    
+    @property
+    def game_type_list(self) -> List[str]:
+        return [game_type for game_type in (self.game_types or "").split(",") if game_type]
+    
+    def to_dict(self) -> dict:
+        """API representation (the secret itself is never returned)"""
+        return {
+            "id": self.id,
+            "url": self.url,
+            "has_secret": bool(self.secret),
+            "game_types": self.game_type_list,
+            "description": self.description,
+            "active": self.active,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+ROLLUP_RESOLUTIONS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1)}
+
+def _bucket_starts(timestamp: datetime) -> Dict[str, datetime]:
+    minute = timestamp.replace(second=0, microsecond=0)
+    return {"minute": minute, "hour": minute.replace(minute=0)}
+
+def _upsert_rollups(db, model, rows: List[Dict], additive: List[str] = (), maximum: List[str] = (),
+                    replace: List[str] = ()):
+    """INSERT rollup rows, adding to (taking the max with, or replacing) buckets that already exist"""
+    insert = postgresql.insert if IS_POSTGRES else sqlite.insert
+    # One statement executed for every row (executemany): compiled once and cached, however many rows
+    statement = insert(model)
+    table = model.__table__
+    updates = {column: table.c[column] + statement.excluded[column] for column in additive}
+    greatest = func.greatest if IS_POSTGRES else func.max
+    updates.update({column: greatest(table.c[column], statement.excluded[column]) for column in maximum})
+    updates.update({column: statement.excluded[column] for column in replace})
+    db.execute(statement.on_conflict_do_update(index_elements=list(table.primary_key.columns), set_=updates), rows)
 
+def _status_class(status: Optional[int]) -> str:
+    return f"{status // 100}xx" if status else "unknown"
+
+@_instrumented
 async def init_database():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    existing = set(inspect(engine).get_table_names())
+    try:
+        Base.metadata.create_all(bind=engine)
+    except OperationalError:
+        # Another worker created a table between the existence check and CREATE TABLE
+        Base.metadata.create_all(bind=engine)
+    # Rollups start with whatever the raw tables already hold, so retention never drops uncounted rows
+    if ResultRollup.__tablename__ not in existing and GameResult.__tablename__ in existing:
+        _rebuild_rollups(GameResult)
+    if APIRollup.__tablename__ not in existing and APILog.__tablename__ in existing:
+        _rebuild_rollups(APILog)
+    # create_all skips tables that exist; add columns and indexes introduced since they were created
+    _add_missing_columns(existing)
+    _register_payload_dictionaries()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except OperationalError:
+                pass  # Created concurrently by another worker
+
+def _add_missing_columns(existing: set):
+    """ALTER TABLE ADD COLUMN for nullable model columns an older schema lacks"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present or not column.nullable:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(ddl))
+            except (OperationalError, ProgrammingError):
+                pass  # Added concurrently by another worker
+
+def _register_payload_dictionaries():
+    """Make every trained dictionary available to the payload codec"""
+    with SessionLocal() as db:
+        for dictionary in db.query(PayloadDictionary).order_by(PayloadDictionary.id):
+            payload_codec.register(dictionary.id, dictionary.codec, dictionary.data, dictionary.game_type)
+
+def _load_payload_dictionary(dictionary_id: int) -> Optional[Tuple[str, bytes]]:
+    """Dictionary trained after startup (by another process)"""
+    with SessionLocal() as db:
+        dictionary = db.get(PayloadDictionary, dictionary_id)
+        return (dictionary.codec, dictionary.data) if dictionary else None
+
+payload_codec.loader = _load_payload_dictionary
+
+def train_payload_dictionaries(game_types: Optional[List[str]] = None, samples: Optional[int] = None,
+                               size: Optional[int] = None) -> Dict[str, int]:
+    """Train a dictionary per game on its most recent payloads; new payloads use it from now on"""
+    if payload_codec.codec is None:
+        raise RuntimeError("Payload compression is disabled (PAYLOAD_COMPRESSION=none)")
+    samples = samples or settings.PAYLOAD_DICT_SAMPLES
+    size = size or settings.PAYLOAD_DICT_SIZE
+    trained = {}
+    with SessionLocal() as db:
+        if game_types is None:
+            game_types = [row[0] for row in db.query(GameResult.game_type).distinct()]
+        for game_type in game_types:
+            rows = (db.query(GameResult).filter(GameResult.game_type == game_type)
+                    .order_by(GameResult.id.desc()).limit(samples).all())
+            payloads = [row.result_data.encode() for row in rows if row.result_data]
+            if len(payloads) < 10:
+                continue  # Too few payloads to learn anything
+            dictionary = PayloadDictionary(game_type=game_type, codec=payload_codec.codec,
+                                           data=train_dictionary(payload_codec.codec, payloads, size),
+                                           sample_count=len(payloads))
+            db.add(dictionary)
+            db.commit()
+            payload_codec.register(dictionary.id, dictionary.codec, dictionary.data, game_type)
+            trained[game_type] = dictionary.id
+    return trained
+
+async def _run_in_session(work: Callable[..., T]) -> T:
+    """Run work(session) on the asyncpg pool (PostgreSQL) or a sync session (SQLite)"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(work)
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        return work(db)
+    finally:
+        db.close()
+
+async def dispose_engines():
+    """Close pooled connections (application shutdown)"""
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
 
 def get_db():
     """Get database session"""
@@ -80,40 +404,234 @@ def get_db():
         db.close()
 
 # Database utility functions
-async def save_game_result(game_type: str, session_id: str, result_md5: str, result_data: str):
-    """Save game result to database"""
-    db = SessionLocal()
-    try:
-        result = GameResult(
-            game_type=game_type,
-            session_id=session_id,
-            result_md5=result_md5,
-            result_data=result_data
-        )
-        db.add(result)
+def _insert_game_result(db, game_type: str, session_id: str, result_md5: str, result_data: str,
+                        stages: Optional[Dict[str, datetime]] = None) -> GameResult:
+    """Add one result with its rollup counts and NOTIFY (committed by the caller)"""
+    result = GameResult(
+        game_type=game_type,
+        session_id=session_id,
+        result_md5=result_md5,
+        persisted_at=datetime.utcnow(),
+        **(stages or {})
+    )
+    result.store_payload(result_data)
+    db.add(result)
+    db.flush()
+    _upsert_rollups(db, ResultRollup, [
+        {"resolution": resolution, "bucket_start": bucket_start, "game_type": game_type, "result_count": 1}
+        for resolution, bucket_start in _bucket_starts(result.timestamp).items()
+    ], additive=["result_count"])
+    if IS_POSTGRES and settings.DB_NOTIFY_ENABLED:
+        _notify_new_result(db, result)
+    return result
+
+@_instrumented
+async def save_game_result(game_type: str, session_id: str, result_md5: str, result_data: str,
+                           stages: Optional[Dict[str, datetime]] = None):
+    """Save game result to database (`stages`: upstream_at/fetched_at/parsed_at stamps of the crawl)"""
+    def insert(db):
+        result = _insert_game_result(db, game_type, session_id, result_md5, result_data, stages)
         db.commit()
-        db.refresh(result)
         return result
-    finally:
-        db.close()
+    
+    return await _run_in_session(insert)
+
+@_instrumented
+async def save_game_results(game_type: str, rounds: List[Dict]) -> List[GameResult]:
+    """Save several results in one transaction, in the given order (oldest first, so ids follow rounds)
+
+    Each round is a dict of save_game_result's arguments (session_id, result_md5, result_data, stages).
+    """
+    def insert(db):
+        results = [_insert_game_result(db, game_type, **round_) for round_ in rounds]
+        db.commit()
+        return results
+    
+    return await _run_in_session(insert)
+
+def _notify_new_result(db, result: GameResult):
+    """Queue a NOTIFY for the new row; PostgreSQL delivers it when the insert commits"""
+    payload = json.dumps(result.to_dict(), ensure_ascii=False)
+    if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+        payload = json.dumps({"id": result.id, "game_type": result.game_type, "truncated": True})
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": RESULTS_CHANNEL, "payload": payload})
+
+@_instrumented
+async def mark_results_notified(stamps: Dict[int, datetime]):
+    """Stamp notified_at (result id -> time its notifications were queued) in one UPDATE"""
+    if not stamps:
+        return
+    
+    def update(db):
+        db.query(GameResult).filter(GameResult.id.in_(list(stamps))).update(
+            {GameResult.notified_at: case(stamps, value=GameResult.id)}, synchronize_session=False
+        )
+        db.commit()
+    
+    await _run_in_session(update)
+
+@_instrumented
+async def mark_results_served(result_ids: List[int], at: datetime):
+    """Stamp first_served_at on crawled results not served by any worker yet"""
+    def update(db):
+        db.query(GameResult).filter(
+            GameResult.id.in_(result_ids),
+            GameResult.first_served_at.is_(None),
+            GameResult.persisted_at.isnot(None)
+        ).update({GameResult.first_served_at: at}, synchronize_session=False)
+        db.commit()
+    
+    await _run_in_session(update)
+
+@_instrumented
+async def load_freshness_rows(since: datetime) -> List[tuple]:
+    """(game_type, upstream_at, ..., first_served_at) of results persisted since `since`"""
+    columns = [GameResult.game_type, GameResult.upstream_at, GameResult.fetched_at, GameResult.parsed_at,
+               GameResult.persisted_at, GameResult.notified_at, GameResult.first_served_at]
+    return await _run_in_session(lambda db: [tuple(row) for row in db.query(*columns).filter(
+        # timestamp is indexed and written with the row; persisted_at narrows it to crawled results
+        GameResult.timestamp >= since - timedelta(minutes=5),
+        GameResult.persisted_at >= since
+    )])
+
+@_instrumented
+async def load_round_times(game_type: str, limit: int) -> List[Tuple[Optional[datetime], Optional[datetime]]]:
+    """(upstream_at, fetched_at) of the last `limit` results of a game, oldest first (poll scheduling)"""
+    def query_times(db):
+        rows = (db.query(GameResult.upstream_at, GameResult.fetched_at)
+                .filter(GameResult.game_type == game_type)
+                .order_by(GameResult.timestamp.desc(), GameResult.id.desc())
+                .limit(limit).all())
+        return [tuple(row) for row in reversed(rows)]
 
+    return await _run_in_session(query_times)
+
+@_instrumented
 async def get_latest_results(game_type: str = None, limit: int = 10):
     """Get latest game results"""
-    db = SessionLocal()
-    try:
+    def query_latest(db):
         query = db.query(GameResult)
         if game_type:
             query = query.filter(GameResult.game_type == game_type)
-        results = query.order_by(GameResult.timestamp.desc()).limit(limit).all()
-        return results
-    finally:
-        db.close()
+        # id breaks ties between rows saved within the same second
+        return query.order_by(GameResult.timestamp.desc(), GameResult.id.desc()).limit(limit).all()
+    
+    return await _run_in_session(query_latest)
+
+@_instrumented
+async def get_result_by_id(result_id: int):
+    """Get one game result by primary key"""
+    return await _run_in_session(lambda db: db.get(GameResult, result_id))
+
+@_instrumented
+async def find_results_by_md5(md5: str, game_type: Optional[str] = None, limit: int = 50,
+                              prefix: bool = False) -> List[GameResult]:
+    """Results with this MD5, or whose MD5 starts with it (as an index range scan)"""
+    def query_md5(db):
+        query = db.query(GameResult)
+        if prefix:
+            # md5 >= 'ab' AND md5 < 'ac' walks the index on any backend (LIKE may not)
+            upper = md5[:-1] + chr(ord(md5[-1]) + 1)
+            query = query.filter(GameResult.result_md5 >= md5, GameResult.result_md5 < upper)
+        else:
+            query = query.filter(GameResult.result_md5 == md5)
+        if game_type:
+            query = query.filter(GameResult.game_type == game_type)
+        return query.order_by(GameResult.result_md5, GameResult.id).limit(limit).all()
+    
+    return await _run_in_session(query_md5)
+
+@_instrumented
+async def find_stored_rounds(game_type: str, rounds: List[Tuple[str, Optional[str]]]) -> Tuple[set, set]:
+    """Which of the (md5, session id) rounds of one game are stored: (stored MD5s, stored session ids)
 
+    Session ids are only looked up for rounds whose MD5 is not stored (rounds seen
+    before under a different MD5, e.g. once from a page script and once from a table).
+    """
+    def query_stored(db):
+        # Filter on the selective column alone: with game_type in the WHERE clause SQLite
+        # prefers the (game_type, timestamp, id) index and scans the whole game
+        md5s = [md5 for md5, _ in rounds]
+        stored_md5s = {md5 for stored_game, md5 in db.query(GameResult.game_type, GameResult.result_md5)
+                       .filter(GameResult.result_md5.in_(md5s)) if stored_game == game_type}
+        session_ids = [session_id for md5, session_id in rounds if session_id and md5 not in stored_md5s]
+        stored_sessions = set()
+        if session_ids:
+            stored_sessions = {session_id for stored_game, session_id in
+                               db.query(GameResult.game_type, GameResult.session_id)
+                               .filter(GameResult.session_id.in_(session_ids)) if stored_game == game_type}
+        return stored_md5s, stored_sessions
+    
+    return await _run_in_session(query_stored)
+
+@_instrumented
+async def find_results_by_session(session_id: str, game_type: Optional[str] = None,
+                                  limit: int = 50) -> List[GameResult]:
+    """Results recorded under a session id, newest first"""
+    def query_session(db):
+        query = db.query(GameResult).filter(GameResult.session_id == session_id)
+        if game_type:
+            query = query.filter(GameResult.game_type == game_type)
+        return query.order_by(GameResult.timestamp.desc(), GameResult.id.desc()).limit(limit).all()
+    
+    return await _run_in_session(query_session)
+
+@_instrumented
+async def count_results() -> int:
+    """Number of stored results"""
+    return await _run_in_session(lambda db: db.query(func.count(GameResult.id)).scalar() or 0)
+
+@_instrumented
+async def get_result_md5s_after(after_id: int, limit: int) -> List[Tuple[int, str]]:
+    """(id, result_md5) pairs with id above `after_id`, in id order (Bloom filter loading)"""
+    return await _run_in_session(lambda db: [
+        tuple(row) for row in db.execute(
+            select(GameResult.id, GameResult.result_md5)
+            .where(GameResult.id > after_id)
+            .order_by(GameResult.id)
+            .limit(limit)
+        )
+    ])
+
+@_instrumented
+async def get_latest_results_batch(rows_per_game: Dict[str, int]) -> Dict[str, List[GameResult]]:
+    """Latest N results for several games in one query.
+
+    Each game is a LIMITed branch of a UNION ALL walking the
+    (game_type, timestamp, id) index, so the cost grows with the rows
+    returned rather than with table size (a ROW_NUMBER() window would rank
+    every row of every requested game first).
+    """
+    if not rows_per_game:
+        return {}
+    
+    def query_batch(db):
+        branches = [
+            select(GameResult)
+            .where(GameResult.game_type == game_type)
+            .order_by(GameResult.timestamp.desc(), GameResult.id.desc())
+            .limit(limit)
+            .subquery()
+            .select()
+            for game_type, limit in rows_per_game.items()
+        ]
+        combined = union_all(*branches).subquery() if len(branches) > 1 else branches[0].subquery()
+        return db.query(aliased(GameResult, combined)).all()
+    
+    rows = await _run_in_session(query_batch)
+    results = {game_type: [] for game_type in rows_per_game}
+    for row in rows:
+        results[row.game_type].append(row)
+    for game_rows in results.values():
+        # UNION ALL does not promise branch order
+        game_rows.sort(key=lambda row: (row.timestamp or datetime.min, row.id), reverse=True)
+    return results
+
+@_instrumented
 async def log_api_request(endpoint: str, method: str, ip_address: str, user_agent: str, 
-                         response_status: int, response_time: float):
+                         response_status: int, response_time: float, route: Optional[str] = None):
     """Log API request"""
-    db = SessionLocal()
-    try:
+    def insert(db):
         log_entry = APILog(
             endpoint=endpoint,
             method=method,
@@ -123,6 +641,271 @@ async def log_api_request(endpoint: str, method: str, ip_address: str, user_agen
             response_time=response_time
         )
         db.add(log_entry)
+        db.flush()
+        _upsert_rollups(db, APIRollup, [
+            {
+                "resolution": resolution, "bucket_start": bucket_start, "method": method,
+                "route": route or endpoint, "status_class": _status_class(response_status),
+                "request_count": 1, "total_response_time": response_time, "max_response_time": response_time
+            }
+            for resolution, bucket_start in _bucket_starts(log_entry.timestamp).items()
+        ], additive=["request_count", "total_response_time"], maximum=["max_response_time"])
+        db.commit()
+    
+    await _run_in_session(insert)
+
+def _minute_bucket(column):
+    """SQL expression truncating a timestamp column to its minute"""
+    if IS_POSTGRES:
+        return func.date_trunc("minute", column)
+    return func.strftime("%Y-%m-%d %H:%M:00", column)
+
+def _rebuild_rollups(model, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Recompute the rollups of a raw table (GameResult or APILog) over whole hours from raw rows.
+
+    Used when the rollup tables are first created; live writes and bulk
+    imports (add_result_rollups) maintain rollups themselves.
+    """
+    rollup = ResultRollup if model is GameResult else APIRollup
+    db = SessionLocal()
+    try:
+        if start is None or end is None:
+            start, end = db.query(func.min(model.timestamp), func.max(model.timestamp)).one()
+            if start is None:
+                return
+        start = _bucket_starts(start)["hour"]
+        end = _bucket_starts(end)["hour"] + ROLLUP_RESOLUTIONS["hour"]
+        
+        minute = _minute_bucket(model.timestamp).label("bucket")
+        in_range = (model.timestamp >= start, model.timestamp < end)
+        buckets: Dict[tuple, Dict] = {}
+        if model is GameResult:
+            query = db.query(minute, GameResult.game_type, func.count()).filter(*in_range).group_by(minute, GameResult.game_type)
+            for bucket, game_type, count in query:
+                for resolution, bucket_start in _bucket_starts(_as_datetime(bucket)).items():
+                    row = buckets.setdefault((resolution, bucket_start, game_type), {
+                        "resolution": resolution, "bucket_start": bucket_start, "game_type": game_type, "result_count": 0
+                    })
+                    row["result_count"] += count
+        else:
+            status_class = (APILog.response_status // 100).label("status_class")
+            query = db.query(
+                minute, APILog.method, APILog.endpoint, status_class,
+                func.count(), func.coalesce(func.sum(APILog.response_time), 0.0), func.coalesce(func.max(APILog.response_time), 0.0)
+            ).filter(*in_range).group_by(minute, APILog.method, APILog.endpoint, status_class)
+            for bucket, method, endpoint, status, count, total, longest in query:
+                status_class = f"{int(status)}xx" if status else "unknown"
+                for resolution, bucket_start in _bucket_starts(_as_datetime(bucket)).items():
+                    row = buckets.setdefault((resolution, bucket_start, method, endpoint, status_class), {
+                        "resolution": resolution, "bucket_start": bucket_start, "method": method, "route": endpoint,
+                        "status_class": status_class, "request_count": 0, "total_response_time": 0.0,
+                        "max_response_time": 0.0
+                    })
+                    row["request_count"] += count
+                    row["total_response_time"] += total
+                    row["max_response_time"] = max(row["max_response_time"], longest)
+        
+        db.execute(delete(rollup).where(rollup.bucket_start >= start, rollup.bucket_start < end))
+        if buckets:
+            db.execute(rollup.__table__.insert(), list(buckets.values()))
         db.commit()
     finally:
         db.close()
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def add_result_rollups(db, counts: Dict[Tuple[datetime, str], int]):
+    """Add result counts per (minute bucket, game_type) to the rollups, in the caller's transaction.
+
+    For bulk inserts that bypass save_game_result. Counts are added, never
+    recomputed, so hourly rollups of rows retention already deleted survive.
+    """
+    buckets: Dict[tuple, Dict] = {}
+    for (minute, game_type), count in counts.items():
+        for resolution, bucket_start in _bucket_starts(minute).items():
+            row = buckets.setdefault((resolution, bucket_start, game_type), {
+                "resolution": resolution, "bucket_start": bucket_start, "game_type": game_type, "result_count": 0
+            })
+            row["result_count"] += count
+    if buckets:
+        _upsert_rollups(db, ResultRollup, list(buckets.values()), additive=["result_count"])
+
+def _time_window(resolution: str, start: Optional[datetime], end: Optional[datetime], buckets: int):
+    """Default to the latest `buckets` buckets ending now (UTC)"""
+    end = end or datetime.utcnow()
+    start = start or _bucket_starts(end)[resolution] - ROLLUP_RESOLUTIONS[resolution] * (buckets - 1)
+    return start, end
+
+@_instrumented
+async def get_result_timeseries(resolution: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                game_type: Optional[str] = None, buckets: int = 60) -> List[Dict]:
+    """Result counts per bucket (and game) from the rollup table"""
+    start, end = _time_window(resolution, start, end, buckets)
+    
+    def query_rollups(db):
+        query = db.query(ResultRollup).filter(
+            ResultRollup.resolution == resolution,
+            ResultRollup.bucket_start >= start,
+            ResultRollup.bucket_start <= end
+        )
+        if game_type:
+            query = query.filter(ResultRollup.game_type == game_type)
+        return query.order_by(ResultRollup.bucket_start, ResultRollup.game_type).all()
+    
+    return [
+        {"bucket_start": row.bucket_start.isoformat(), "game_type": row.game_type, "count": row.result_count}
+        for row in await _run_in_session(query_rollups)
+    ]
+
+@_instrumented
+async def get_api_timeseries(resolution: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             route: Optional[str] = None, method: Optional[str] = None,
+                             buckets: int = 60) -> List[Dict]:
+    """Request counts and latency per bucket, route and status class from the rollup table"""
+    start, end = _time_window(resolution, start, end, buckets)
+    
+    def query_rollups(db):
+        query = db.query(APIRollup).filter(
+            APIRollup.resolution == resolution,
+            APIRollup.bucket_start >= start,
+            APIRollup.bucket_start <= end
+        )
+        if route:
+            query = query.filter(APIRollup.route == route)
+        if method:
+            query = query.filter(APIRollup.method == method.upper())
+        return query.order_by(APIRollup.bucket_start, APIRollup.route, APIRollup.method, APIRollup.status_class).all()
+    
+    return [
+        {
+            "bucket_start": row.bucket_start.isoformat(),
+            "method": row.method,
+            "route": row.route,
+            "status_class": row.status_class,
+            "count": row.request_count,
+            "avg_response_time": row.total_response_time / row.request_count if row.request_count else None,
+            "max_response_time": row.max_response_time
+        }
+        for row in await _run_in_session(query_rollups)
+    ]
+
+@_instrumented
+async def count_api_requests_since(since: datetime) -> int:
+    """API requests from the hourly rollups (buckets starting at or after `since`'s hour)"""
+    hour = _bucket_starts(since)["hour"]
+    return await _run_in_session(lambda db: db.query(func.coalesce(func.sum(APIRollup.request_count), 0)).filter(
+        APIRollup.resolution == "hour", APIRollup.bucket_start >= hour
+    ).scalar())
+
+@_instrumented
+async def save_latency_sketches(rows: List[Dict]):
+    """Checkpoint this worker's per-minute sketches (each row replaces the worker's previous copy)"""
+    if not rows:
+        return
+    
+    def upsert(db):
+        _upsert_rollups(db, LatencySketch, rows, replace=["sketch"])
+        db.commit()
+    
+    await _run_in_session(upsert)
+
+@_instrumented
+async def load_latency_sketches(since: datetime) -> List[LatencySketch]:
+    """Checkpointed sketches of every worker from `since` on"""
+    return await _run_in_session(
+        lambda db: db.query(LatencySketch).filter(LatencySketch.bucket_start >= since).all()
+    )
+
+@_instrumented
+async def list_webhook_subscribers(active_only: bool = False) -> List[WebhookSubscriber]:
+    """Registered webhook subscribers in id order"""
+    def query_subscribers(db):
+        query = db.query(WebhookSubscriber)
+        if active_only:
+            query = query.filter(WebhookSubscriber.active.is_(True))
+        return query.order_by(WebhookSubscriber.id).all()
+    
+    return await _run_in_session(query_subscribers)
+
+@_instrumented
+async def create_webhook_subscriber(url: str, secret: Optional[str] = None, game_types: Optional[List[str]] = None,
+                                    description: Optional[str] = None, active: bool = True) -> WebhookSubscriber:
+    """Register a subscriber; raises ValueError if the URL is already registered"""
+    def insert(db):
+        subscriber = WebhookSubscriber(
+            url=url,
+            secret=secret,
+            game_types=",".join(game_types) if game_types else None,
+            description=description,
+            active=active,
+        )
+        db.add(subscriber)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise ValueError(f"{url} is already registered")
+        return subscriber
+    
+    return await _run_in_session(insert)
+
+@_instrumented
+async def update_webhook_subscriber(subscriber_id: int, **fields) -> Optional[WebhookSubscriber]:
+    """Change url/secret/game_types/description/active; None if the subscriber does not exist"""
+    if "game_types" in fields:
+        fields["game_types"] = ",".join(fields["game_types"]) if fields["game_types"] else None
+    
+    def update(db):
+        subscriber = db.get(WebhookSubscriber, subscriber_id)
+        if subscriber is None:
+            return None
+        for name, value in fields.items():
+            setattr(subscriber, name, value)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise ValueError(f"{fields.get('url')} is already registered")
+        return subscriber
+    
+    return await _run_in_session(update)
+
+@_instrumented
+async def delete_webhook_subscriber(subscriber_id: int) -> bool:
+    """Remove a subscriber; False if it did not exist"""
+    def remove(db):
+        deleted = db.query(WebhookSubscriber).filter(WebhookSubscriber.id == subscriber_id).delete()
+        db.commit()
+        return deleted > 0
+    
+    return await _run_in_session(remove)
+
+@_instrumented
+async def prune_rows_before(model, before: datetime, batch_size: int = 10000) -> int:
+    """Delete rows older than `before` in small batches (raw tables or minute rollups)"""
+    if model in (ResultRollup, APIRollup, LatencySketch):
+        condition = (model.bucket_start < before,)
+        if model is not LatencySketch:
+            condition += (model.resolution == "minute",)
+        
+        def prune(db):
+            deleted = db.execute(delete(model).where(*condition)).rowcount
+            db.commit()
+            return deleted
+        
+        return await _run_in_session(prune)
+    
+    def prune_batch(db):
+        ids = select(model.id).where(model.timestamp < before).order_by(model.id).limit(batch_size).scalar_subquery()
+        deleted = db.execute(delete(model).where(model.id.in_(ids))).rowcount
+        db.commit()
+        return deleted
+    
+    total = 0
+    while True:
+        # Short transactions keep writers (crawler, request logging) moving between batches
+        deleted = await _run_in_session(prune_batch)
+        total += deleted
+        if deleted < batch_size:
+            return total
@@ -0,0 +1,462 @@
+"""
+Streaming backfill importer for historical game results
+
+Reads NDJSON or CSV dumps (optionally gzipped) from other collectors,
+validates and normalizes each row, skips rows whose (game_type,
+result_md5) is already stored or repeated in the file, and bulk-inserts
+the rest in large transactions:
+
+    python import_results.py dump.ndjson
+    python import_results.py results.csv.gz --game-type tai_xiu --batch-size 100000
+
+Progress is checkpointed to `<file>.import-state.json` after every
+committed batch, so re-running the same command after an interruption
+continues where it stopped (rows committed after the last checkpoint are
+caught by the dedup check). Use --restart to ignore the checkpoint.
+
+Row fields: game_type, result_md5, session_id, timestamp (ISO 8601 or
+Unix seconds) and result_data (object or JSON string). Missing
+result_data is built from the row itself, as the crawler stores the full
+result dict; missing result_md5 / session_id are derived the way the
+crawler derives them.
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import GAME_TYPES
+
+_decode_json = json.JSONDecoder().raw_decode
+# Records handed to a worker (or normalized inline) at a time
+CHUNK_SIZE = 5000
+FIELDS = ("game_type", "session_id", "result_md5", "result_data", "timestamp")
+# Imported rows are added to the rollups as save_game_result adds live ones (database._upsert_rollups)
+ROLLUP_UPSERT_SQL = (
+    "INSERT INTO result_rollups (resolution, bucket_start, game_type, result_count) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (resolution, bucket_start, game_type) DO UPDATE SET result_count = result_count + excluded.result_count"
+)
+
+
+class RowError(ValueError):
+    """A row that cannot be imported"""
+
+
+class _CountingLines:
+    """Iterates decoded lines of a binary stream, tracking the byte offset consumed"""
+
+    def __init__(self, stream, offset: int):
+        self.stream = stream
+        self.offset = offset
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self.stream:
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+
+def open_input(path: str, offset: int):
+    """Binary stream positioned at `offset` (decompressed offset for .gz files)"""
+    stream = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    if offset:
+        stream.seek(offset)  # gzip emulates this by decompressing forward
+    return stream
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def read_chunks(lines: _CountingLines, input_format: str, header: Optional[list],
+                chunk_size: int) -> Iterator[Tuple[list, int]]:
+    """(items, byte offset just past them): stripped lines for NDJSON, dicts for CSV"""
+    chunk = []
+    if input_format == "ndjson":
+        for line in lines:
+            line = line.strip()
+            if line:
+                chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk, lines.offset
+                    chunk = []
+    else:
+        # Quoted CSV fields may span lines, so records are split here rather than in workers
+        for values in csv.reader(iter(lines)):
+            if values:
+                chunk.append(dict(zip(header, values)))
+                if len(chunk) >= chunk_size:
+                    yield chunk, lines.offset
+                    chunk = []
+    if chunk:
+        yield chunk, lines.offset
+
+
+class Normalizer:
+    """Turns raw records into insert tuples"""
+
+    def __init__(self, default_game_type: Optional[str], utc_offset_hours: float, sqlite: bool):
+        self.default_game_type = default_game_type
+        self.naive_tz = timezone(timedelta(hours=utc_offset_hours))
+        self.naive_utc = utc_offset_hours == 0
+        self.sqlite = sqlite
+
+    def _timestamp(self, value) -> datetime:
+        if value in (None, ""):
+            raise RowError("missing timestamp")
+        try:
+            if isinstance(value, str):
+                try:
+                    moment = datetime.fromisoformat(value.replace("Z", "+00:00") if value[-1] == "Z" else value)
+                except ValueError:
+                    value = float(value)  # Unix time as a string (CSV)
+            if not isinstance(value, str):
+                seconds = float(value)
+                if seconds > 1e11:  # Milliseconds
+                    seconds /= 1000
+                moment = datetime.fromtimestamp(seconds, timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            raise RowError(f"invalid timestamp {value!r}")
+        # Stored as naive UTC, like func.now() defaults
+        if moment.tzinfo is None:
+            if self.naive_utc:
+                return moment
+            moment = moment.replace(tzinfo=self.naive_tz)
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def __call__(self, record: Dict, raw: Optional[str] = None) -> Tuple[Tuple, bytes]:
+        """(insert tuple, 16-byte md5 digest used for dedup)"""
+        game_type = record.get("game_type") or self.default_game_type
+        if game_type not in GAME_TYPES:
+            raise RowError(f"unknown game_type {game_type!r}")
+
+        result_data = record.get("result_data")
+        if isinstance(result_data, str) and result_data:
+            try:
+                result_data = json.loads(result_data)
+            except ValueError:
+                raise RowError("result_data is not valid JSON")
+            encoded = None
+        elif isinstance(result_data, dict):
+            encoded = None
+        else:
+            # The record is the result itself; an NDJSON line is already its JSON encoding
+            result_data, encoded = record, raw
+        if not isinstance(result_data, dict):
+            raise RowError("result_data is not a JSON object")
+
+        timestamp = self._timestamp(record.get("timestamp") or result_data.get("timestamp"))
+
+        result_md5 = record.get("result_md5") or result_data.get("result_md5")
+        if not result_md5:
+            source = str(result_data.get("result", "")) + str(result_data.get("timestamp", ""))
+            digest = hashlib.md5(source.encode()).digest()
+            result_md5 = digest.hex()
+        else:
+            try:
+                digest = bytes.fromhex(result_md5) if len(result_md5) == 32 else b""
+            except (TypeError, ValueError):
+                digest = b""
+            if len(digest) != 16:
+                raise RowError(f"invalid result_md5 {result_md5!r}")
+            result_md5 = digest.hex()
+
+        session_id = str(
+            record.get("session_id") or result_data.get("session_id")
+            or f"{game_type}_{int(timestamp.replace(tzinfo=timezone.utc).timestamp())}"
+        )
+        if len(session_id) > 100:
+            raise RowError("session_id longer than 100 characters")
+
+        if encoded is None:
+            encoded = json.dumps(result_data, ensure_ascii=False)
+        stored_timestamp = timestamp.isoformat(" ", "microseconds") if self.sqlite else timestamp
+        return (game_type, session_id, result_md5, encoded, stored_timestamp), digest
+
+
+_normalizer: Optional[Normalizer] = None
+
+
+def _init_normalizer(*args):
+    global _normalizer
+    _normalizer = Normalizer(*args)
+
+
+def normalize_chunk(items: list) -> Tuple[list, list]:
+    """([(row, digest), ...], [(error, record), ...]) for one chunk; runs in pool workers too"""
+    normalize = _normalizer
+    rows, rejected = [], []
+    for item in items:
+        try:
+            if isinstance(item, str):
+                try:
+                    # raw_decode skips json.loads' type and whitespace checks; lines are already stripped
+                    record, end = _decode_json(item)
+                except ValueError as e:
+                    raise RowError(f"invalid JSON: {e}")
+                if end != len(item) or not isinstance(record, dict):
+                    raise RowError("line is not a single JSON object")
+                rows.append(normalize(record, item))
+            else:
+                rows.append(normalize(item))
+        except RowError as e:
+            rejected.append((str(e), item))
+    return rows, rejected
+
+
+def load_existing_md5s(engine, game_types) -> Dict[str, Set[bytes]]:
+    """Known result_md5 digests per game, for dedup against the database"""
+    from sqlalchemy import text
+
+    known = {game_type: set() for game_type in game_types}
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT game_type, result_md5 FROM game_results"))
+        for game_type, result_md5 in rows:
+            if game_type in known:
+                try:
+                    known[game_type].add(bytes.fromhex(result_md5))
+                except (TypeError, ValueError):
+                    continue
+    return known
+
+
+class Inserter:
+    """Bulk INSERT of normalized tuples in one transaction per batch"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sqlite = engine.dialect.name == "sqlite"
+        columns = ", ".join(FIELDS + ("created_at",))
+        self.sql = f"INSERT INTO game_results ({columns}) VALUES (?, ?, ?, ?, ?, ?)"
+
+    @staticmethod
+    def sqlite_rollups(rows) -> list:
+        """(resolution, bucket_start, game_type, count) of `rows`, formatted like their timestamps"""
+        # "YYYY-MM-DD HH:MM:SS.ffffff": the first 16 characters are the minute, the first 13 the hour
+        minutes = Counter((row[4][:16], row[0]) for row in rows)
+        hours = Counter()
+        for (minute, game_type), count in minutes.items():
+            hours[(minute[:13], game_type)] += count
+        return [("minute", f"{minute}:00.000000", game_type, count)
+                for (minute, game_type), count in minutes.items()] + \
+               [("hour", f"{hour}:00:00.000000", game_type, count) for (hour, game_type), count in hours.items()]
+
+    def insert(self, rows) -> None:
+        """Insert `rows` and add them to the result rollups, in one transaction"""
+        if not rows:
+            return
+        created_at = datetime.utcnow()
+        if self.sqlite:
+            # DBAPI executemany on pre-formatted values skips per-row type processing
+            created_at = created_at.isoformat(" ", "microseconds")  # SQLAlchemy's SQLite DateTime format
+            connection = self.engine.raw_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute("PRAGMA synchronous = NORMAL")
+                cursor.executemany(self.sql, [row + (created_at,) for row in rows])
+                cursor.executemany(ROLLUP_UPSERT_SQL, self.sqlite_rollups(rows))
+                connection.commit()
+            finally:
+                connection.close()
+        else:
+            from database import add_result_rollups, GameResult
+
+            # SQLAlchemy batches this into multi-row INSERTs ("insertmanyvalues")
+            with self.engine.begin() as conn:
+                conn.execute(
+                    GameResult.__table__.insert(),
+                    [dict(zip(FIELDS, row), created_at=created_at) for row in rows]
+                )
+                add_result_rollups(conn, Counter((row[4].replace(second=0, microsecond=0), row[0]) for row in rows))
+
+
+class Checkpoint:
+    """Resume position for one input file"""
+
+    def __init__(self, input_path: str):
+        self.path = f"{input_path}.import-state.json"
+        stat = os.stat(input_path)
+        self.identity = {"size": stat.st_size, "mtime": stat.st_mtime}
+        self.state = {"offset": 0, "header": None, "read": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+
+    def load(self) -> bool:
+        try:
+            with open(self.path) as state_file:
+                saved = json.load(state_file)
+        except (OSError, ValueError):
+            return False
+        if saved.get("identity") != self.identity:
+            print(f"Ignoring {self.path}: input file changed since it was written", file=sys.stderr)
+            return False
+        self.state.update(saved["state"])
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump({"identity": self.identity, "state": self.state}, state_file)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def run_import(path: str, input_format: str, default_game_type: Optional[str], batch_size: int,
+               utc_offset: float, restart: bool, rejects_path: Optional[str], progress_interval: float,
+               defer_indexes: bool, workers: int) -> Dict:
+    from database import engine, init_database, GameResult
+    import asyncio
+
+    asyncio.run(init_database())
+
+    checkpoint = Checkpoint(path)
+    if restart:
+        checkpoint.remove()
+    elif checkpoint.load():
+        print(f"Resuming at byte {checkpoint.state['offset']} ({checkpoint.state['read']} rows read)", file=sys.stderr)
+    state = checkpoint.state
+
+    started = time.perf_counter()
+    known = load_existing_md5s(engine, GAME_TYPES)
+    print(f"Loaded {sum(map(len, known.values()))} existing digests in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+
+    indexes = list(GameResult.__table__.indexes) if defer_indexes else []
+    for index in indexes:
+        # Rebuilt once at the end (or by init_database if the import dies): far cheaper than per-row upkeep
+        index.drop(bind=engine, checkfirst=True)
+
+    inserter = Inserter(engine)
+    normalizer_args = (default_game_type, utc_offset, inserter.sqlite)
+    pool = None
+    if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers, initializer=_init_normalizer, initargs=normalizer_args)
+    else:
+        _init_normalizer(*normalizer_args)
+
+    rejects = open(rejects_path, "a") if rejects_path else None
+    stream = open_input(path, state["offset"])
+    lines = _CountingLines(stream, state["offset"])
+    if input_format == "csv" and state["header"] is None:
+        # Read the header here so the checkpoint can carry it past the first line
+        state["header"] = next(csv.reader(iter(lines)))
+
+    read_at_start = state["read"]
+    last_report = time.perf_counter()
+    batch = []
+    chunks = read_chunks(lines, input_format, state["header"], CHUNK_SIZE)
+
+    def normalized_chunks():
+        if pool is None:
+            for items, offset in chunks:
+                yield normalize_chunk(items), len(items), offset
+        else:
+            # Offsets stay with their chunk; imap keeps file order for the checkpoint
+            offsets = []
+
+            def tagged():
+                for items, offset in chunks:
+                    offsets.append((len(items), offset))
+                    yield items
+
+            for result in pool.imap(normalize_chunk, tagged()):
+                count, offset = offsets.pop(0)
+                yield result, count, offset
+
+    def flush(offset: int):
+        inserter.insert(batch)
+        state["inserted"] += len(batch)
+        state["offset"] = offset
+        checkpoint.save()
+        batch.clear()
+
+    try:
+        for (rows, rejected), count, offset in normalized_chunks():
+            state["read"] += count
+            if rejected:
+                state["rejected"] += len(rejected)
+                if rejects:
+                    for error, record in rejected:
+                        rejects.write(json.dumps({"error": error, "record": record}, ensure_ascii=False) + "\n")
+
+            duplicates = 0
+            for row, digest in rows:
+                seen = known[row[0]]
+                if digest in seen:
+                    duplicates += 1
+                    continue
+                seen.add(digest)
+                batch.append(row)
+            state["duplicates"] += duplicates
+
+            if len(batch) >= batch_size:
+                flush(offset)
+                now = time.perf_counter()
+                if now - last_report >= progress_interval:
+                    last_report = now
+                    rate = (state["read"] - read_at_start) / (now - started)
+                    print(f"{state['read']} read, {state['inserted']} inserted, {state['duplicates']} duplicates, "
+                          f"{state['rejected']} rejected ({rate:,.0f} rows/s)", file=sys.stderr)
+        flush(lines.offset)
+    finally:
+        stream.close()
+        if pool is not None:
+            pool.terminate()
+        if rejects:
+            rejects.close()
+        if indexes:
+            print("Rebuilding indexes...", file=sys.stderr)
+            for index in indexes:
+                index.create(bind=engine, checkfirst=True)
+
+    elapsed = time.perf_counter() - started
+    checkpoint.remove()
+    return {
+        **{key: state[key] for key in ("read", "inserted", "duplicates", "rejected")},
+        "elapsed_seconds": elapsed,
+        "rows_per_second": (state["read"] - read_at_start) / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV file, optionally .gz")
+    parser.add_argument("--format", choices=["auto", "ndjson", "csv"], default="auto")
+    parser.add_argument("--game-type", choices=list(GAME_TYPES), help="Game type for rows without one")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per transaction")
+    parser.add_argument("--utc-offset", type=float, default=0.0,
+                        help="UTC offset (hours) of timestamps without a timezone, e.g. 7 for Vietnam")
+    parser.add_argument("--rejects", help="Append rejected rows with the reason to this NDJSON file")
+    parser.add_argument("--restart", action="store_true", help="Ignore a saved checkpoint")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop game_results indexes during the import and rebuild them at the end "
+                             "(initial backfills; queries are slow meanwhile)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes parsing and normalizing rows (the main process only dedups and inserts)")
+    parser.add_argument("--progress-interval", type=float, default=2.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    input_format = detect_format(args.path) if args.format == "auto" else args.format
+    summary = run_import(args.path, input_format, args.game_type, args.batch_size, args.utc_offset,
+                         args.restart, args.rejects, args.progress_interval, args.defer_indexes,
+                         args.workers)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Load test package
@@ -0,0 +1,223 @@
+"""
+End-to-end load test against a local stand-in upstream
+
+Starts the stand-in game server, runs the full app (uvicorn, crawler
+included) against it with a throwaway SQLite database, drives concurrent
+API clients and writes a machine-readable report:
+
+    python -m loadtest.run --duration 30 --concurrency 20 --output loadtest_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from config import GAME_TYPES
+from loadtest.stand_in_server import StandInGame, start_in_thread
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Route template -> (weight, URL builder)
+ROUTE_MIX = {
+    "/api/v1/games/{game_type}/latest": (6, lambda game_type: f"/api/v1/games/{game_type}/latest?limit=10"),
+    "/api/v1/games/{game_type}/history": (2, lambda game_type: f"/api/v1/games/{game_type}/history?limit=200"),
+    "/api/v1/stats": (1, lambda game_type: "/api/v1/stats"),
+    "/health": (1, lambda game_type: "/health"),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def parse_metric(text: str, name: str) -> Dict[str, float]:
+    """Sum every sample of `name` (any labels) from Prometheus text"""
+    totals = {}
+    for suffix in ("_sum", "_count"):
+        pattern = re.compile(rf"^{re.escape(name + suffix)}(?:\{{[^}}]*\}})? (\S+)$", re.MULTILINE)
+        totals[suffix[1:]] = sum(float(value) for value in pattern.findall(text))
+    return totals
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("App did not become healthy")
+
+
+async def drive_clients(base_url: str, duration: float, concurrency: int) -> Dict[str, Dict]:
+    """Run `concurrency` closed-loop clients for `duration` seconds"""
+    schedule = [
+        (route, build(game_type))
+        for route, (weight, build) in ROUTE_MIX.items()
+        for game_type in GAME_TYPES
+        for _ in range(weight)
+    ]
+    latencies = {route: [] for route in ROUTE_MIX}
+    errors = {route: 0 for route in ROUTE_MIX}
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client: httpx.AsyncClient, offset: int):
+        index = offset
+        while time.monotonic() < deadline:
+            route, url = schedule[index % len(schedule)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 400:
+                    errors[route] += 1
+            except httpx.HTTPError:
+                errors[route] += 1
+            latencies[route].append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        await asyncio.gather(*(client_loop(client, offset) for offset in range(concurrency)))
+
+    return {
+        route: {
+            "requests": len(values),
+            "errors": errors[route],
+            "requests_per_second": len(values) / duration,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+        for route, values in latencies.items()
+    }
+
+
+async def scrape_crawl_cycles(base_url: str, workers: int) -> Dict[str, float]:
+    """Crawl-cycle stats from the leader's /metrics.
+
+    A keep-alive connection sticks to one worker, so each attempt opens a
+    new one and asks /health whether that worker leads before scraping.
+    """
+    best = {"sum": 0.0, "count": 0.0}
+    for _ in range(max(workers * 8, 1)):
+        async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+            leader = (await client.get("/health")).json().get("leader")
+            cycles = parse_metric((await client.get("/metrics")).text, "crawler_cycle_duration_seconds")
+        if cycles["count"] > best["count"]:
+            best = cycles
+        if leader is None or leader.get("is_leader"):
+            # Without leader election every worker crawls; otherwise this is the one that does
+            best = cycles
+            break
+    return {
+        "cycles": int(best["count"]),
+        "mean_cycle_seconds": best["sum"] / best["count"] if best["count"] else None,
+    }
+
+
+async def run(args) -> Dict:
+    game = StandInGame(cadence=args.cadence, response_format=args.format, page_kb=args.page_kb)
+    upstream = start_in_thread(game)
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}/"
+    port = free_port()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "loadtest.db")
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{db_path}",
+            GAME_URL=upstream_url,
+            CRAWL_INTERVAL=str(args.crawl_interval),
+            SNAPSHOT_PATH=os.path.join(tmp, "snapshot.bin"),
+            LEADER_LOCK_FILE=os.path.join(tmp, "leader.lock"),
+            LOG_LEVEL="WARNING",
+        )
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(tmp, "app.log"), "w")
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+                await wait_until_healthy(client)
+                rounds_before = game.rounds_published()
+                started = time.monotonic()
+                routes = await drive_clients(base_url, args.duration, args.concurrency)
+                elapsed = time.monotonic() - started
+                crawl = await scrape_crawl_cycles(base_url, args.workers)
+                rounds_after = game.rounds_published()
+        finally:
+            app.terminate()
+            app.wait(timeout=30)
+            upstream.shutdown()
+
+        with sqlite3.connect(db_path) as conn:
+            stored = dict(conn.execute("SELECT game_type, COUNT(*) FROM game_results GROUP BY game_type").fetchall())
+
+    published = {game_type: rounds_after for game_type in GAME_TYPES}
+    total_stored = sum(stored.values())
+    return {
+        "config": vars(args),
+        "elapsed_seconds": elapsed,
+        "routes": routes,
+        "crawl": {
+            **crawl,
+            "upstream_requests": game.requests,
+        },
+        "ingestion": {
+            "results_stored": stored,
+            "rounds_published_upstream": published,
+            "rounds_during_load": {game_type: rounds_after - rounds_before for game_type in GAME_TYPES},
+            "results_per_second": total_stored / elapsed if elapsed else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of client load")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent API clients")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--cadence", type=float, default=2.0, help="Seconds between upstream rounds")
+    parser.add_argument("--crawl-interval", type=int, default=1, help="CRAWL_INTERVAL for the app")
+    parser.add_argument("--format", choices=["json", "html"], default="json", help="Upstream page format")
+    parser.add_argument("--page-kb", type=int, default=0, help="Padding added to every upstream page")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    for route, stats in report["routes"].items():
+        print(f"{route:40} {stats['requests']:7d} req  p50 {stats['p50_ms']:7.1f} ms"
+              f"  p95 {stats['p95_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  errors {stats['errors']}")
+    print(f"crawl cycles: {report['crawl']['cycles']}  mean {report['crawl']['mean_cycle_seconds']}")
+    print(f"ingestion: {report['ingestion']['results_stored']} of {report['ingestion']['rounds_published_upstream']}")
+    print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local stand-in for the 68GB upstream used by load tests and benchmarks
+
+Serves one new round per game every `cadence` seconds at the first
+endpoint the crawler probes (`/api/{game_type}`), either as JSON or as an
+HTML page with the result embedded in a script tag:
+
+    python -m loadtest.stand_in_server --port 8900 --cadence 5 --format html
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from config import GAME_TYPES
+
+
+class StandInGame:
+    """Deterministic round generator shared by all request handlers"""
+
+    def __init__(self, cadence: float = 5.0, response_format: str = "json", page_kb: int = 0,
+                 history: int = 20, validators: bool = True):
+        self.cadence = cadence
+        self.response_format = response_format
+        self.page_kb = page_kb
+        self.history = history
+        self.validators = validators  # Send ETag and answer If-None-Match with 304
+        self.started_at = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def current_round(self) -> int:
+        return int((time.time() - self.started_at) / self.cadence)
+
+    def round_data(self, game_type: str, round_number: int) -> Dict:
+        round_started = self.started_at + round_number * self.cadence
+        outcome = "tai" if hashlib.md5(f"{game_type}:{round_number}".encode()).digest()[0] & 1 else "xiu"
+        return {
+            "game_type": game_type,
+            "result": outcome,
+            "session_id": f"{game_type}_{round_number}",
+            "timestamp": datetime.fromtimestamp(round_started).isoformat(),
+            "result_md5": hashlib.md5(f"{game_type}:{round_number}:{outcome}".encode()).hexdigest()
+        }
+
+    def recent_rounds(self, game_type: str) -> List[Dict]:
+        current = self.current_round()
+        return [self.round_data(game_type, number) for number in range(current, max(current - self.history, -1), -1)]
+
+    def rounds_published(self) -> int:
+        """Rounds published per game so far (including the one in progress)"""
+        return self.current_round() + 1
+
+    def render(self, game_type: str) -> Optional[bytes]:
+        with self._lock:
+            self.requests += 1
+        if game_type not in GAME_TYPES:
+            return None
+        latest = self.round_data(game_type, self.current_round())
+        padding = "x" * (self.page_kb * 1024)
+        if self.response_format == "json":
+            return json.dumps({**latest, "history": self.recent_rounds(game_type), "padding": padding}).encode()
+        rows = "".join(
+            f'<tr class="round"><td>{entry["session_id"]}</td><td>{entry["result"]}</td></tr>'
+            for entry in self.recent_rounds(game_type)
+        )
+        return (
+            f"<html><head><title>68GB</title></head><body>"
+            f"<table>{rows}</table><div hidden>{padding}</div>"
+            f"<script>var gameData = {json.dumps(latest)};</script>"
+            f"</body></html>"
+        ).encode()
+
+
+def create_server(game: StandInGame, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """HTTP server for `game`; port 0 picks a free port (see server.server_address)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            body = game.render(parts[1]) if len(parts) == 2 and parts[0] == "api" else None
+            if body is None:
+                self.send_error(404)
+                return
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if game.validators and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            content_type = "application/json" if game.response_format == "json" else "text/html; charset=utf-8"
+            self.send_header("Content-Type", content_type)
+            if game.validators:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(game: StandInGame, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stand-in server on a daemon thread and return it"""
+    server = create_server(game, host, port)
+    threading.Thread(target=server.serve_forever, name="stand-in-upstream", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--cadence", type=float, default=5.0, help="Seconds between rounds")
+    parser.add_argument("--format", choices=["json", "html"], default="json")
+    parser.add_argument("--page-kb", type=int, default=0, help="Padding added to every page")
+    parser.add_argument("--no-validators", action="store_true", help="Never send ETag or answer 304")
+    args = parser.parse_args()
+
+    game = StandInGame(cadence=args.cadence, response_format=args.format, page_kb=args.page_kb,
+                       validators=not args.no_validators)
+    server = create_server(game, args.host, args.port)
+    print(f"Stand-in upstream on http://{args.host}:{args.port}/ (GAME_URL), new round every {args.cadence}s")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,48 +2,118 @@
 Main application entry point for 68GB Game API Crawler
 """
 import asyncio
-import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from loguru import logger
 
 from config import settings
-from database import init_database
-from api.routes import router as api_router
-from crawler.game_crawler import GameCrawler
-from services.notification_service import NotificationService
+from database import IS_POSTGRES, dispose_engines, init_database
+from api.routes import router as api_router, log_requests
+from api.admin import router as admin_router
+from services.admission import AdmissionMiddleware, admission_controller
+from services.compression import CompressionMiddleware
+from services.latency import latency_tracker
+from services.logs import configure_logging
+from services.metrics import metrics
+from services.bloom import known_md5s
+from services.freshness import freshness_tracker
+from services.polling import poll_scheduler
+from services.result_listener import result_listener
+from services.webhooks import webhook_dispatcher
+from services.workers import worker_pool
 
 # Global instances
 crawler = None
-notification_service = None
+crawler_task = None
+retention_task = None
+leader_elector = None
+
+async def start_crawler():
+    """Start the background crawler (called when this process becomes leader)"""
+    global crawler, crawler_task, retention_task
+    # Imported here so API-only replicas never load the crawler stack
+    from crawler.game_crawler import GameCrawler
+    from services.retention import retention_loop
+    from services.snapshot import publish_latest_results
+    crawler = GameCrawler()
+    # Publish right away so workers never read a snapshot left by a previous leader
+    await publish_latest_results()
+    crawler_task = asyncio.create_task(crawler.start_crawling())
+    retention_task = asyncio.create_task(retention_loop())
+    logger.info("Background crawler started")
+
+async def stop_crawler():
+    """Stop the background crawler (called on shutdown or loss of leadership)"""
+    global crawler, crawler_task, retention_task
+    if crawler:
+        await crawler.stop_crawling()
+        crawler = None
+    if crawler_task:
+        crawler_task.cancel()
+        crawler_task = None
+    if retention_task:
+        retention_task.cancel()
+        retention_task = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global crawler, notification_service
+    global leader_elector
     
     # Startup
+    configure_logging()
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     
     # Initialize database
     await init_database()
     logger.info("Database initialized")
     
-    # Initialize services
-    crawler = GameCrawler()
-    notification_service = NotificationService()
+    # Parse pages and decode large histories off the event loop (processes start and warm up here)
+    await worker_pool.start()
     
-    # Start background crawler
-    asyncio.create_task(crawler.start_crawling())
-    logger.info("Background crawler started")
+    # Keep latest results in memory, pushed by NOTIFY from whichever process crawls
+    listener_task = None
+    if IS_POSTGRES and settings.DB_NOTIFY_ENABLED:
+        listener_task = asyncio.create_task(result_listener.run())
+    
+    # Checkpoint this worker's latency sketches and merge the other workers'
+    latency_task = asyncio.create_task(latency_tracker.run())
+    
+    # Only the elected leader crawls; the other workers just serve reads
+    election_task = None
+    if settings.CRAWLER_ENABLED:
+        from services.leader import LeaderElector, create_backend
+        leader_elector = LeaderElector(
+            create_backend(),
+            on_elected=start_crawler,
+            on_demoted=stop_crawler,
+            renew_interval=min(settings.LEADER_RENEW_INTERVAL, settings.CRAWL_INTERVAL)
+        )
+        election_task = asyncio.create_task(leader_elector.run())
+    else:
+        logger.info("Crawler disabled (API-only mode)")
     
     yield
     
     # Shutdown
-    if crawler:
-        await crawler.stop_crawling()
+    if election_task:
+        election_task.cancel()
+        await leader_elector.stop()
+    if listener_task:
+        listener_task.cancel()
+        await result_listener.stop()
+    latency_task.cancel()
+    try:
+        await latency_tracker.checkpoint()
+    except Exception as e:
+        logger.warning(f"Final latency sketch checkpoint failed: {e}")
+    await webhook_dispatcher.close()
+    await worker_pool.close()
+    await dispose_engines()
     logger.info("Application shutdown complete")
+    await logger.complete()
 
 # Create FastAPI app
 app = FastAPI(
@@ -53,6 +123,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Compress responses and serve cached hot bodies (innermost, so request metrics still see them)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -62,8 +135,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request logging and route metrics
+app.middleware("http")(log_requests)
+
+# Admission control (outermost, so shed requests cost no routing, logging or database work)
+app.add_middleware(AdmissionMiddleware)
+
 # Include API routes
 app.include_router(api_router, prefix=settings.API_PREFIX)
+app.include_router(admin_router, prefix="/admin", include_in_schema=settings.DEBUG)
 
 @app.get("/")
 async def root():
@@ -77,19 +157,37 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    if not settings.CRAWLER_ENABLED:
+        crawler_status = "disabled"
+    elif crawler and crawler.is_running:
+        crawler_status = "running"
+    elif leader_elector and not leader_elector.is_leader:
+        crawler_status = "follower"
+    else:
+        crawler_status = "stopped"
+    
     return {
         "status": "healthy",
-        "crawler_status": "running" if crawler and crawler.is_running else "stopped"
+        "crawler_status": crawler_status,
+        "leader": leader_elector.status() if leader_elector else None,
+        "result_listener": result_listener.status() if IS_POSTGRES and settings.DB_NOTIFY_ENABLED else None,
+        "md5_bloom": known_md5s.status(),
+        "admission": admission_controller.status() if settings.ADMISSION_ENABLED else None,
+        "freshness": freshness_tracker.health(),
+        "polling": poll_scheduler.status() if crawler and crawler.is_running else None,
+        "workers": worker_pool.status()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
-    # Configure logging
-    logger.add(
-        settings.LOG_FILE,
-        rotation="1 day",
-        retention="30 days",
-        level=settings.LOG_LEVEL
-    )
+    import uvicorn
+    
+    # Configure logging (enqueued sinks; the worker's lifespan keeps this configuration)
+    configure_logging(settings.LOG_FILE)
     
     # Run the application
     uvicorn.run(
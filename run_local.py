@@ -59,6 +59,14 @@ async def test_notifications():
         print(f"❌ Notification test failed: {e}")
         return False
 
+async def run_retention_once():
+    """Apply the retention settings once"""
+    from database import init_database
+    from services.retention import run_retention
+    await init_database()
+    deleted = await run_retention()
+    print(f"🧹 Retention: {deleted or 'nothing configured'}")
+
 def run_server():
     """Run the FastAPI server"""
     import uvicorn
@@ -117,11 +125,20 @@ def main():
             run_server()
         elif command == "setup":
             asyncio.run(setup_database())
+        elif command == "import":
+            # Forward the remaining arguments to the backfill importer
+            import import_results
+            sys.argv = ["import_results.py"] + sys.argv[2:]
+            import_results.main()
+        elif command == "retention":
+            asyncio.run(run_retention_once())
         else:
             print("Usage:")
             print("  python run_local.py test    - Run tests")
             print("  python run_local.py server  - Start server")
             print("  python run_local.py setup   - Setup database only")
+            print("  python run_local.py import <file> [options] - Backfill results from NDJSON/CSV")
+            print("  python run_local.py retention - Prune raw rows and minute rollups past retention")
     else:
         print("🎮 68GB Game API Crawler - Local Development")
         print("=" * 50)
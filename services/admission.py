@@ -0,0 +1,243 @@
+"""
+Admission control: a per-worker concurrency limit with a bounded, prioritized wait queue
+
+Every HTTP request is classified by path before routing:
+
+    critical  /health, /metrics                      never limited or queued
+    high      /latest, /results/by-md5               first to get a freed slot
+    normal    everything else
+    low       /history, /games/batch, /current,      limited to a share of the slots
+              /stats, /results/by-session
+
+At most ADMISSION_MAX_CONCURRENT requests run at once (low-priority ones
+at most ADMISSION_LOW_PRIORITY_SHARE of them). Others wait in a queue of
+ADMISSION_QUEUE_SIZE entries, and a freed slot goes to the
+highest-priority waiter. A full queue evicts its newest lower-priority
+waiter for a higher-priority arrival. Requests that find no room, or
+that wait longer than ADMISSION_QUEUE_TIMEOUT, get an immediate 503
+with a Retry-After estimated from the queue depth and the recent service
+time, instead of piling up behind blocking database calls until every
+route (including /health) times out.
+"""
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import settings
+from services.metrics import metrics
+
+CRITICAL, HIGH, NORMAL, LOW = range(4)
+PRIORITY_NAMES = ("critical", "high", "normal", "low")
+QUEUED_PRIORITIES = (HIGH, NORMAL, LOW)
+
+ADMISSION_ACTIVE = metrics.gauge("admission_active_requests", "Requests holding an admission slot")
+ADMISSION_QUEUED = metrics.gauge("admission_queue_depth", "Requests waiting for an admission slot", ["priority"])
+ADMISSION_SHED = metrics.counter(
+    "admission_shed_total", "Requests answered 503 by admission control", ["priority", "reason"]
+)
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "admission_wait_seconds", "Time admitted requests waited for a slot", ["priority"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Checked in order against the request path; the first match wins
+DEFAULT_RULES: List[Tuple[str, int]] = [
+    (r"^/(health|metrics)$", CRITICAL),
+    (rf"^{re.escape(settings.API_PREFIX)}/health$", CRITICAL),
+    (r"/games/[^/]+/latest$", HIGH),
+    (r"/results/by-md5/", HIGH),
+    (r"/games/[^/]+/(history|current)$", LOW),
+    (r"/games/batch$", LOW),
+    (r"/results/by-session/", LOW),
+    (r"/stats(/|$)", LOW),
+]
+
+
+def parse_overrides(value: str) -> List[Tuple[str, int]]:
+    """Rules from ADMISSION_PRIORITY_OVERRIDES ("<path regex>=<priority>,...")"""
+    rules = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        pattern, _, name = item.rpartition("=")
+        if not pattern or name not in PRIORITY_NAMES:
+            raise ValueError(f"Invalid admission priority override {item!r}")
+        rules.append((pattern, PRIORITY_NAMES.index(name)))
+    return rules
+
+
+class AdmissionController:
+    """Concurrency slots handed to waiters by priority, FIFO within a priority"""
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float, low_priority_share: float,
+                 rules: List[Tuple[str, int]]):
+        self.limit = limit
+        self.low_limit = max(1, int(limit * low_priority_share))
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rules = [(re.compile(pattern), priority) for pattern, priority in rules]
+        self.active = 0
+        self.active_low = 0
+        self.waiting: Dict[int, Deque[asyncio.Future]] = {priority: deque() for priority in QUEUED_PRIORITIES}
+        self.shed: Dict[Tuple[str, str], int] = {}
+        self.service_time = 0.05  # seconds, moving average of admitted requests
+        self._classified: Dict[str, int] = {}
+        ADMISSION_ACTIVE.labels().set_function(lambda: self.active)
+        for priority in QUEUED_PRIORITIES:
+            ADMISSION_QUEUED.labels(PRIORITY_NAMES[priority]).set_function(
+                lambda priority=priority: len(self.waiting[priority]))
+
+    def classify(self, path: str) -> int:
+        priority = self._classified.get(path)
+        if priority is None:
+            priority = next((priority for pattern, priority in self.rules if pattern.search(path)), NORMAL)
+            if len(self._classified) < 10000:  # Paths carry ids; do not grow without bound
+                self._classified[path] = priority
+        return priority
+
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self.waiting.values())
+
+    def _can_start(self, priority: int) -> bool:
+        return self.active < self.limit and (priority != LOW or self.active_low < self.low_limit)
+
+    def _take(self, priority: int):
+        self.active += 1
+        if priority == LOW:
+            self.active_low += 1
+
+    async def acquire(self, priority: int) -> Optional[str]:
+        """None once a slot is held (pair with release), else the reason the request is shed"""
+        if self._can_start(priority) and not any(self.waiting[other] for other in QUEUED_PRIORITIES
+                                                 if other <= priority):
+            self._take(priority)
+            ADMISSION_WAIT_SECONDS.labels(PRIORITY_NAMES[priority]).observe(0)
+            return None
+        if self.queued() >= self.queue_size and not self._evict_below(priority):
+            return self._shed(priority, "queue_full")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.waiting[priority].append(waiter)
+        expiry = loop.call_later(self.queue_timeout, self._expire, priority, waiter)
+        start = time.perf_counter()
+        try:
+            reason = await waiter
+        except asyncio.CancelledError:
+            # Client went away: give back a slot granted meanwhile, or leave the queue
+            if waiter.done() and not waiter.cancelled() and waiter.result() is None:
+                self.release(priority)
+            elif waiter in self.waiting[priority]:
+                self.waiting[priority].remove(waiter)
+            raise
+        finally:
+            expiry.cancel()
+        if reason is not None:
+            return self._shed(priority, reason)
+        ADMISSION_WAIT_SECONDS.labels(PRIORITY_NAMES[priority]).observe(time.perf_counter() - start)
+        return None
+
+    def release(self, priority: int, service_time: Optional[float] = None):
+        self.active -= 1
+        if priority == LOW:
+            self.active_low -= 1
+        if service_time is not None:
+            self.service_time += 0.1 * (service_time - self.service_time)
+        # Hand freed slots to the highest-priority waiters that may start
+        while True:
+            for candidate in QUEUED_PRIORITIES:
+                if self.waiting[candidate] and self._can_start(candidate):
+                    self._take(candidate)
+                    self.waiting[candidate].popleft().set_result(None)
+                    break
+            else:
+                return
+
+    def _evict_below(self, priority: int) -> bool:
+        """Shed the newest waiter of the least important priority below `priority`"""
+        for candidate in reversed(QUEUED_PRIORITIES):
+            if candidate <= priority:
+                return False
+            if self.waiting[candidate]:
+                self.waiting[candidate].pop().set_result("evicted")
+                return True
+        return False
+
+    def _expire(self, priority: int, waiter: asyncio.Future):
+        if not waiter.done():
+            self.waiting[priority].remove(waiter)
+            waiter.set_result("timeout")
+
+    def _shed(self, priority: int, reason: str) -> str:
+        name = PRIORITY_NAMES[priority]
+        self.shed[(name, reason)] = self.shed.get((name, reason), 0) + 1
+        ADMISSION_SHED.labels(name, reason).inc()
+        return reason
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        return min(30, max(1, math.ceil((self.queued() + 1) * self.service_time / self.limit)))
+
+    def status(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "low_priority_limit": self.low_limit,
+            "active": self.active,
+            "queue_size": self.queue_size,
+            "queued": {PRIORITY_NAMES[priority]: len(self.waiting[priority]) for priority in QUEUED_PRIORITIES},
+            "shed": {f"{name}:{reason}": count for (name, reason), count in sorted(self.shed.items())},
+            "service_time_ms": round(self.service_time * 1000, 2),
+        }
+
+
+class AdmissionMiddleware:
+    """Outermost ASGI middleware: requests over capacity never reach routing, logging or the database"""
+
+    def __init__(self, app, controller: "AdmissionController" = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+        priority = controller.classify(scope["path"])
+        if priority == CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await controller.acquire(priority)
+        if reason is not None:
+            await self._reject(send, reason, controller.retry_after())
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(priority, time.perf_counter() - start)
+
+    @staticmethod
+    async def _reject(send, reason: str, retry_after: int):
+        body = json.dumps({"detail": "Server busy, retry later", "reason": reason}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+admission_controller = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENT,
+    settings.ADMISSION_QUEUE_SIZE,
+    settings.ADMISSION_QUEUE_TIMEOUT,
+    settings.ADMISSION_LOW_PRIORITY_SHARE,
+    parse_overrides(settings.ADMISSION_PRIORITY_OVERRIDES) + DEFAULT_RULES,
+)
@@ -0,0 +1,165 @@
+"""
+Bloom filter over stored result MD5s
+
+Answers "has this MD5 ever been stored?" from memory: a negative is
+definite, so /results/by-md5 misses and the crawler's dedup check for a
+brand-new result skip the database entirely; a positive is confirmed with
+an indexed lookup. Each process loads the filter from game_results on
+first use and then only adds rows with a higher id than it has seen:
+right after this process saves a result, when the crawler republishes the
+snapshot or a NOTIFY arrives (every second when neither is available), and
+at least every MD5_BLOOM_REFRESH_INTERVAL seconds (which also covers rows
+written by the bulk importer).
+"""
+import asyncio
+import hashlib
+import math
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+BLOOM_LOOKUPS = metrics.counter(
+    "md5_bloom_lookups_total", "MD5 Bloom filter lookups (negative = no DB query needed)", ["outcome"]
+)
+BLOOM_FALSE_POSITIVES = metrics.counter(
+    "md5_bloom_false_positives_total", "Bloom filter positives the database did not confirm"
+)
+BLOOM_ENTRIES = metrics.gauge("md5_bloom_entries", "MD5s added to this process's Bloom filter")
+
+MIN_CAPACITY = 100_000
+CATCH_UP_PAGE = 50_000
+UNSIGNALLED_REFRESH = 1.0  # seconds
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter with double hashing over a 128-bit digest"""
+    __slots__ = ("capacity", "size", "hashes", "bits", "count")
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(first + i * step) % size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class KnownMD5s:
+    """This process's Bloom filter of stored MD5s and the id it is current up to"""
+
+    def __init__(self, error_rate: float, refresh_interval: float):
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.filter: Optional[BloomFilter] = None
+        self.max_id = 0
+        self._sequence: Optional[int] = None
+        self._caught_up_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def might_contain(self, md5: str) -> bool:
+        """False means the MD5 is definitely not stored"""
+        await self._ensure_current()
+        if md5 in self.filter:
+            BLOOM_LOOKUPS.labels("maybe").inc()
+            return True
+        BLOOM_LOOKUPS.labels("negative").inc()
+        return False
+
+    def add(self, md5: str, result_id: Optional[int] = None):
+        """Record a stored MD5 (no-op until the filter is loaded; the load will include it)"""
+        if self.filter is None:
+            return
+        self.filter.add(md5)
+        if result_id is not None and result_id == self.max_id + 1:
+            # Contiguous ids only, so a gap left by a concurrent writer is still caught up
+            self.max_id = result_id
+        BLOOM_ENTRIES.set(self.filter.count)
+
+    def false_positive(self):
+        BLOOM_FALSE_POSITIVES.inc()
+
+    async def _ensure_current(self):
+        if self.filter is not None and not self._stale():
+            return
+        async with self._lock:
+            if self.filter is None or self.filter.count >= self.filter.capacity:
+                await self._load()
+            elif self._stale():
+                await self._catch_up()
+
+    def _stale(self) -> bool:
+        from services.result_listener import result_listener
+        from services.snapshot import snapshot_sequence
+
+        if time.monotonic() - self._caught_up_at >= self.refresh_interval:
+            return True
+        if result_listener.ready:
+            return False  # NOTIFY adds every new result as it is committed
+        sequence = snapshot_sequence()
+        if sequence:
+            # The crawler republishes the snapshot after every result it saves
+            return sequence != self._sequence
+        # No change signal in this process: catch up at most once a second
+        return time.monotonic() - self._caught_up_at >= UNSIGNALLED_REFRESH
+
+    async def _load(self):
+        from database import count_results
+
+        started = time.perf_counter()
+        capacity = max(MIN_CAPACITY, 2 * await count_results())
+        self.filter, self.max_id = BloomFilter(capacity, self.error_rate), 0
+        await self._catch_up()
+        logger.info(f"Loaded {self.filter.count} MD5s into the Bloom filter ({len(self.filter.bits) / 1024:.0f} KiB) "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    async def _catch_up(self):
+        from database import get_result_md5s_after
+        from services.snapshot import snapshot_sequence
+
+        # Read the sequence first: a result published meanwhile then shows up as a change next time
+        sequence = snapshot_sequence()
+        while True:
+            rows = await get_result_md5s_after(self.max_id, CATCH_UP_PAGE)
+            for result_id, md5 in rows:
+                self.filter.add(md5)
+            if rows:
+                self.max_id = rows[-1][0]
+            if len(rows) < CATCH_UP_PAGE:
+                break
+        self._sequence = sequence
+        self._caught_up_at = time.monotonic()
+        BLOOM_ENTRIES.set(self.filter.count)
+
+    def status(self) -> Dict:
+        return {
+            "loaded": self.filter is not None,
+            "entries": self.filter.count if self.filter else 0,
+            "capacity": self.filter.capacity if self.filter else None,
+            "size_bytes": len(self.filter.bits) if self.filter else 0,
+            "hashes": self.filter.hashes if self.filter else None,
+            "max_id": self.max_id,
+        }
+
+
+# Global filter (one per process)
+known_md5s = KnownMD5s(settings.MD5_BLOOM_ERROR_RATE, settings.MD5_BLOOM_REFRESH_INTERVAL)
@@ -0,0 +1,260 @@
+"""
+Response compression with a cache of pre-compressed hot responses
+
+Responses are compressed with the best encoding the client accepts
+(zstd > br > gzip; the first two only when zstandard/brotli are installed)
+once they pass COMPRESSION_MIN_SIZE. Bodies of `latest` and the first
+history pages are kept per (path, query, encoding) and served without
+running the endpoint again until a new result is saved, so compression
+and JSON rendering are paid once per result instead of once per request.
+
+A cached body is valid while the results version it was rendered under
+is current: a local counter bumped by `response_cache.invalidate()` (the
+crawler calls it after saving) plus the shared snapshot sequence, which
+the leader bumps for every other worker on the host.
+"""
+import gzip
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import settings
+from services.metrics import metrics
+from services.snapshot import snapshot_sequence
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SECONDS = metrics.histogram(
+    "response_compression_duration_seconds", "Time spent compressing response bodies", ["encoding"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+)
+COMPRESSION_BYTES = metrics.counter(
+    "response_compression_bytes_total", "Response bytes before (in) and after (out) compression",
+    ["encoding", "direction"]
+)
+RESPONSE_CACHE_TOTAL = metrics.counter(
+    "response_cache_requests_total", "Cacheable requests by outcome (hit, miss, stale)", ["outcome"]
+)
+RESPONSE_CACHE_ENTRIES = metrics.gauge("response_cache_entries", "Pre-compressed responses currently cached")
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _compressors() -> Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    """encoding -> (fast compressor for one-off bodies, denser one for cached bodies)"""
+    available = {
+        "gzip": (lambda body: gzip.compress(body, 6, mtime=0), lambda body: gzip.compress(body, 9, mtime=0)),
+    }
+    if brotli is not None:
+        available["br"] = (lambda body: brotli.compress(body, quality=5),
+                           lambda body: brotli.compress(body, quality=9))
+    if zstandard is not None:
+        fast, dense = zstandard.ZstdCompressor(level=3), zstandard.ZstdCompressor(level=12)
+        available["zstd"] = (fast.compress, dense.compress)
+    return available
+
+
+COMPRESSORS = _compressors()
+# Server preference when the client weighs several encodings equally
+PREFERENCE = [encoding for encoding in ("zstd", "br", "gzip") if encoding in COMPRESSORS]
+
+_negotiated: Dict[str, Optional[str]] = {}
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick an encoding from an Accept-Encoding header (None = identity)"""
+    if accept_encoding in _negotiated:
+        return _negotiated[accept_encoding]
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        if token:
+            weights[token.strip()] = quality
+    choice, best = None, 0.0
+    for encoding in PREFERENCE:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best:
+            choice, best = encoding, quality
+    if len(_negotiated) < 1024:  # Headers come from a handful of clients; don't grow unbounded
+        _negotiated[accept_encoding] = choice
+    return choice
+
+
+def compress(body: bytes, encoding: str, dense: bool = False) -> bytes:
+    start = time.perf_counter()
+    compressed = COMPRESSORS[encoding][1 if dense else 0](body)
+    COMPRESSION_SECONDS.labels(encoding).observe(time.perf_counter() - start)
+    COMPRESSION_BYTES.labels(encoding, "in").inc(len(body))
+    COMPRESSION_BYTES.labels(encoding, "out").inc(len(compressed))
+    return compressed
+
+
+class _CachedResponse:
+    __slots__ = ("version", "stored_at", "status", "headers", "body", "route")
+
+    def __init__(self, version, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, route):
+        self.version = version
+        self.stored_at = time.monotonic()
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.route = route
+
+
+class ResponseCache:
+    """LRU of fully rendered (and usually compressed) hot responses"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, _CachedResponse]" = OrderedDict()
+        self._local_version = 0
+        self._hot_paths = re.compile(rf"^{re.escape(settings.API_PREFIX)}/games/[^/]+/(latest|history)$")
+
+    def version(self) -> Tuple[int, int]:
+        return self._local_version, snapshot_sequence()
+
+    def invalidate(self):
+        """Drop every cached body (call after saving a new result)"""
+        self._local_version += 1
+        self._entries.clear()
+        RESPONSE_CACHE_ENTRIES.set(0)
+
+    def key_for(self, scope: Dict, encoding: Optional[str]) -> Optional[tuple]:
+        """Cache key for hot, cacheable requests; None for everything else"""
+        if scope["method"] != "GET" or self.max_entries <= 0:
+            return None
+        match = self._hot_paths.match(scope["path"])
+        if match is None:
+            return None
+        query = scope.get("query_string", b"")
+        if match.group(1) == "history" and query:
+            offset = parse_qs(query.decode("latin-1")).get("offset", ["0"])[0]
+            if not offset.isdigit() or int(offset) >= settings.COMPRESSION_CACHE_MAX_OFFSET:
+                return None
+        return scope["path"], query, encoding or "identity"
+
+    def get(self, key: tuple) -> Optional[_CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            RESPONSE_CACHE_TOTAL.labels("miss").inc()
+            return None
+        if entry.version != self.version() or time.monotonic() - entry.stored_at > self.ttl:
+            del self._entries[key]
+            RESPONSE_CACHE_TOTAL.labels("stale").inc()
+            return None
+        self._entries.move_to_end(key)
+        RESPONSE_CACHE_TOTAL.labels("hit").inc()
+        return entry
+
+    def put(self, key: tuple, entry: _CachedResponse):
+        if entry.version != self.version():
+            return  # A result landed while this body was rendered
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+
+
+class CompressionMiddleware:
+    """ASGI middleware negotiating Content-Encoding and serving cached hot responses"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        key = response_cache.key_for(scope, encoding)
+        if key is not None:
+            entry = response_cache.get(key)
+            if entry is not None:
+                # Outer middleware labels metrics by route template
+                scope["route"] = entry.route
+                await send({"type": "http.response.start", "status": entry.status, "headers": entry.headers})
+                await send({"type": "http.response.body", "body": entry.body})
+                return
+
+        responder = _CompressingResponder(
+            send, scope, encoding, self.minimum_size, key, response_cache.version() if key else None
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """Buffers a single-message response, compresses it and optionally caches it.
+
+    Streaming responses (several body messages) pass through unchanged.
+    """
+
+    def __init__(self, send, scope, encoding: Optional[str], minimum_size: int,
+                 cache_key: Optional[tuple], version):
+        self._send = send
+        self._scope = scope
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cache_key = cache_key
+        self.version = version
+        self._start: Optional[Dict] = None
+        self._streaming = False
+
+    async def send(self, message: Dict):
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body" or self._start is None:
+            await self._send(message)
+            return
+        if self._streaming or message.get("more_body", False):
+            if not self._streaming:
+                self._streaming = True
+                await self._send(self._start)
+            await self._send(message)
+            return
+
+        start, body = self._start, message.get("body", b"")
+        self._start = None
+        headers = MutableHeaders(raw=list(start["headers"]))
+        cacheable = self.cache_key is not None and start["status"] == 200
+        compressible = headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        if self.encoding and compressible and len(body) >= self.minimum_size and "content-encoding" not in headers:
+            body = compress(body, self.encoding, dense=cacheable)
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(body))
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if cacheable:
+            response_cache.put(
+                self.cache_key,
+                _CachedResponse(self.version, start["status"], headers.raw, body, self._scope.get("route"))
+            )
+        await self._send({**start, "headers": headers.raw})
+        await self._send({"type": "http.response.body", "body": body})
+
+
+# Global cache instance
+response_cache = ResponseCache(settings.COMPRESSION_CACHE_ENTRIES, settings.COMPRESSION_CACHE_TTL)
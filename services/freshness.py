@@ -0,0 +1,207 @@
+"""
+End-to-end freshness of results: per-stage timestamps and lag distributions
+
+Every stored result records when it passed each pipeline stage (columns
+on game_results, all UTC):
+
+    upstream_at       timestamp the upstream gave the round (result_data["timestamp"])
+    fetched_at        crawler received the response / page
+    parsed_at         game data extracted from it
+    persisted_at      row committed
+    notified_at       notifications and webhook fan-out queued
+    first_served_at   first API response containing the row (any worker)
+
+Because the stamps live in the database, any worker can aggregate them:
+for a window, each stage gets the distribution of its lag behind the
+upstream timestamp ("lag") and behind the previous stage the row
+reached ("delta"), which shows where latency builds up. The crawler also
+observes the lags of its own stages in result_freshness_lag_seconds.
+
+/health only ever reads the last computed summary (refreshed in the
+background when older than FRESHNESS_CACHE_SECONDS), so it never waits
+on the database.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from config import settings
+from services.latency import WINDOWS
+from services.metrics import metrics
+from services.sketch import DDSketch
+
+STAGES = ("fetched", "parsed", "persisted", "notified", "first_served")
+# Stage order including the upstream timestamp every lag is measured from
+TIMELINE = ("upstream",) + STAGES
+QUANTILES = (0.5, 0.95, 0.99)
+HEALTH_WINDOW = "5m"
+
+RESULT_FRESHNESS_SECONDS = metrics.histogram(
+    "result_freshness_lag_seconds", "Seconds from the upstream result timestamp to each pipeline stage",
+    ["game_type", "stage"], buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+
+
+def upstream_time(result_data: Dict) -> Optional[datetime]:
+    """Upstream timestamp of a result as naive UTC (ISO text or Unix seconds/milliseconds)"""
+    value = result_data.get("timestamp") if isinstance(result_data, dict) else None
+    try:
+        if isinstance(value, (int, float)):
+            seconds = value / 1000 if value > 1e11 else value
+        elif isinstance(value, str) and value:
+            # Naive timestamps are taken as local time, like the crawler's own datetime.now() fallbacks
+            seconds = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        else:
+            return None
+        return datetime.utcfromtimestamp(seconds)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def observe(game_type: str, stage: str, upstream_at: Optional[datetime], at: Optional[datetime]):
+    """Record one stage's lag in the Prometheus histogram"""
+    if upstream_at is not None and at is not None:
+        RESULT_FRESHNESS_SECONDS.labels(game_type, stage).observe(max(0.0, (at - upstream_at).total_seconds()))
+
+
+def _describe(sketch: DDSketch) -> Dict:
+    if not sketch.count:
+        return {"count": 0}
+    return {
+        "count": sketch.count,
+        "mean": sketch.sum / sketch.count,
+        "max": sketch.max,
+        **{f"p{int(q * 100)}": sketch.quantile(q) for q in QUANTILES},
+    }
+
+
+def summarize(rows: Iterable, window: str, now: Optional[datetime] = None) -> Dict:
+    """Per game and stage lag/delta distributions from (game_type, upstream_at, ..., first_served_at) rows"""
+    now = now or datetime.utcnow()
+    games: Dict[str, Dict] = {}
+    for row in rows:
+        game_type, times = row[0], dict(zip(TIMELINE, row[1:]))
+        game = games.get(game_type)
+        if game is None:
+            game = games[game_type] = {
+                "results": 0, "newest": None,
+                "lag": {stage: DDSketch(settings.LATENCY_SKETCH_ACCURACY) for stage in STAGES},
+                "delta": {stage: DDSketch(settings.LATENCY_SKETCH_ACCURACY) for stage in STAGES},
+            }
+        game["results"] += 1
+        origin = times["upstream"] or times["fetched"]
+        if origin and (game["newest"] is None or origin > game["newest"]):
+            game["newest"] = origin
+        previous = times["upstream"]
+        for stage in STAGES:
+            at = times[stage]
+            if at is None:
+                continue
+            if times["upstream"] is not None:
+                game["lag"][stage].add(max(0.0, (at - times["upstream"]).total_seconds()))
+            if previous is not None:
+                game["delta"][stage].add(max(0.0, (at - previous).total_seconds()))
+            previous = at
+
+    return {
+        "window": window,
+        "generated_at": now.isoformat(),
+        "games": {
+            game_type: {
+                "results": game["results"],
+                "newest_result_at": game["newest"].isoformat() if game["newest"] else None,
+                "newest_result_age_seconds": (now - game["newest"]).total_seconds() if game["newest"] else None,
+                "stages": {
+                    stage: {"lag": _describe(game["lag"][stage]), "delta": _describe(game["delta"][stage])}
+                    for stage in STAGES
+                },
+            }
+            for game_type, game in sorted(games.items())
+        },
+    }
+
+
+class FreshnessTracker:
+    """Marks results as served and caches window summaries for the endpoint and /health"""
+
+    def __init__(self, cache_seconds: float):
+        self.cache_seconds = cache_seconds
+        self.served_high_water: Dict[str, int] = {}  # game_type -> highest result id this worker served
+        self._summaries: Dict[str, tuple] = {}  # window -> (monotonic time, summary)
+        self._refreshing: Optional[asyncio.Task] = None
+        self._pending: set = set()
+
+    def served(self, results: List[Dict]):
+        """Called with the results of an API response; stamps first_served_at on rows new to this worker"""
+        new_ids = []
+        for result in results:
+            result_id, game_type = result.get("id"), result.get("game_type")
+            if result_id is not None and result_id > self.served_high_water.get(game_type, 0):
+                new_ids.append(result_id)
+        if not new_ids:
+            return
+        for result in results:
+            game_type = result.get("game_type")
+            self.served_high_water[game_type] = max(self.served_high_water.get(game_type, 0), result.get("id") or 0)
+        task = asyncio.get_running_loop().create_task(self._mark_served(new_ids, datetime.utcnow()))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    @staticmethod
+    async def _mark_served(result_ids: List[int], at: datetime):
+        from database import mark_results_served
+
+        try:
+            await mark_results_served(result_ids, at)
+        except Exception as e:
+            logger.warning(f"Could not record first_served_at for results {result_ids}: {e}")
+
+    async def summary(self, window: str, minutes: int) -> Dict:
+        """Summary over the last `minutes` minutes, at most FRESHNESS_CACHE_SECONDS old"""
+        cached = self._summaries.get(window)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_seconds:
+            return cached[1]
+        from database import load_freshness_rows
+
+        now = datetime.utcnow()
+        rows = await load_freshness_rows(now - timedelta(minutes=minutes))
+        result = summarize(rows, window, now)
+        self._summaries[window] = (time.monotonic(), result)
+        return result
+
+    def health(self) -> Optional[Dict]:
+        """Compact view of the last HEALTH_WINDOW summary; never waits for the database"""
+        cached = self._summaries.get(HEALTH_WINDOW)
+        stale = cached is None or time.monotonic() - cached[0] >= self.cache_seconds
+        if stale and (self._refreshing is None or self._refreshing.done()):
+            self._refreshing = asyncio.get_running_loop().create_task(self._refresh())
+        if cached is None:
+            return None
+        summary, now = cached[1], datetime.utcnow()
+        return {
+            "window": HEALTH_WINDOW,
+            "generated_at": summary["generated_at"],
+            "games": {
+                game_type: {
+                    "newest_result_age_seconds": (
+                        (now - datetime.fromisoformat(game["newest_result_at"])).total_seconds()
+                        if game["newest_result_at"] else None
+                    ),
+                    "p95_lag_seconds": {stage: values["lag"].get("p95") for stage, values in game["stages"].items()},
+                }
+                for game_type, game in summary["games"].items()
+            },
+        }
+
+    async def _refresh(self):
+        try:
+            await self.summary(HEALTH_WINDOW, WINDOWS[HEALTH_WINDOW])
+        except Exception as e:
+            logger.warning(f"Freshness summary refresh failed: {e}")
+
+
+# Global tracker (one per worker process)
+freshness_tracker = FreshnessTracker(settings.FRESHNESS_CACHE_SECONDS)
@@ -0,0 +1,159 @@
+"""
+Per-route latency quantiles over sliding windows, merged across workers
+
+Every request is added to an in-memory DDSketch for its (route template,
+status class) and the current minute. Each worker checkpoints the minutes
+it touched to `latency_sketches` and reads back the other workers'
+checkpoints, so p50/p95/p99 for the last 1/5/15/60 minutes come from
+merging at most 60 sketches per worker and key, however many requests
+were served. Windows slide by whole minutes; the current minute counts
+as it fills.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+from services.sketch import DDSketch
+
+WINDOW_MINUTES = 60
+WINDOWS = {"1m": 1, "5m": 5, "15m": 15, "1h": 60}
+QUANTILES = (0.5, 0.95, 0.99)
+
+SKETCH_CHECKPOINT_SECONDS = metrics.histogram(
+    "latency_sketch_checkpoint_duration_seconds", "Time to checkpoint and reload latency sketches"
+)
+
+Key = Tuple[str, str]  # (route, status class)
+
+
+def _minute(timestamp: float) -> int:
+    return int(timestamp // 60)
+
+
+def _minute_start(minute: int) -> datetime:
+    return datetime.utcfromtimestamp(minute * 60)
+
+
+class LatencyTracker:
+    """This worker's sketches plus the latest checkpoint of every other worker"""
+
+    def __init__(self, relative_accuracy: float):
+        self.relative_accuracy = relative_accuracy
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.local: Dict[int, Dict[Key, DDSketch]] = {}
+        self.remote: Dict[int, Dict[Key, DDSketch]] = {}  # other workers, merged per minute
+        self.remote_loaded_at: Optional[float] = None
+        self._dirty: set = set()
+
+    def observe(self, route: str, status: int, seconds: float):
+        minute = _minute(time.time())
+        sketches = self.local.get(minute)
+        if sketches is None:
+            sketches = self.local[minute] = {}
+            self._trim(minute)
+        key = (route, f"{status // 100}xx")
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = DDSketch(self.relative_accuracy)
+        sketch.add(seconds)
+        self._dirty.add(minute)
+
+    def _trim(self, current: int):
+        for sketches in (self.local, self.remote):
+            for minute in [minute for minute in sketches if minute <= current - WINDOW_MINUTES]:
+                del sketches[minute]
+
+    def window(self, minutes: int, route: Optional[str] = None, scope: str = "cluster") -> Dict[Key, DDSketch]:
+        """Sketches merged over the last `minutes` minutes (including the current one)"""
+        current = _minute(time.time())
+        sources = [self.local, self.remote] if scope == "cluster" else [self.local]
+        merged: Dict[Key, DDSketch] = {}
+        for source in sources:
+            for minute in range(current - minutes + 1, current + 1):
+                for key, sketch in source.get(minute, {}).items():
+                    if route and key[0] != route:
+                        continue
+                    if key not in merged:
+                        merged[key] = DDSketch(self.relative_accuracy)
+                    merged[key].merge(sketch)
+        return merged
+
+    def summary(self, window: str, route: Optional[str] = None, scope: str = "cluster") -> Dict:
+        sketches = self.window(WINDOWS[window], route, scope)
+        routes = []
+        for (route_path, status_class), sketch in sorted(sketches.items()):
+            routes.append({
+                "route": route_path,
+                "status_class": status_class,
+                "count": sketch.count,
+                "mean": sketch.sum / sketch.count if sketch.count else None,
+                "max": sketch.max if sketch.count else None,
+                **{f"p{int(q * 100)}": sketch.quantile(q) for q in QUANTILES},
+            })
+        return {
+            "window": window,
+            "scope": scope,
+            "relative_accuracy": self.relative_accuracy,
+            "workers_merged_at": self.remote_loaded_at,
+            "routes": routes,
+        }
+
+    async def checkpoint(self):
+        """Write the minutes touched since the last checkpoint, then reload the other workers'"""
+        from database import load_latency_sketches, save_latency_sketches
+
+        with SKETCH_CHECKPOINT_SECONDS.labels().time():
+            dirty, self._dirty = self._dirty, set()
+            rows = [
+                {
+                    "bucket_start": _minute_start(minute),
+                    "route": route,
+                    "status_class": status_class,
+                    "worker_id": self.worker_id,
+                    "sketch": json.dumps(sketch.to_dict(), separators=(",", ":")),
+                }
+                for minute in dirty if minute in self.local
+                for (route, status_class), sketch in self.local[minute].items()
+            ]
+            try:
+                await save_latency_sketches(rows)
+            except Exception:
+                self._dirty |= dirty  # Retry these minutes next time
+                raise
+
+            current = _minute(time.time())
+            remote: Dict[int, Dict[Key, DDSketch]] = {}
+            for row in await load_latency_sketches(_minute_start(current - WINDOW_MINUTES + 1)):
+                if row.worker_id == self.worker_id:
+                    continue
+                minute = _minute((row.bucket_start - datetime(1970, 1, 1)).total_seconds())
+                key = (row.route, row.status_class)
+                sketch = DDSketch.from_dict(json.loads(row.sketch))
+                existing = remote.setdefault(minute, {}).get(key)
+                if existing is None:
+                    remote[minute][key] = sketch
+                else:
+                    existing.merge(sketch)
+            self.remote = remote
+            self.remote_loaded_at = time.time()
+
+    async def run(self):
+        """Checkpoint every LATENCY_SKETCH_CHECKPOINT_INTERVAL seconds; cancel to stop"""
+        while True:
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.warning(f"Latency sketch checkpoint failed: {e}")
+            await asyncio.sleep(settings.LATENCY_SKETCH_CHECKPOINT_INTERVAL)
+
+
+# Global tracker (one per worker process)
+latency_tracker = LatencyTracker(settings.LATENCY_SKETCH_ACCURACY)
@@ -0,0 +1,256 @@
+"""
+Leader election so only one process runs the crawler
+"""
+import asyncio
+import fcntl
+import json
+import os
+import socket
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+IS_LEADER = metrics.gauge("crawler_is_leader", "1 if this process holds the crawler leadership")
+LEADER_TRANSITIONS = metrics.counter(
+    "crawler_leader_transitions_total", "Leadership changes in this process", ["transition"]
+)
+
+
+class FileLockBackend:
+    """flock()-based lock for workers on one host.
+
+    The kernel drops the lock when the holder dies, so a follower can take
+    over on its next attempt. The leader rewrites the file with a heartbeat
+    on every renewal so followers can report who holds the lease.
+    """
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def try_acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def renew(self, identity: Dict) -> bool:
+        if self._fd is None:
+            return False
+        # A lock on a file that was deleted or replaced no longer excludes anyone
+        try:
+            if os.stat(self.path).st_ino != os.fstat(self._fd).st_ino:
+                return False
+        except FileNotFoundError:
+            return False
+        data = json.dumps(identity).encode()
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, data, 0)
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.ftruncate(self._fd, 0)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def holder(self) -> Optional[Dict]:
+        try:
+            with open(self.path) as lock_file:
+                content = lock_file.read()
+            return json.loads(content) if content else None
+        except (OSError, ValueError):
+            return None
+
+
+class AdvisoryLockBackend:
+    """PostgreSQL session-level advisory lock for workers on several hosts.
+
+    The lock lives as long as the dedicated connection; renewal pings that
+    connection, and a dead connection (or a dead leader) releases the lock
+    on the server side.
+    """
+    name = "postgres_advisory_lock"
+
+    def __init__(self, engine, key: int):
+        self.engine = engine
+        self.key = key
+        self._conn = None
+
+    def try_acquire(self) -> bool:
+        from sqlalchemy import text
+
+        conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def renew(self, identity: Dict) -> bool:
+        from sqlalchemy import text
+
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"Advisory lock connection lost: {e}")
+            self._conn.invalidate()
+            self._conn = None
+            return False
+
+    def release(self):
+        from sqlalchemy import text
+
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def holder(self) -> Optional[Dict]:
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            pid = conn.execute(
+                text("SELECT pid FROM pg_locks WHERE locktype = 'advisory' AND granted "
+                     "AND ((classid::bigint << 32) | objid::bigint) = :key"),
+                {"key": self.key}
+            ).scalar()
+        return {"backend_pid": pid} if pid else None
+
+
+class NoElectionBackend:
+    """Every process is leader (single-process deployments)"""
+    name = "none"
+
+    def try_acquire(self) -> bool:
+        return True
+
+    def renew(self, identity: Dict) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+    def holder(self) -> Optional[Dict]:
+        return None
+
+
+def create_backend():
+    """Pick the election backend from LEADER_ELECTION / DATABASE_URL"""
+    mode = settings.LEADER_ELECTION
+    if mode == "auto":
+        from database import IS_POSTGRES
+        mode = "postgres" if IS_POSTGRES else "file"
+    if mode == "postgres":
+        from database import engine
+        key = zlib.crc32(f"{settings.APP_NAME}:crawler".encode())
+        return AdvisoryLockBackend(engine, key)
+    if mode == "file":
+        return FileLockBackend(settings.LEADER_LOCK_FILE)
+    return NoElectionBackend()
+
+
+class LeaderElector:
+    """Keeps trying to become leader and runs callbacks on transitions"""
+
+    def __init__(self, backend, on_elected: Callable[[], Awaitable[None]],
+                 on_demoted: Callable[[], Awaitable[None]], renew_interval: float):
+        self.backend = backend
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.renew_interval = renew_interval
+        self.is_leader = False
+        self.elected_at: Optional[float] = None
+        self.last_renewed: Optional[float] = None
+        self._running = False
+        self._identity = {"pid": os.getpid(), "hostname": socket.gethostname()}
+
+    async def run(self):
+        """Election loop; cancel the task or call stop() to leave"""
+        self._running = True
+        while self._running:
+            try:
+                if self.is_leader:
+                    if not self.backend.renew(self._heartbeat()):
+                        await self._demote("lease renewal failed")
+                    else:
+                        self.last_renewed = time.time()
+                elif self.backend.try_acquire():
+                    self.backend.renew(self._heartbeat())
+                    await self._promote()
+            except Exception as e:
+                logger.error(f"Leader election error: {e}")
+                if self.is_leader:
+                    await self._demote("election error")
+            await asyncio.sleep(self.renew_interval)
+
+    async def stop(self):
+        """Step down and release the lock"""
+        self._running = False
+        if self.is_leader:
+            await self._demote("shutdown")
+        self.backend.release()
+
+    async def _promote(self):
+        self.is_leader = True
+        self.elected_at = self.last_renewed = time.time()
+        IS_LEADER.set(1)
+        LEADER_TRANSITIONS.labels("elected").inc()
+        logger.info(f"Became crawler leader via {self.backend.name} (pid {os.getpid()})")
+        await self.on_elected()
+
+    async def _demote(self, reason: str):
+        self.is_leader = False
+        self.elected_at = self.last_renewed = None
+        IS_LEADER.set(0)
+        LEADER_TRANSITIONS.labels("demoted").inc()
+        logger.warning(f"Lost crawler leadership: {reason}")
+        try:
+            await self.on_demoted()
+        finally:
+            self.backend.release()
+
+    def _heartbeat(self) -> Dict:
+        renewed_at = time.time()
+        return {
+            **self._identity,
+            "renewed_at": renewed_at,
+            "lease_expires_at": renewed_at + self.renew_interval * 3,
+        }
+
+    def status(self) -> Dict:
+        """Leadership state for /health"""
+        status = {
+            "backend": self.backend.name,
+            "is_leader": self.is_leader,
+            "pid": os.getpid(),
+            "elected_at": self.elected_at,
+            "last_renewed": self.last_renewed,
+        }
+        if not self.is_leader:
+            try:
+                status["holder"] = self.backend.holder()
+            except Exception as e:
+                status["holder_error"] = str(e)
+        return status
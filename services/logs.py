@@ -0,0 +1,147 @@
+"""
+Logging setup: enqueued sinks, JSON lines and per-call-site rate limiting
+
+Every sink is added with enqueue=True, so writes happen on loguru's
+background thread and a slow disk or pipe never stalls the event loop.
+The file sink (and the console with LOG_CONSOLE_JSON) writes one compact
+JSON object per line.
+
+Call sites that repeat every crawl cycle (a failing method or endpoint
+logs once per game per cycle) are rate-limited: each (module, line,
+level) may log LOG_RATE_LIMIT_BURST records per LOG_RATE_LIMIT_WINDOW
+seconds. Further records are dropped before they are formatted, counted
+in log_messages_suppressed_total, and the site's first record of the next
+window carries `suppressed` = how many were dropped.
+"""
+import json
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+LOG_SUPPRESSED = metrics.counter(
+    "log_messages_suppressed_total", "Log records dropped by the per-call-site rate limit", ["level"]
+)
+
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+# Keys of record["extra"] used internally and left out of the output
+INTERNAL_EXTRA = {"sampled_out", "json"}
+
+Site = Tuple[str, int, str]  # (module, line, level)
+
+
+class LogRateLimiter:
+    """Loguru patcher marking records beyond the per-site budget as sampled out"""
+
+    def __init__(self, burst: int, window: float):
+        self.burst = burst
+        self.window = window
+        self.sites: Dict[Site, list] = {}  # site -> [window start, records in window, suppressed in window]
+        self.suppressed_total: Dict[Site, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        if self.burst <= 0 or record["level"].no >= 50:  # CRITICAL is never dropped
+            return
+        site = (record["name"], record["line"], record["level"].name)
+        now = time.monotonic()
+        with self._lock:
+            state = self.sites.get(site)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record["extra"]["suppressed"] = state[2]
+                state = self.sites[site] = [now, 0, 0]
+            state[1] += 1
+            if state[1] <= self.burst:
+                return
+            state[2] += 1
+            self.suppressed_total[site] = self.suppressed_total.get(site, 0) + 1
+        record["extra"]["sampled_out"] = True
+        LOG_SUPPRESSED.labels(record["level"].name).inc()
+
+    def status(self, limit: int = 20) -> Dict:
+        with self._lock:
+            top = sorted(self.suppressed_total.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return {
+            "burst": self.burst,
+            "window_seconds": self.window,
+            "sites_tracked": len(self.sites),
+            "suppressed": [
+                {"module": module, "line": line, "level": level, "count": count}
+                for (module, line, level), count in top
+            ],
+        }
+
+
+def _keep(record) -> bool:
+    return "sampled_out" not in record["extra"]
+
+
+def _json_format(record) -> str:
+    """One JSON object per record (loguru format callable)"""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "module": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "process": record["process"].id,
+    }
+    extra = {key: value for key, value in record["extra"].items() if key not in INTERNAL_EXTRA}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        error_type, error, trace = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(error_type, error, trace))
+    record["extra"]["json"] = json.dumps(entry, ensure_ascii=False, default=str)
+    return "{extra[json]}\n"
+
+
+def _text_format(record) -> str:
+    suffix = " <yellow>({extra[suppressed]} similar suppressed)</yellow>" if "suppressed" in record["extra"] else ""
+    return TEXT_FORMAT + suffix + "\n{exception}"
+
+
+rate_limiter = LogRateLimiter(settings.LOG_RATE_LIMIT_BURST, settings.LOG_RATE_LIMIT_WINDOW)
+_configured = False
+
+
+def configure_logging(log_file: Optional[str] = None, force: bool = False):
+    """Replace loguru's default sink with enqueued console (and optional file) sinks
+
+    Called by each worker at startup; later calls are no-ops unless `force`,
+    so an entry point that configured a file sink first keeps it.
+    """
+    global _configured
+    if _configured and not force:
+        return
+    logger.remove()
+    logger.configure(patcher=rate_limiter)
+    logger.add(
+        sys.stderr,
+        level=settings.LOG_LEVEL,
+        format=_json_format if settings.LOG_CONSOLE_JSON else _text_format,
+        filter=_keep,
+        enqueue=True,
+    )
+    if log_file:
+        logger.add(
+            log_file,
+            rotation="1 day",
+            retention="30 days",
+            level=settings.LOG_LEVEL,
+            format=_json_format if settings.LOG_JSON else _text_format,
+            filter=_keep,
+            enqueue=True,
+        )
+    _configured = True
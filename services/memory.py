@@ -0,0 +1,266 @@
+"""
+Memory diagnostics for the long-running crawler process
+
+Tracks RSS of this process and of its descendants (chromedriver and the
+Chrome processes it spawns, and the worker pool's processes) once per
+crawl cycle, serves tracemalloc
+snapshot diffs and top allocation sites on demand, and decides which
+component to recycle when a configured ceiling is crossed.
+"""
+import ctypes
+import gc
+import os
+import signal
+import time
+import tracemalloc
+from collections import deque
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MB = 1024 * 1024
+# Cycles to wait after recycling a component before it may be recycled again,
+# so a baseline that sits above the ceiling does not recycle every cycle
+RECYCLE_COOLDOWN_CYCLES = 10
+
+PROCESS_RSS = metrics.gauge("process_resident_memory_bytes", "Resident memory of this process")
+CHILD_PROCESSES = metrics.gauge("crawler_child_processes", "Descendant processes (browsers, drivers, workers)")
+CHILD_RSS = metrics.gauge("crawler_child_resident_memory_bytes", "Resident memory of all descendant processes")
+BROWSER_RSS = metrics.gauge("crawler_browser_resident_memory_bytes", "Resident memory of Chrome/chromedriver processes")
+BROWSER_PEAK_RSS = metrics.gauge(
+    "crawler_browser_peak_resident_memory_bytes", "Chrome/chromedriver RSS observed while a browser method ran",
+    ["method"]
+)
+MEMORY_RECYCLES = metrics.counter(
+    "crawler_memory_recycles_total", "Components recycled after crossing a memory ceiling", ["component"]
+)
+
+
+def _read_rss(pid: int) -> Optional[int]:
+    """RSS in bytes from /proc/<pid>/statm (None if unavailable)"""
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def process_rss() -> Optional[int]:
+    rss = _read_rss(os.getpid())
+    if rss is None:
+        import resource
+        # Peak rather than current RSS, but better than nothing off Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return rss
+
+
+def child_processes() -> List[Dict]:
+    """Every descendant of this process with its command name and RSS"""
+    parents: Dict[int, List[int]] = {}
+    names: Dict[int, str] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                data = stat.read()
+        except OSError:
+            continue
+        # comm may contain spaces and parentheses; ppid is the second field after the last ")"
+        name = data[data.index("(") + 1:data.rindex(")")]
+        ppid = int(data[data.rindex(")") + 2:].split()[1])
+        parents.setdefault(ppid, []).append(int(entry))
+        names[int(entry)] = name
+
+    descendants, pending = [], list(parents.get(os.getpid(), []))
+    while pending:
+        pid = pending.pop()
+        pending.extend(parents.get(pid, []))
+        descendants.append({"pid": pid, "name": names.get(pid, "?"), "rss_bytes": _read_rss(pid) or 0})
+    return descendants
+
+
+def browser_processes(children: Optional[List[Dict]] = None) -> List[Dict]:
+    """Descendant Chrome/chromedriver processes (not the worker pool's)"""
+    if children is None:
+        children = child_processes()
+    return [child for child in children if "chrom" in child["name"].lower()]
+
+
+def terminate_browsers() -> int:
+    """Kill descendant Chrome/chromedriver processes left behind by crashed drivers"""
+    killed = []
+    for child in browser_processes():
+        try:
+            os.kill(child["pid"], signal.SIGKILL)
+            killed.append(child["pid"])
+        except OSError:
+            continue
+    # Reap the ones that were our direct children so they do not linger as zombies
+    for pid in killed:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass  # Grandchild, reaped by init once its parent is gone
+    return len(killed)
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS"""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass  # Not glibc
+
+
+class MemoryMonitor:
+    """Per-cycle memory samples, tracemalloc snapshots and ceiling checks"""
+
+    def __init__(self, history: int = 500):
+        self.samples: deque = deque(maxlen=history)
+        self.cycles = 0
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_taken_at: Optional[float] = None
+        self.recycles: Dict[str, int] = {}
+        self._last_recycle: Dict[str, int] = {}
+        PROCESS_RSS.labels().set_function(process_rss)
+
+    # Per-cycle accounting
+
+    def record_cycle(self) -> Dict:
+        """Sample process and descendant memory after a crawl cycle"""
+        self.cycles += 1
+        children = child_processes()
+        sample = {
+            "cycle": self.cycles,
+            "timestamp": time.time(),
+            "rss_bytes": process_rss(),
+            "child_processes": len(children),
+            "child_rss_bytes": sum(child["rss_bytes"] for child in children),
+            "browser_rss_bytes": sum(child["rss_bytes"] for child in browser_processes(children)),
+        }
+        if tracemalloc.is_tracing():
+            sample["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+        CHILD_PROCESSES.set(sample["child_processes"])
+        CHILD_RSS.set(sample["child_rss_bytes"])
+        BROWSER_RSS.set(sample["browser_rss_bytes"])
+        self.samples.append(sample)
+        return sample
+
+    def record_browser(self, method: str):
+        """Sample Chrome/chromedriver RSS while a browser driver is alive"""
+        BROWSER_PEAK_RSS.labels(method).set(sum(child["rss_bytes"] for child in browser_processes()))
+
+    def check_ceilings(self, sample: Dict) -> List[str]:
+        """Components to recycle for this sample, most specific first"""
+        components = []
+        if settings.BROWSER_MEMORY_CEILING_MB and sample["browser_rss_bytes"] > settings.BROWSER_MEMORY_CEILING_MB * MB:
+            components.append("browser")
+        if settings.MEMORY_CEILING_MB and (sample["rss_bytes"] or 0) > settings.MEMORY_CEILING_MB * MB:
+            components.append("crawler")
+        return [
+            component for component in components
+            if self.cycles - self._last_recycle.get(component, -RECYCLE_COOLDOWN_CYCLES) >= RECYCLE_COOLDOWN_CYCLES
+        ]
+
+    def recycled(self, component: str, before: Optional[int], after: Optional[int]):
+        self.recycles[component] = self.recycles.get(component, 0) + 1
+        self._last_recycle[component] = self.cycles
+        MEMORY_RECYCLES.labels(component).inc()
+        logger.warning(
+            f"Recycled {component} after crossing its memory ceiling: "
+            f"{(before or 0) / MB:.1f} MB -> {(after or 0) / MB:.1f} MB"
+        )
+
+    # tracemalloc
+
+    def start_tracing(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.take_baseline()
+
+    def stop_tracing(self):
+        self.baseline = None
+        self.baseline_taken_at = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def take_baseline(self):
+        self.baseline = self._snapshot()
+        self.baseline_taken_at = time.time()
+
+    def top(self, limit: int = 20, key_type: str = "lineno") -> List[Dict]:
+        """Largest live allocation sites"""
+        stats = self._snapshot().statistics(key_type)
+        return [
+            {"site": self._site(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+            for stat in stats[:limit]
+        ]
+
+    def diff(self, limit: int = 20, key_type: str = "lineno") -> List[Dict]:
+        """Allocation sites that grew most since the baseline snapshot"""
+        if self.baseline is None:
+            raise RuntimeError("No baseline snapshot; start tracing or take a snapshot first")
+        stats = self._snapshot().compare_to(self.baseline, key_type)
+        return [
+            {
+                "site": self._site(stat.traceback),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:limit]
+        ]
+
+    @staticmethod
+    def _site(traceback: tracemalloc.Traceback) -> List[str]:
+        return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+    def status(self, recent: int = 20) -> Dict:
+        children = child_processes()
+        traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": process_rss(),
+            "children": children,
+            "child_rss_bytes": sum(child["rss_bytes"] for child in children),
+            "browser_rss_bytes": sum(child["rss_bytes"] for child in browser_processes(children)),
+            "tracemalloc": {
+                "tracing": tracemalloc.is_tracing(),
+                "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+                "traced_bytes": traced[0] if traced else None,
+                "peak_traced_bytes": traced[1] if traced else None,
+                "baseline_taken_at": self.baseline_taken_at,
+            },
+            "ceilings_mb": {
+                "crawler": settings.MEMORY_CEILING_MB or None,
+                "browser": settings.BROWSER_MEMORY_CEILING_MB or None,
+            },
+            "recycles": self.recycles,
+            "cycles_sampled": self.cycles,
+            "recent_cycles": list(self.samples)[-recent:] if recent > 0 else [],
+        }
+
+
+# Global monitor instance
+memory_monitor = MemoryMonitor(settings.MEMORY_HISTORY_CYCLES)
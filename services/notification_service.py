@@ -4,25 +4,43 @@ Notification service for sending alerts about new game results
 import asyncio
 import json
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, Optional
 from datetime import datetime
 
-import httpx
 from loguru import logger
-from telegram import Bot
-from telegram.error import TelegramError
 
 from config import settings
+from services.metrics import metrics
+from services.webhooks import webhook_dispatcher
+
+NOTIFICATION_SECONDS = metrics.histogram(
+    "notification_duration_seconds", "Duration of notification deliveries", ["channel"]
+)
+NOTIFICATION_TOTAL = metrics.counter(
+    "notifications_total", "Notification deliveries by outcome (sent, failed)", ["channel", "outcome"]
+)
+
+def _record_delivery(channel: str, outcome: str, start: float):
+    """Record one notification delivery attempt"""
+    NOTIFICATION_SECONDS.labels(channel).observe(time.perf_counter() - start)
+    NOTIFICATION_TOTAL.labels(channel, outcome).inc()
 
 class NotificationService:
     """Service for sending notifications via multiple channels"""
     
     def __init__(self):
-        self.telegram_bot = None
-        if settings.TELEGRAM_BOT_TOKEN:
-            self.telegram_bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+        self._telegram_bot = None
+
+    @property
+    def telegram_bot(self):
+        """Telegram bot, created (and python-telegram-bot imported) on first use"""
+        if self._telegram_bot is None and settings.TELEGRAM_BOT_TOKEN:
+            from telegram import Bot
+            self._telegram_bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+        return self._telegram_bot
     
     async def send_new_result_notification(self, game_type: str, result_data: Dict, result_md5: str):
         """Send notification about new game result"""
@@ -31,7 +49,7 @@ class NotificationService:
         # Send via all configured channels
         tasks = []
         
-        if self.telegram_bot and settings.TELEGRAM_CHAT_ID:
+        if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_CHAT_ID:
             tasks.append(self._send_telegram_notification(message))
         
         if settings.EMAIL_SMTP_SERVER and settings.EMAIL_TO:
@@ -40,13 +58,17 @@ class NotificationService:
                 message=message
             ))
         
+        webhook_payload = {
+            'game_type': game_type,
+            'result_data': result_data,
+            'result_md5': result_md5,
+            'timestamp': datetime.now().isoformat()
+        }
         if settings.WEBHOOK_URL:
-            tasks.append(self._send_webhook_notification({
-                'game_type': game_type,
-                'result_data': result_data,
-                'result_md5': result_md5,
-                'timestamp': datetime.now().isoformat()
-            }))
+            tasks.append(self._send_webhook_notification(webhook_payload))
+        
+        # Registered subscribers: only queued here, delivered by their own workers
+        tasks.append(webhook_dispatcher.publish(game_type, webhook_payload))
         
         # Execute all notifications concurrently
         if tasks:
@@ -79,20 +101,27 @@ class NotificationService:
     
     async def _send_telegram_notification(self, message: str):
         """Send notification via Telegram"""
+        from telegram.error import TelegramError
+
+        start = time.perf_counter()
         try:
             await self.telegram_bot.send_message(
                 chat_id=settings.TELEGRAM_CHAT_ID,
                 text=message,
                 parse_mode='Markdown'
             )
+            _record_delivery("telegram", "sent", start)
             logger.info("Telegram notification sent successfully")
         except TelegramError as e:
+            _record_delivery("telegram", "failed", start)
             logger.error(f"Failed to send Telegram notification: {e}")
         except Exception as e:
+            _record_delivery("telegram", "failed", start)
             logger.error(f"Unexpected error sending Telegram notification: {e}")
     
     async def _send_email_notification(self, subject: str, message: str):
         """Send notification via email"""
+        start = time.perf_counter()
         try:
             msg = MIMEMultipart()
             msg['From'] = settings.EMAIL_FROM
@@ -110,12 +139,17 @@ class NotificationService:
                     server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
                 server.send_message(msg)
             
+            _record_delivery("email", "sent", start)
             logger.info("Email notification sent successfully")
         except Exception as e:
+            _record_delivery("email", "failed", start)
             logger.error(f"Failed to send email notification: {e}")
     
     async def _send_webhook_notification(self, data: Dict):
         """Send notification via webhook"""
+        import httpx
+
+        start = time.perf_counter()
         try:
             headers = {'Content-Type': 'application/json'}
             if settings.WEBHOOK_SECRET:
@@ -130,10 +164,13 @@ class NotificationService:
                 )
                 response.raise_for_status()
             
+            _record_delivery("webhook", "sent", start)
             logger.info("Webhook notification sent successfully")
         except httpx.HTTPError as e:
+            _record_delivery("webhook", "failed", start)
             logger.error(f"Failed to send webhook notification: {e}")
         except Exception as e:
+            _record_delivery("webhook", "failed", start)
             logger.error(f"Unexpected error sending webhook notification: {e}")
     
     async def send_system_notification(self, message: str, level: str = "info"):
@@ -142,7 +179,7 @@ class NotificationService:
         
         tasks = []
         
-        if self.telegram_bot and settings.TELEGRAM_CHAT_ID:
+        if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_CHAT_ID:
             tasks.append(self._send_telegram_notification(system_message))
         
         if settings.WEBHOOK_URL:
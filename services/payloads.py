@@ -0,0 +1,153 @@
+"""
+Compression of stored result payloads (game_results.result_data)
+
+Payloads are small JSON documents that repeat the same keys and much of
+the same page text, so they compress far better against a dictionary
+trained on earlier payloads of the same game than on their own. zstd
+(when zstandard is installed) trains a dictionary with
+zstandard.train_dictionary; otherwise stdlib zlib uses a preset
+dictionary assembled from sample payloads (zlib reads at most the last
+32 KiB of it).
+
+A stored payload is either plain JSON text (codec NULL) or a blob tagged
+`<codec>` or `<codec>:<dictionary id>`. Dictionaries are kept in the
+payload_dictionaries table and registered here by database.py; this
+module never touches the database itself. Decoding happens only when a
+row's result_data is read.
+"""
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PAYLOAD_BYTES = metrics.counter(
+    "payload_compression_bytes_total", "Result payload bytes before (in) and after (out) compression",
+    ["codec", "direction"]
+)
+PAYLOAD_DECODE_SECONDS = metrics.histogram(
+    "payload_decode_duration_seconds", "Time to decompress one stored result payload", ["codec"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005)
+)
+
+# zlib only uses the last 32 KiB of a preset dictionary
+ZLIB_MAX_DICTIONARY = 32 * 1024
+DEFAULT_LEVELS = {"zstd": 9, "zlib": 9}
+
+
+def available_codec(preference: str) -> Optional[str]:
+    """Codec for new payloads from PAYLOAD_COMPRESSION (auto, zstd, zlib, none)"""
+    if preference == "none":
+        return None
+    if preference in ("auto", "zstd") and zstandard is not None:
+        return "zstd"
+    return "zlib"
+
+
+class PayloadCodec:
+    """Encodes new payloads with the current dictionary of their game, decodes any stored payload"""
+
+    def __init__(self, codec: Optional[str], level: int = 0, min_size: int = 0):
+        self.codec = codec
+        self.level = level or DEFAULT_LEVELS.get(codec, 0)
+        self.min_size = min_size
+        self.dictionaries: Dict[int, Tuple[str, bytes]] = {}  # id -> (codec, data)
+        self.current: Dict[str, int] = {}  # game_type -> newest dictionary id for self.codec
+        self.loader: Optional[Callable[[int], Optional[Tuple[str, bytes]]]] = None
+        self._compressors: Dict[Optional[int], object] = {}
+        self._decompressors: Dict[int, object] = {}
+
+    def register(self, dictionary_id: int, codec: str, data: bytes, game_type: Optional[str] = None):
+        """Make a dictionary available; with `game_type`, new payloads of that game use it"""
+        self.dictionaries[dictionary_id] = (codec, data)
+        if game_type and codec == self.codec and dictionary_id > self.current.get(game_type, 0):
+            self.current[game_type] = dictionary_id
+
+    def encode(self, game_type: str, text: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[bytes]]:
+        """(plain text, codec tag, blob) to store; payloads that do not shrink stay plain"""
+        if text is None or self.codec is None or len(text) < self.min_size:
+            return text, None, None
+        raw = text.encode()
+        dictionary_id = self.current.get(game_type)
+        blob = self._compress(raw, dictionary_id)
+        if len(blob) >= len(raw):
+            return text, None, None
+        tag = self.codec if dictionary_id is None else f"{self.codec}:{dictionary_id}"
+        PAYLOAD_BYTES.labels(self.codec, "in").inc(len(raw))
+        PAYLOAD_BYTES.labels(self.codec, "out").inc(len(blob))
+        return None, tag, blob
+
+    def _compress(self, raw: bytes, dictionary_id: Optional[int]) -> bytes:
+        if self.codec == "zstd":
+            compressor = self._compressors.get(dictionary_id)
+            if compressor is None:
+                dict_data = None
+                if dictionary_id is not None:
+                    dict_data = zstandard.ZstdCompressionDict(self.dictionaries[dictionary_id][1])
+                compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data, write_checksum=False,
+                                                      write_content_size=True, write_dict_id=False)
+                self._compressors[dictionary_id] = compressor
+            return compressor.compress(raw)
+        if dictionary_id is None:
+            return zlib.compress(raw, self.level)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=self.dictionaries[dictionary_id][1])
+        return compressor.compress(raw) + compressor.flush()
+
+    def decode(self, tag: str, blob: bytes) -> str:
+        codec, _, dictionary = tag.partition(":")
+        with PAYLOAD_DECODE_SECONDS.labels(codec).time():
+            dictionary_id = int(dictionary) if dictionary else None
+            if dictionary_id is not None and dictionary_id not in self.dictionaries:
+                self._load(dictionary_id)
+            if codec == "zstd":
+                return self._zstd_decompressor(dictionary_id).decompress(blob).decode()
+            if codec == "zlib":
+                if dictionary_id is None:
+                    return zlib.decompress(blob).decode()
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS, zdict=self.dictionaries[dictionary_id][1])
+                return (decompressor.decompress(blob) + decompressor.flush()).decode()
+        raise ValueError(f"Unknown payload codec {tag!r}")
+
+    def _zstd_decompressor(self, dictionary_id: Optional[int]):
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed payloads need the zstandard package")
+        key = dictionary_id if dictionary_id is not None else 0
+        decompressor = self._decompressors.get(key)
+        if decompressor is None:
+            dict_data = None
+            if dictionary_id is not None:
+                dict_data = zstandard.ZstdCompressionDict(self.dictionaries[dictionary_id][1])
+            decompressor = self._decompressors[key] = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return decompressor
+
+    def _load(self, dictionary_id: int):
+        """Fetch a dictionary trained by another process"""
+        found = self.loader(dictionary_id) if self.loader else None
+        if found is None:
+            raise LookupError(f"Payload dictionary {dictionary_id} not found")
+        self.dictionaries[dictionary_id] = found
+
+
+def train_dictionary(codec: str, samples: List[bytes], size: int) -> bytes:
+    """Dictionary of at most `size` bytes for `codec` from sample payloads"""
+    if codec == "zstd":
+        return zstandard.train_dictionary(size, samples).as_bytes()
+    # zlib: distinct samples back to back, the first ones last (matches near the end are cheapest)
+    size = min(size, ZLIB_MAX_DICTIONARY)
+    data = bytearray()
+    for sample in dict.fromkeys(samples):
+        if len(data) + len(sample) > size:
+            break
+        data[:0] = sample
+    return bytes(data)
+
+
+# Global codec (one per process; database.py registers dictionaries at startup)
+payload_codec = PayloadCodec(
+    available_codec(settings.PAYLOAD_COMPRESSION), settings.PAYLOAD_COMPRESSION_LEVEL, settings.PAYLOAD_MIN_SIZE
+)
@@ -0,0 +1,215 @@
+"""
+Cadence-aware crawl scheduling: poll each game around its predicted next round
+
+Rounds of a game are published at a steady cadence. From the stored results
+(upstream_at, fetched_at) and then from every new round, the scheduler learns
+per game:
+
+    cadence   median seconds per round (a gap spanning rounds without an
+              upstream timestamp is divided by the rounds it spans)
+    offset    how long after its upstream timestamp a round shows up:
+              the smallest recent lag between a fetch's newest round and
+              the fetch
+
+The next poll of a game is due CRAWL_MIN_INTERVAL before the next round
+is expected to show up, and polls repeat every CRAWL_MIN_INTERVAL for
+CRAWL_ADAPTIVE_WINDOW seconds after that, with nothing in between. Each
+expected round that does not show up doubles the dense interval until
+one does. Polls are never further apart than CRAWL_INTERVAL. A game with
+too little history, or with CRAWL_ADAPTIVE off, is polled every
+CRAWL_INTERVAL exactly as before.
+
+crawler_poll_fetches_per_result and crawler_poll_publish_delay_seconds show,
+per game, the values measured over recent rounds (mode="measured"; the
+first poll after start, which catches up on downtime, is left out) next
+to what fixed polling every CRAWL_INTERVAL costs for the learned cadence
+(mode="fixed": cadence / CRAWL_INTERVAL fetches per result and
+offset + CRAWL_INTERVAL / 2 seconds from upstream timestamp to fetch).
+"""
+import math
+import statistics
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings, GAME_TYPES
+from services.metrics import metrics
+
+MIN_SAMPLES = 3  # round intervals needed before polling follows the cadence
+OFFSET_SAMPLES = 10  # recent detection lags the offset is the minimum of
+MAX_CADENCE = 86400.0  # seconds; longer gaps (outages) are not round intervals
+
+POLL_FETCHES_PER_RESULT = metrics.gauge(
+    "crawler_poll_fetches_per_result",
+    "Fetches per stored round: measured over recent rounds and modelled for fixed CRAWL_INTERVAL polling",
+    ["game_type", "mode"]
+)
+POLL_PUBLISH_DELAY = metrics.gauge(
+    "crawler_poll_publish_delay_seconds",
+    "Mean seconds from upstream timestamp to fetch: measured and modelled for fixed CRAWL_INTERVAL polling",
+    ["game_type", "mode"]
+)
+POLL_CADENCE = metrics.gauge("crawler_poll_cadence_seconds", "Learned seconds per round", ["game_type"])
+
+
+def _unix(value: Optional[datetime]) -> Optional[float]:
+    """Unix seconds of a naive UTC datetime"""
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+class GameCadence:
+    """Learned cadence and visibility offset of one game, and how its polling went"""
+
+    def __init__(self, history: int):
+        self.intervals: Deque[float] = deque(maxlen=history)  # seconds per round
+        self.lags: Deque[float] = deque(maxlen=OFFSET_SAMPLES)  # newest round of a fetch -> fetch
+        self.delays: Deque[float] = deque(maxlen=history)  # every round -> its fetch
+        self.fetch_counts: Deque[Tuple[int, int]] = deque(maxlen=history)  # (fetches, rounds) per new-round fetch
+        self.last_round_at: Optional[float] = None  # upstream time of the newest timed round
+        self.untimed = 0  # rounds after last_round_at without an upstream timestamp
+        self.fetches = 0  # fetches since rounds were last found
+        self.measuring = False  # False until the first poll (which catches up on downtime) is done
+        self.next_poll = 0.0
+
+    @property
+    def cadence(self) -> Optional[float]:
+        return statistics.median(self.intervals) if len(self.intervals) >= MIN_SAMPLES else None
+
+    @property
+    def offset(self) -> float:
+        return min(self.lags) if self.lags else 0.0
+
+    def add_rounds(self, rounds: List[Tuple[Optional[datetime], Optional[datetime]]], measure: bool = False):
+        """(upstream_at, fetched_at) of stored rounds, oldest first; `measure` counts their delays"""
+        for index, (upstream_at, fetched_at) in enumerate(rounds):
+            upstream, fetched = _unix(upstream_at), _unix(fetched_at)
+            if upstream is None:
+                self.untimed += 1
+                continue
+            if self.last_round_at is not None and upstream > self.last_round_at:
+                interval = (upstream - self.last_round_at) / (self.untimed + 1)
+                if interval <= MAX_CADENCE:
+                    self.intervals.append(interval)
+            self.last_round_at = max(upstream, self.last_round_at or upstream)
+            self.untimed = 0
+            if fetched is not None:
+                if measure:
+                    self.delays.append(max(0.0, fetched - upstream))
+                newest_of_fetch = index + 1 == len(rounds) or rounds[index + 1][1] != fetched_at
+                if newest_of_fetch:
+                    self.lags.append(max(0.0, fetched - upstream))
+
+    def plan(self, now: float, min_interval: float, max_interval: float, window: float) -> float:
+        """Time of the poll after one at `now`"""
+        cadence = self.cadence
+        if cadence is None or self.last_round_at is None:
+            return now + max_interval
+        window = min(window, cadence / 2)
+        expected = self.last_round_at + cadence + self.offset
+        # Expected rounds that never showed up: look for the next one, polling less densely each time
+        missed = max(0, math.floor((now - expected - window) / cadence) + 1)
+        expected += missed * cadence
+        start = expected - min_interval
+        if now < start:
+            return min(start, now + max_interval)
+        return now + min(max_interval, min_interval * 2 ** min(missed, 16))
+
+    def fetches_per_result(self) -> Optional[float]:
+        rounds = sum(count for _, count in self.fetch_counts)
+        return sum(fetches for fetches, _ in self.fetch_counts) / rounds if rounds else None
+
+    def publish_delay(self) -> Optional[float]:
+        return statistics.fmean(self.delays) if self.delays else None
+
+
+class PollScheduler:
+    """Per-game poll times for the crawl loop"""
+
+    def __init__(self, adaptive: bool, min_interval: float, max_interval: float, window: float,
+                 history: int, game_types: Iterable[str]):
+        self.adaptive = adaptive
+        self.min_interval = min(min_interval, max_interval)
+        self.max_interval = max_interval
+        self.window = window
+        self.history = history
+        self.games: Dict[str, GameCadence] = {game_type: GameCadence(history) for game_type in game_types}
+        for game_type, game in self.games.items():
+            POLL_CADENCE.labels(game_type).set_function(lambda game=game: game.cadence)
+            POLL_FETCHES_PER_RESULT.labels(game_type, "measured").set_function(game.fetches_per_result)
+            POLL_FETCHES_PER_RESULT.labels(game_type, "fixed").set_function(
+                lambda game=game: game.cadence / self.max_interval if game.cadence else None)
+            POLL_PUBLISH_DELAY.labels(game_type, "measured").set_function(game.publish_delay)
+            POLL_PUBLISH_DELAY.labels(game_type, "fixed").set_function(
+                lambda game=game: game.offset + self.max_interval / 2 if game.cadence else None)
+
+    async def start(self):
+        """Called when the crawl loop starts: learn each game's cadence from its stored results"""
+        if not self.adaptive:
+            return
+        from database import load_round_times
+
+        for game_type, game in self.games.items():
+            try:
+                game.add_rounds(await load_round_times(game_type, self.history))
+            except Exception as e:
+                logger.warning(f"Could not load round times for {game_type}: {e}")
+        learned = {game_type: game.cadence for game_type, game in self.games.items()}
+        logger.info(f"Poll cadence learned (seconds per round): {learned}")
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        now = now if now is not None else time.time()
+        return [game_type for game_type, game in self.games.items() if game.next_poll <= now]
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until the next poll of any game is due"""
+        now = now if now is not None else time.time()
+        return max(0.0, min(game.next_poll for game in self.games.values()) - now)
+
+    def polling(self, game_type: str):
+        self.games[game_type].fetches += 1
+
+    def found(self, game_type: str, rounds: List[Tuple[Optional[datetime], Optional[datetime]]]):
+        """(upstream_at, fetched_at) of the rounds a fetch stored, oldest first"""
+        game = self.games[game_type]
+        game.add_rounds(rounds, measure=game.measuring)
+        if game.measuring:
+            game.fetch_counts.append((game.fetches, len(rounds)))
+        game.fetches = 0
+
+    def polled(self, game_type: str, now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        game = self.games[game_type]
+        game.measuring = True
+        if self.adaptive:
+            game.next_poll = game.plan(now, self.min_interval, self.max_interval, self.window)
+        else:
+            game.next_poll = now + self.max_interval
+
+    def status(self) -> Dict:
+        now = time.time()
+        return {
+            "adaptive": self.adaptive,
+            "games": {
+                game_type: {
+                    "cadence_seconds": game.cadence,
+                    "offset_seconds": game.offset,
+                    "next_poll_in_seconds": round(max(0.0, game.next_poll - now), 3),
+                    "fetches_per_result": game.fetches_per_result(),
+                    "publish_delay_seconds": game.publish_delay(),
+                }
+                for game_type, game in self.games.items()
+            },
+        }
+
+
+poll_scheduler = PollScheduler(
+    settings.CRAWL_ADAPTIVE,
+    settings.CRAWL_MIN_INTERVAL,
+    settings.CRAWL_INTERVAL,
+    settings.CRAWL_ADAPTIVE_WINDOW,
+    settings.CRAWL_CADENCE_HISTORY,
+    GAME_TYPES,
+)
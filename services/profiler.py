@@ -0,0 +1,169 @@
+"""
+Opt-in sampling profiler for API requests and crawl cycles
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+class SamplingProfiler:
+    """Samples stacks of threads that are running profiled work.
+
+    Profiling is switched on at runtime for a fraction of API requests and/or
+    a number of crawl cycles. While a profiled request or cycle is in flight,
+    a background thread periodically captures the stack of the thread running
+    it and aggregates the samples as folded stacks (`a;b;c <count>`), the input
+    format of flamegraph.pl and speedscope.
+
+    Concurrent coroutines share the event-loop thread, so samples are tagged
+    with the active scope rather than attributed to one specific request.
+    When disabled the hot-path cost is a single attribute check.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64, max_stacks: int = 20000):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.request_sample_rate = 0.0
+        self.crawl_cycles_remaining = 0
+        self.samples: Counter = Counter()
+        self.total_samples = 0
+        self.dropped_samples = 0
+        self.started_at: Optional[float] = None
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.request_sample_rate > 0 or self.crawl_cycles_remaining > 0
+
+    def configure(self, request_sample_rate: Optional[float] = None, crawl_cycles: Optional[int] = None,
+                  interval: Optional[float] = None):
+        """Enable or adjust profiling at runtime"""
+        if request_sample_rate is not None:
+            self.request_sample_rate = min(max(request_sample_rate, 0.0), 1.0)
+        if crawl_cycles is not None:
+            self.crawl_cycles_remaining = max(crawl_cycles, 0)
+        if interval is not None:
+            self.interval = max(interval, 0.001)
+        if self.enabled and self.started_at is None:
+            self.started_at = time.time()
+        logger.info(
+            f"Profiler configured: request_sample_rate={self.request_sample_rate}, "
+            f"crawl_cycles={self.crawl_cycles_remaining}, interval={self.interval}s"
+        )
+
+    def disable(self):
+        """Stop selecting new work for profiling (in-flight scopes finish normally)"""
+        self.request_sample_rate = 0.0
+        self.crawl_cycles_remaining = 0
+
+    def reset(self):
+        """Drop all collected samples"""
+        with self._lock:
+            self.samples = Counter()
+            self.total_samples = 0
+            self.dropped_samples = 0
+            self.started_at = time.time() if self.enabled else None
+
+    def should_profile_request(self) -> bool:
+        rate = self.request_sample_rate
+        return rate > 0 and (rate >= 1.0 or random.random() < rate)
+
+    def should_profile_crawl_cycle(self) -> bool:
+        if self.crawl_cycles_remaining <= 0:
+            return False
+        self.crawl_cycles_remaining -= 1
+        return True
+
+    @contextmanager
+    def profile(self, scope: str):
+        """Sample the current thread while the block runs"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active.setdefault(thread_id, Counter())[scope] += 1
+            self._ensure_thread()
+        self._wakeup.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                scopes = self._active[thread_id]
+                scopes[scope] -= 1
+                if scopes[scope] <= 0:
+                    del scopes[scope]
+                if not scopes:
+                    del self._active[thread_id]
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                targets = {thread_id: "+".join(sorted(scopes)) for thread_id, scopes in self._active.items()}
+                if not targets:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, scope in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(scope, frame)
+            del frames
+            time.sleep(self.interval)
+
+    def _record(self, scope: str, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(scope)
+        folded = ";".join(reversed(stack))
+        with self._lock:
+            if folded not in self.samples and len(self.samples) >= self.max_stacks:
+                self.dropped_samples += 1
+                return
+            self.samples[folded] += 1
+            self.total_samples += 1
+
+    def folded(self, scope: Optional[str] = None) -> str:
+        """Render collected samples as folded stacks, heaviest first"""
+        with self._lock:
+            items = self.samples.most_common()
+        if scope:
+            items = [(stack, count) for stack, count in items if stack.split(";", 1)[0] == scope]
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> Dict:
+        with self._lock:
+            active_scopes = sum(sum(scopes.values()) for scopes in self._active.values())
+            distinct = len(self.samples)
+        return {
+            "enabled": self.enabled,
+            "request_sample_rate": self.request_sample_rate,
+            "crawl_cycles_remaining": self.crawl_cycles_remaining,
+            "interval_seconds": self.interval,
+            "active_scopes": active_scopes,
+            "total_samples": self.total_samples,
+            "distinct_stacks": distinct,
+            "dropped_samples": self.dropped_samples,
+            "started_at": self.started_at,
+        }
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
@@ -0,0 +1,172 @@
+"""
+LISTEN for new-result notifications and keep the latest results in memory
+
+With PostgreSQL the crawler NOTIFYs on every insert (see
+database.save_game_result). Each API worker, on any host, holds one asyncpg
+connection that LISTENs on that channel and keeps the latest N results per
+game, so /latest and /batch answer from memory and cached responses are
+dropped the moment a result lands instead of after a poll or TTL.
+"""
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import settings, GAME_TYPES
+from services.bloom import known_md5s
+from services.compression import response_cache
+from services.metrics import metrics
+
+NOTIFICATIONS_RECEIVED = metrics.counter(
+    "result_notifications_received_total", "New-result notifications received by this worker", ["game_type"]
+)
+LISTENER_CONNECTED = metrics.gauge(
+    "result_listener_connected", "1 while the LISTEN connection for new results is up"
+)
+LISTENER_RECONNECTS = metrics.counter(
+    "result_listener_reconnects_total", "LISTEN connection (re)establishments"
+)
+
+# How often the idle LISTEN connection is pinged so a dead TCP session is noticed
+KEEPALIVE_INTERVAL = 15
+MAX_BACKOFF = 30
+
+
+class ResultListener:
+    """Latest results per game, seeded from the DB and kept current by NOTIFY"""
+
+    def __init__(self, per_game: int):
+        self.per_game = per_game
+        self.results: Dict[str, List[Dict]] = {}  # newest first
+        self.ready = False
+        self.last_notification: Optional[float] = None
+        self._connection = None
+        self._running = False
+
+    async def run(self):
+        """Connect, LISTEN, seed and stay connected; cancel the task to stop"""
+        import asyncpg
+        from database import DATABASE_URL, RESULTS_CHANNEL
+
+        self._running = True
+        backoff = 1
+        # asyncpg takes a plain libpq-style DSN
+        dsn = DATABASE_URL.set(drivername="postgresql").render_as_string(hide_password=False)
+        while self._running:
+            closed = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(
+                    dsn, server_settings={"application_name": f"{settings.APP_NAME} listener"}
+                )
+                self._connection.add_termination_listener(lambda connection: closed.set())
+                await self._connection.add_listener(RESULTS_CHANNEL, self._on_notification)
+                # Seed after LISTEN so a result inserted in between is not lost
+                await self._seed()
+                LISTENER_CONNECTED.set(1)
+                LISTENER_RECONNECTS.inc()
+                backoff = 1
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), KEEPALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        await self._connection.execute("SELECT 1")
+                logger.warning("Result listener connection closed; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Result listener connection failed: {e}")
+            finally:
+                # Missed notifications are possible while disconnected; reseed on reconnect
+                self.ready = False
+                LISTENER_CONNECTED.set(0)
+                await self._close()
+            if self._running:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    async def stop(self):
+        self._running = False
+        await self._close()
+
+    async def _close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                await asyncio.wait_for(connection.close(), 5)
+            except Exception:
+                connection.terminate()
+
+    async def _seed(self):
+        from database import get_latest_results_batch
+
+        rows = await get_latest_results_batch({game_type: self.per_game for game_type in GAME_TYPES})
+        self.results = {game_type: [row.to_dict() for row in game_rows] for game_type, game_rows in rows.items()}
+        self.ready = True
+        response_cache.invalidate()
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            row = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Unreadable result notification: {payload[:200]}")
+            return
+        if row.get("truncated"):
+            # Too large for a NOTIFY payload; fetch the row itself
+            asyncio.get_running_loop().create_task(self._fetch(row["id"]))
+            return
+        self.add(row)
+
+    async def _fetch(self, result_id: int):
+        from database import get_result_by_id
+
+        try:
+            result = await get_result_by_id(result_id)
+        except Exception as e:
+            logger.warning(f"Could not fetch notified result {result_id}: {e}")
+            # The cache now misses a row; drop the connection so run() reseeds it
+            self.ready = False
+            if self._connection is not None:
+                self._connection.terminate()
+            return
+        if result is not None:
+            self.add(result.to_dict())
+
+    def add(self, row: Dict):
+        """Insert a newly announced result, keeping newest-first order and the size bound"""
+        game_type = row.get("game_type")
+        rows = self.results.setdefault(game_type, [])
+        if any(existing["id"] == row["id"] for existing in rows):
+            return  # Delivered by both the seed query and the notification
+        key = (row.get("timestamp") or "", row["id"])
+        position = 0
+        while position < len(rows) and (rows[position].get("timestamp") or "", rows[position]["id"]) > key:
+            position += 1
+        rows.insert(position, row)
+        del rows[self.per_game:]
+        known_md5s.add(row["result_md5"], row["id"])
+        self.last_notification = time.time()
+        NOTIFICATIONS_RECEIVED.labels(game_type).inc()
+        response_cache.invalidate()
+
+    def read(self, game_type: str, limit: int) -> Optional[List[Dict]]:
+        """Latest results from memory, or None when they may not cover the request"""
+        if not self.ready:
+            return None
+        rows = self.results.get(game_type, [])
+        # A full buffer may have more rows in the DB than it holds
+        if limit > len(rows) and len(rows) >= self.per_game:
+            return None
+        return rows[:limit]
+
+    def status(self) -> Dict:
+        return {
+            "connected": self._connection is not None and self.ready,
+            "results_cached": {game_type: len(rows) for game_type, rows in self.results.items()},
+            "last_notification": self.last_notification,
+        }
+
+
+# Global listener; run() is only started for PostgreSQL with DB_NOTIFY_ENABLED
+result_listener = ResultListener(settings.SNAPSHOT_RESULTS_PER_GAME)
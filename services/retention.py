@@ -0,0 +1,53 @@
+"""
+Retention of raw rows and per-minute rollups
+
+Raw game_results / api_logs rows and per-minute rollups older than their
+configured age are deleted in small batches; hourly rollups are kept, so
+time series stay answerable after the rows behind them are gone.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+RETENTION_DELETED = metrics.counter(
+    "retention_deleted_rows_total", "Rows deleted by retention", ["table"]
+)
+
+
+async def run_retention() -> Dict[str, int]:
+    """One retention pass; returns rows deleted per table"""
+    from database import APILog, APIRollup, GameResult, LatencySketch, ResultRollup, prune_rows_before
+
+    now = datetime.utcnow()
+    policies = [
+        (GameResult, settings.RESULTS_RETENTION_DAYS),
+        (APILog, settings.API_LOG_RETENTION_DAYS),
+        (ResultRollup, settings.ROLLUP_MINUTE_RETENTION_DAYS),
+        (APIRollup, settings.ROLLUP_MINUTE_RETENTION_DAYS),
+        (LatencySketch, settings.LATENCY_SKETCH_RETENTION_HOURS / 24),
+    ]
+    deleted = {}
+    for model, days in policies:
+        if days <= 0:
+            continue
+        count = await prune_rows_before(model, now - timedelta(days=days))
+        deleted[model.__tablename__] = count
+        RETENTION_DELETED.labels(model.__tablename__).inc(count)
+    if any(deleted.values()):
+        logger.info(f"Retention deleted {deleted}")
+    return deleted
+
+
+async def retention_loop():
+    """Run retention every RETENTION_INTERVAL seconds (crawler leader only)"""
+    while True:
+        try:
+            await run_retention()
+        except Exception as e:
+            logger.error(f"Retention pass failed: {e}")
+        await asyncio.sleep(settings.RETENTION_INTERVAL)
@@ -0,0 +1,105 @@
+"""
+DDSketch: mergeable quantile sketch with relative-error guarantees
+
+Values are counted in logarithmic bins, so any quantile is returned within
+`relative_accuracy` of the true value whatever the distribution, memory
+is bounded by the value range rather than by the number of values, and two
+sketches merge by adding bin counts (per-worker or per-minute sketches can
+be combined into any window without losing accuracy).
+"""
+import math
+from typing import Dict, Optional
+
+# Values at or below this (seconds) are counted as zero
+MIN_VALUE = 1e-9
+# Bins beyond this collapse the lowest ones together (only reachable with extreme ranges)
+MAX_BINS = 2048
+
+
+class DDSketch:
+    """Quantile sketch over positive values"""
+    __slots__ = ("relative_accuracy", "_log_gamma", "bins", "zero_count", "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1):
+        if value > MIN_VALUE:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + weight
+            if len(self.bins) > MAX_BINS:
+                self._collapse()
+        else:
+            self.zero_count += weight
+        self.count += weight
+        self.sum += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "DDSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > MAX_BINS:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - MAX_BINS + 1]
+        self.bins[excess[-1]] = sum(self.bins.pop(key) for key in excess[:-1]) + self.bins[excess[-1]]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0..1), or None for an empty sketch"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        gamma = math.exp(self._log_gamma)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Midpoint of the bin (gamma^(k-1), gamma^k] with relative error <= relative_accuracy
+                value = 2 * math.exp(key * self._log_gamma) / (gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "a": self.relative_accuracy,
+            "b": self.bins,
+            "z": self.zero_count,
+            "n": self.count,
+            "s": self.sum,
+            "lo": self.min if self.count else None,
+            "hi": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DDSketch":
+        sketch = cls(data["a"])
+        sketch.bins = {int(key): count for key, count in data["b"].items()}
+        sketch.zero_count = data["z"]
+        sketch.count = data["n"]
+        sketch.sum = data["s"]
+        if data["lo"] is not None:
+            sketch.min = data["lo"]
+            sketch.max = data["hi"]
+        return sketch
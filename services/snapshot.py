@@ -0,0 +1,237 @@
+"""
+Shared-memory snapshot of the latest results for multi-process serving
+
+The crawler leader publishes the latest N results per game into a
+memory-mapped file; API workers on the same host read it without locks,
+DB queries or RPC. Consistency uses a seqlock: the writer bumps the
+sequence to an odd value, writes the payload, then bumps it to the next
+even value. A reader that sees an odd sequence, or a different sequence
+after copying, retries. A CRC32 of the payload guards against torn reads
+of the header itself.
+
+The leader republishes at least every CRAWL_INTERVAL, even without new
+results of its own, which also picks up rows written by the importer or
+other hosts. Readers treat a snapshot older than STALE_AFTER_INTERVALS
+crawl intervals as a miss (its leader died, or the file was left by an
+earlier run) and fall back to the database.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings, GAME_TYPES
+from services.metrics import metrics
+
+MAGIC = b"68GS"
+FORMAT_VERSION = 1
+# magic, format version, sequence, payload length, payload crc32
+HEADER = struct.Struct("<4sIQII")
+SEQUENCE_OFFSET = 8
+LENGTH_OFFSET = 16
+MAX_READ_ATTEMPTS = 16
+STALE_AFTER_INTERVALS = 3
+
+SNAPSHOT_READS = metrics.counter(
+    "snapshot_reads_total", "Latest-results snapshot reads by outcome (hit, miss, stale, retry)", ["outcome"]
+)
+SNAPSHOT_PUBLISH_SECONDS = metrics.histogram(
+    "snapshot_publish_duration_seconds", "Time to rebuild and publish the latest-results snapshot"
+)
+SNAPSHOT_SEQUENCE = metrics.gauge("snapshot_sequence", "Sequence number of the last published snapshot")
+
+
+class SnapshotWriter:
+    """Single writer of the snapshot file (the crawler leader)"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = max(size, HEADER.size + 1024)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                # Growing in place would leave readers with a short mapping; swap in a new file
+                os.close(fd)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+                os.ftruncate(fd, self.size)
+                os.replace(tmp_path, path)
+            else:
+                self.size = os.fstat(fd).st_size
+            self._map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        magic, _, sequence, _, _ = HEADER.unpack_from(self._map, 0)
+        self.sequence = sequence + (sequence & 1) if magic == MAGIC else 0
+
+    @property
+    def capacity(self) -> int:
+        return self.size - HEADER.size
+
+    def publish(self, payload: bytes) -> int:
+        """Write a new payload and return its (even) sequence number"""
+        if len(payload) > self.capacity:
+            raise ValueError(f"Snapshot payload of {len(payload)} bytes exceeds capacity {self.capacity}")
+        self.sequence += 1
+        struct.pack_into("<Q", self._map, SEQUENCE_OFFSET, self.sequence)
+        self._map[HEADER.size:HEADER.size + len(payload)] = payload
+        struct.pack_into("<4sI", self._map, 0, MAGIC, FORMAT_VERSION)
+        struct.pack_into("<II", self._map, LENGTH_OFFSET, len(payload), zlib.crc32(payload))
+        # The even sequence goes last: readers unpack it before length and crc
+        self.sequence += 1
+        struct.pack_into("<Q", self._map, SEQUENCE_OFFSET, self.sequence)
+        return self.sequence
+
+    def close(self):
+        self._map.close()
+
+
+class SnapshotReader:
+    """Lock-free reader; decodes the payload only when the sequence changes"""
+
+    # How often to check whether the writer swapped in a new file
+    REOPEN_CHECK_INTERVAL = 1.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map: Optional[mmap.mmap] = None
+        self._inode: Optional[int] = None
+        self._checked_at = 0.0
+        self._cached: Optional[Tuple[int, Dict]] = None
+
+    def _open(self) -> bool:
+        now = time.monotonic()
+        if self._map is not None and now - self._checked_at < self.REOPEN_CHECK_INTERVAL:
+            return True
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._map is not None and stat.st_ino == self._inode:
+            return True
+        if stat.st_size < HEADER.size:
+            return False
+        with open(self.path, "rb") as snapshot_file:
+            new_map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map is not None:
+            self._map.close()
+        self._map, self._inode, self._cached = new_map, stat.st_ino, None
+        return True
+
+    def sequence(self) -> int:
+        """Sequence of the current snapshot without decoding it (0 if unavailable)"""
+        if not self._open():
+            return 0
+        magic, _, sequence, _, _ = HEADER.unpack_from(self._map, 0)
+        return sequence if magic == MAGIC else 0
+
+    def read(self) -> Optional[Tuple[int, Dict]]:
+        """Return (sequence, data) of the current snapshot, or None if unavailable"""
+        if not self._open():
+            return None
+        snapshot_map = self._map
+        for _ in range(MAX_READ_ATTEMPTS):
+            magic, version, sequence, length, crc = HEADER.unpack_from(snapshot_map, 0)
+            if magic != MAGIC or version != FORMAT_VERSION or sequence == 0:
+                return None
+            if self._cached is not None and self._cached[0] == sequence:
+                return self._cached
+            if sequence & 1 or not 0 < length <= len(snapshot_map) - HEADER.size:
+                SNAPSHOT_READS.labels("retry").inc()
+                continue
+            payload = snapshot_map[HEADER.size:HEADER.size + length]
+            if struct.unpack_from("<Q", snapshot_map, SEQUENCE_OFFSET)[0] != sequence or zlib.crc32(payload) != crc:
+                SNAPSHOT_READS.labels("retry").inc()
+                continue
+            self._cached = (sequence, json.loads(payload))
+            return self._cached
+        return None
+
+
+_writer: Optional[SnapshotWriter] = None
+_reader: Optional[SnapshotReader] = None
+_published_at = 0.0  # time.monotonic() of this process's last successful publish
+
+
+async def publish_latest_results():
+    """Rebuild the snapshot from the database (leader only, after new results)"""
+    global _writer, _published_at
+    if not settings.SNAPSHOT_ENABLED:
+        return
+    from database import get_latest_results
+
+    start = time.perf_counter()
+    try:
+        games = {}
+        for game_type in GAME_TYPES:
+            results = await get_latest_results(game_type=game_type, limit=settings.SNAPSHOT_RESULTS_PER_GAME)
+            games[game_type] = [result.to_dict() for result in results]
+        payload = json.dumps({
+            "generated_at": time.time(),
+            "limit": settings.SNAPSHOT_RESULTS_PER_GAME,
+            "games": games
+        }, separators=(",", ":")).encode()
+        if _writer is None:
+            _writer = SnapshotWriter(settings.SNAPSHOT_PATH, settings.SNAPSHOT_SIZE_BYTES)
+        SNAPSHOT_SEQUENCE.set(_writer.publish(payload))
+        _published_at = time.monotonic()
+    except Exception as e:
+        logger.error(f"Failed to publish latest-results snapshot: {e}")
+    finally:
+        SNAPSHOT_PUBLISH_SECONDS.observe(time.perf_counter() - start)
+
+
+async def keep_snapshot_fresh():
+    """Republish when nothing was published for CRAWL_INTERVAL (leader, every crawl loop turn)"""
+    if settings.SNAPSHOT_ENABLED and time.monotonic() - _published_at >= settings.CRAWL_INTERVAL:
+        await publish_latest_results()
+
+
+def _get_reader() -> SnapshotReader:
+    global _reader
+    if _reader is None:
+        _reader = SnapshotReader(settings.SNAPSHOT_PATH)
+    return _reader
+
+
+def snapshot_sequence() -> int:
+    """Current snapshot sequence; changes whenever the leader saves a new result"""
+    if not settings.SNAPSHOT_ENABLED:
+        return 0
+    try:
+        return _get_reader().sequence()
+    except Exception:
+        return 0
+
+
+def read_latest_results(game_type: str, limit: int) -> Optional[List[Dict]]:
+    """Latest results from the snapshot, or None when the caller must query the DB"""
+    if not settings.SNAPSHOT_ENABLED:
+        return None
+    try:
+        snapshot = _get_reader().read()
+    except Exception as e:
+        logger.debug(f"Snapshot read failed: {e}")
+        snapshot = None
+    if snapshot is None:
+        SNAPSHOT_READS.labels("miss").inc()
+        return None
+    data = snapshot[1]
+    if time.time() - data.get("generated_at", 0) > STALE_AFTER_INTERVALS * settings.CRAWL_INTERVAL:
+        # Not refreshed by a live leader: rows saved since are only in the database
+        SNAPSHOT_READS.labels("stale").inc()
+        return None
+    results = data["games"].get(game_type)
+    if results is None or (limit > data["limit"] and len(results) >= data["limit"]):
+        # Game missing, or the caller wants more rows than the snapshot keeps
+        SNAPSHOT_READS.labels("miss").inc()
+        return None
+    SNAPSHOT_READS.labels("hit").inc()
+    return results[:limit]
+
@@ -0,0 +1,293 @@
+"""
+Webhook fan-out to registered subscribers
+
+Each new result becomes one WebhookEvent: the JSON body is serialized once
+and signed once per distinct signing key (subscribers without their own
+secret share WEBHOOK_SECRET), then queued to every interested subscriber.
+Every subscriber has its own queue, worker task and retry/backoff state,
+so a slow or failing endpoint only delays its own events; all deliveries
+share one keep-alive connection pool (sharded by origin) and at most WEBHOOK_CONCURRENCY are
+in flight at once.
+
+Receivers verify `X-Webhook-Signature: sha256=<hex>`, the HMAC-SHA256 of
+`<X-Webhook-Timestamp>.<raw body>` under their secret.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+WEBHOOK_EVENTS = metrics.counter("webhook_events_total", "Events fanned out to webhook subscribers")
+WEBHOOK_DELIVERIES = metrics.counter(
+    "webhook_deliveries_total", "Subscriber deliveries by outcome (sent, retried, failed, dropped)", ["outcome"]
+)
+WEBHOOK_DELIVERY_SECONDS = metrics.histogram(
+    "webhook_delivery_duration_seconds", "Duration of single webhook delivery attempts"
+)
+WEBHOOK_SUBSCRIBERS = metrics.gauge("webhook_subscribers", "Active webhook subscribers with a delivery queue")
+WEBHOOK_QUEUED = metrics.gauge("webhook_queued_events", "Events waiting in subscriber queues")
+
+# Client errors worth retrying; other 4xx responses drop the event for that subscriber
+RETRYABLE_STATUS = {408, 425, 429}
+# Connections per pool shard (see WebhookDispatcher.client)
+CONNECTIONS_PER_SHARD = 16
+
+
+class WebhookEvent:
+    """One serialized payload shared by every subscriber it is queued to"""
+    __slots__ = ("id", "game_type", "timestamp", "body", "_headers")
+
+    def __init__(self, game_type: str, data: Dict):
+        self.id = uuid.uuid4().hex
+        self.game_type = game_type
+        self.timestamp = str(int(time.time()))
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+        self._headers: Dict[Optional[str], Dict[str, str]] = {}
+
+    def headers(self, key: Optional[str]) -> Dict[str, str]:
+        """Request headers for subscribers signing with `key` (computed once per key)"""
+        headers = self._headers.get(key)
+        if headers is None:
+            headers = {
+                "Content-Type": "application/json",
+                "X-Webhook-Id": self.id,
+                "X-Webhook-Timestamp": self.timestamp,
+            }
+            if key:
+                digest = hmac.new(key.encode(), self.timestamp.encode() + b"." + self.body, hashlib.sha256)
+                headers["X-Webhook-Signature"] = f"sha256={digest.hexdigest()}"
+            self._headers[key] = headers
+        return headers
+
+
+class SubscriberQueue:
+    """Pending events, worker task and retry state of one subscriber"""
+
+    def __init__(self, dispatcher: "WebhookDispatcher", subscriber):
+        self.dispatcher = dispatcher
+        self.id = subscriber.id
+        self.configure(subscriber)
+        self.queue: Deque[WebhookEvent] = deque()
+        self.in_flight: Optional[WebhookEvent] = None
+        self.sent = self.failed = self.dropped = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.retry_at: Optional[float] = None
+        self._ready = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    def configure(self, subscriber):
+        self.url = subscriber.url
+        self.key = subscriber.secret or settings.WEBHOOK_SECRET
+        self.game_types = set(subscriber.game_type_list)
+
+    def wants(self, game_type: str) -> bool:
+        return not self.game_types or game_type in self.game_types
+
+    def put(self, event: WebhookEvent):
+        if len(self.queue) >= settings.WEBHOOK_QUEUE_SIZE:
+            self.queue.popleft()
+            self.dropped += 1
+            WEBHOOK_DELIVERIES.labels("dropped").inc()
+        self.queue.append(event)
+        self._ready.set()
+
+    async def _run(self):
+        while True:
+            if not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            self.in_flight = event = self.queue.popleft()
+            try:
+                await self._deliver_with_retries(event)
+            finally:
+                self.in_flight = None
+
+    async def _deliver_with_retries(self, event: WebhookEvent):
+        for attempt in range(1, settings.WEBHOOK_MAX_ATTEMPTS + 1):
+            error, retryable, retry_after = await self.dispatcher.deliver(self.url, event, self.key)
+            if error is None:
+                self.sent += 1
+                self.consecutive_failures = 0
+                self.last_success_at = time.time()
+                self.retry_at = None
+                WEBHOOK_DELIVERIES.labels("sent").inc()
+                return
+            self.consecutive_failures += 1
+            self.last_error = error
+            if not retryable or attempt == settings.WEBHOOK_MAX_ATTEMPTS:
+                break
+            WEBHOOK_DELIVERIES.labels("retried").inc()
+            # Backoff grows with consecutive failures across events, so a dead endpoint is probed rarely
+            delay = min(settings.WEBHOOK_MAX_BACKOFF,
+                        settings.WEBHOOK_RETRY_BACKOFF * 2 ** (self.consecutive_failures - 1))
+            delay = max(delay, min(retry_after or 0.0, settings.WEBHOOK_MAX_BACKOFF))
+            self.retry_at = time.time() + delay
+            await asyncio.sleep(delay)
+        self.failed += 1
+        self.retry_at = None
+        WEBHOOK_DELIVERIES.labels("failed").inc()
+        logger.warning(f"Webhook {event.id} to subscriber {self.id} ({self.url}) failed: {self.last_error}")
+
+    def status(self) -> Dict:
+        return {
+            "id": self.id,
+            "url": self.url,
+            "queued": len(self.queue),
+            "in_flight": self.in_flight is not None,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+            "retry_at": self.retry_at,
+        }
+
+
+class WebhookDispatcher:
+    """Fans events out to the active subscribers in the registry"""
+
+    def __init__(self):
+        self.queues: Dict[int, SubscriberQueue] = {}
+        self._clients: List = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = asyncio.Lock()
+        self._loaded_at: Optional[float] = None
+        WEBHOOK_SUBSCRIBERS.labels().set_function(lambda: len(self.queues))
+        WEBHOOK_QUEUED.labels().set_function(lambda: sum(len(queue.queue) for queue in self.queues.values()))
+
+    def client(self, url: str):
+        """Pooled client for `url`, created (and httpx imported) on first delivery
+
+        The pool is split into shards by origin: httpcore rescans every
+        connection of a pool for each queued request, which turns quadratic
+        with hundreds of origins in one pool. Each origin always maps to the
+        same shard, so its keep-alive connections are reused.
+        """
+        if not self._clients:
+            import httpx
+
+            shards = max(1, math.ceil(settings.WEBHOOK_MAX_CONNECTIONS / CONNECTIONS_PER_SHARD))
+            per_shard = max(1, settings.WEBHOOK_MAX_CONNECTIONS // shards)
+            limits = httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard)
+            self._clients = [httpx.AsyncClient(timeout=settings.WEBHOOK_TIMEOUT, limits=limits) for _ in range(shards)]
+            self._semaphore = asyncio.Semaphore(settings.WEBHOOK_CONCURRENCY)
+        origin = urlsplit(url).netloc.encode()
+        return self._clients[zlib.crc32(origin) % len(self._clients)]
+
+    async def publish(self, game_type: str, data: Dict) -> Optional[WebhookEvent]:
+        """Queue `data` to every subscriber of `game_type` (None when nobody subscribes)"""
+        await self._refresh()
+        queues = [queue for queue in self.queues.values() if queue.wants(game_type)]
+        if not queues:
+            return None
+        event = WebhookEvent(game_type, data)
+        for queue in queues:
+            queue.put(event)
+        WEBHOOK_EVENTS.inc()
+        return event
+
+    async def deliver(self, url: str, event: WebhookEvent, key: Optional[str]) -> Tuple[Optional[str], bool, Optional[float]]:
+        """POST one event; returns (error or None, retryable, Retry-After seconds)"""
+        import httpx
+
+        client = self.client(url)
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, content=event.body, headers=event.headers(key))
+            except httpx.HTTPError as e:
+                return f"{type(e).__name__}: {e}", True, None
+            finally:
+                WEBHOOK_DELIVERY_SECONDS.labels().observe(time.perf_counter() - start)
+        if response.is_success:
+            return None, False, None
+        retryable = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS
+        retry_after = response.headers.get("Retry-After")
+        return (f"HTTP {response.status_code}", retryable,
+                float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+    def invalidate(self):
+        """Reload the registry before the next event (after a management change)"""
+        self._loaded_at = None
+
+    async def _refresh(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < settings.WEBHOOK_SUBSCRIBER_REFRESH:
+            return
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < settings.WEBHOOK_SUBSCRIBER_REFRESH:
+                return
+            from database import list_webhook_subscribers
+
+            try:
+                subscribers = await list_webhook_subscribers(active_only=True)
+            except Exception as e:
+                logger.warning(f"Could not load webhook subscribers, keeping the current set: {e}")
+                self._loaded_at = time.monotonic()
+                return
+            self._apply(subscribers)
+            self._loaded_at = time.monotonic()
+
+    def _apply(self, subscribers: List):
+        current = {subscriber.id: subscriber for subscriber in subscribers}
+        for subscriber_id in [subscriber_id for subscriber_id in self.queues if subscriber_id not in current]:
+            # Removed or deactivated: its pending events are discarded
+            self.queues.pop(subscriber_id).task.cancel()
+        for subscriber_id, subscriber in current.items():
+            if subscriber_id in self.queues:
+                self.queues[subscriber_id].configure(subscriber)
+            else:
+                self.queues[subscriber_id] = SubscriberQueue(self, subscriber)
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait until every queue is empty and idle; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while any(queue.queue or queue.in_flight for queue in self.queues.values()):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def close(self):
+        """Stop every worker and close the connection pool (pending events are discarded)"""
+        tasks = [queue.task for queue in self.queues.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.queues.clear()
+        self._loaded_at = None
+        clients, self._clients = self._clients, []
+        for client in clients:
+            await client.aclose()
+
+    def status(self) -> Dict:
+        return {
+            "subscribers": len(self.queues),
+            "queued": sum(len(queue.queue) for queue in self.queues.values()),
+            "concurrency": settings.WEBHOOK_CONCURRENCY,
+            "max_connections": settings.WEBHOOK_MAX_CONNECTIONS,
+            "registry_age_seconds": time.monotonic() - self._loaded_at if self._loaded_at is not None else None,
+        }
+
+    def subscriber_status(self, subscriber_id: int) -> Optional[Dict]:
+        queue = self.queues.get(subscriber_id)
+        return queue.status() if queue else None
+
+
+# Global dispatcher (deliveries run in the process that saves results)
+webhook_dispatcher = WebhookDispatcher()
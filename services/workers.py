@@ -0,0 +1,188 @@
+"""
+Worker pools for CPU-bound work that would otherwise stall the event loop
+
+Parsing an upstream page (BeautifulSoup, regex scans over a page source
+of several megabytes) or decoding a thousand stored payloads holds the
+GIL for tens of milliseconds. Running inline, it delays every API
+request this process is serving by that long. The pools move such work
+off the loop:
+
+    process   WORKER_PROCESSES spawned processes, for pure-Python work
+              (HTML/JSON parsing, bulk json.loads); arguments and results
+              are pickled, so functions must be module-level
+    thread    WORKER_THREADS threads, for work that releases the GIL
+              (hashlib on large buffers, zlib)
+
+    data = await worker_pool.run_in_process(parsing.parse_body, content, encoding, game_type, size=len(content))
+    digest = await worker_pool.run_in_thread(hashlib.blake2b, content, size=len(content))
+
+`size` is the input size in bytes. Inputs under WORKER_OFFLOAD_MIN_BYTES
+run inline, because the hop to a worker costs more than the work.
+Inputs over WORKER_MAX_INPUT_BYTES are refused with WorkerInputTooLarge.
+At most WORKER_MAX_PENDING tasks per pool are queued or running; further
+callers wait for a slot. Worker processes are replaced after
+WORKER_MAX_TASKS_PER_CHILD tasks, which bounds parser memory growth.
+A pool whose process died is rebuilt and the task re-run inline.
+
+start() creates the pools and warms every process up (imports and a
+small parse), so the first crawl does not pay for process start-up.
+Before start(), or with a pool size of 0, work runs inline.
+"""
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from config import settings
+from services.metrics import metrics
+
+WORKER_TASKS_TOTAL = metrics.counter(
+    "worker_tasks_total", "CPU-bound tasks by pool and outcome (offloaded, inline, rejected, error)",
+    ["pool", "outcome"]
+)
+WORKER_TASK_SECONDS = metrics.histogram(
+    "worker_task_duration_seconds", "Time from submitting an offloaded task to its result", ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+WORKER_PENDING = metrics.gauge("worker_pending_tasks", "Offloaded tasks queued or running", ["pool"])
+
+POOLS = ("process", "thread")
+
+
+class WorkerInputTooLarge(ValueError):
+    """Input over WORKER_MAX_INPUT_BYTES"""
+
+
+def loads_many(texts: List[Optional[str]]) -> List[Any]:
+    """json.loads of each text; empty or invalid texts become {} (stored result payloads)"""
+    decoded = []
+    for text in texts:
+        try:
+            decoded.append(json.loads(text) if text else {})
+        except ValueError:
+            decoded.append({})
+    return decoded
+
+
+def _warm_up() -> bool:
+    from crawler import parsing
+
+    return parsing.warm_up()
+
+
+class WorkerPool:
+    """Process and thread pools behind a small async API"""
+
+    def __init__(self, processes: int, threads: int, max_pending: int, offload_min_bytes: int,
+                 max_input_bytes: int, max_tasks_per_child: int):
+        self.processes = processes
+        self.threads = threads
+        self.offload_min_bytes = offload_min_bytes
+        self.max_input_bytes = max_input_bytes
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_pending = max_pending
+        self.executors: Dict[str, Optional[Any]] = {pool: None for pool in POOLS}
+        self.pending: Dict[str, int] = {pool: 0 for pool in POOLS}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.warm_up_seconds: Optional[float] = None
+        for pool in POOLS:
+            WORKER_PENDING.labels(pool).set_function(lambda pool=pool: self.pending[pool])
+
+    def _process_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs an event loop and logging threads is unsafe,
+        # and max_tasks_per_child needs a non-fork start method
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+
+    async def start(self):
+        """Create the pools and warm up every worker process"""
+        self._slots = {pool: asyncio.Semaphore(self.max_pending) for pool in POOLS}
+        if self.threads:
+            self.executors["thread"] = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="cpu-worker")
+        if self.processes:
+            self.executors["process"] = self._process_executor()
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            try:
+                # One task per process; every submit with no idle process spawns one
+                await asyncio.gather(*(
+                    loop.run_in_executor(self.executors["process"], _warm_up) for _ in range(self.processes)
+                ))
+                self.warm_up_seconds = time.perf_counter() - start
+                logger.info(f"Worker pool: {self.processes} processes warmed up in {self.warm_up_seconds:.2f}s, "
+                            f"{self.threads} threads")
+            except Exception as e:
+                logger.warning(f"Worker process warm-up failed, parsing runs inline: {e}")
+                self.executors["process"].shutdown(wait=False, cancel_futures=True)
+                self.executors["process"] = None
+
+    async def close(self):
+        for pool, executor in self.executors.items():
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executors[pool] = None
+
+    async def run_in_process(self, function: Callable, *args, size: int = 0):
+        """function(*args) in a worker process; `function` and its arguments must be picklable"""
+        return await self._run("process", function, args, size)
+
+    async def run_in_thread(self, function: Callable, *args, size: int = 0):
+        """function(*args) in a worker thread (for work that releases the GIL)"""
+        return await self._run("thread", function, args, size)
+
+    async def _run(self, pool: str, function: Callable, args: tuple, size: int):
+        if self.max_input_bytes and size > self.max_input_bytes:
+            WORKER_TASKS_TOTAL.labels(pool, "rejected").inc()
+            raise WorkerInputTooLarge(
+                f"{getattr(function, '__name__', function)} input of {size} bytes is over {self.max_input_bytes}"
+            )
+        executor = self.executors[pool]
+        if executor is None or size < self.offload_min_bytes:
+            WORKER_TASKS_TOTAL.labels(pool, "inline").inc()
+            return function(*args)
+
+        async with self._slots[pool]:
+            self.pending[pool] += 1
+            start = time.perf_counter()
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory): replace the pool, do this task here
+                logger.warning(f"Worker process pool broken while running {getattr(function, '__name__', function)}; "
+                               f"restarting it")
+                WORKER_TASKS_TOTAL.labels(pool, "error").inc()
+                if self.executors[pool] is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executors[pool] = self._process_executor()
+                return function(*args)
+            finally:
+                self.pending[pool] -= 1
+            WORKER_TASK_SECONDS.labels(pool).observe(time.perf_counter() - start)
+            WORKER_TASKS_TOTAL.labels(pool, "offloaded").inc()
+            return result
+
+    def status(self) -> Dict:
+        return {
+            "processes": self.processes if self.executors["process"] is not None else 0,
+            "threads": self.threads if self.executors["thread"] is not None else 0,
+            "pending": dict(self.pending),
+            "warm_up_seconds": round(self.warm_up_seconds, 3) if self.warm_up_seconds is not None else None,
+        }
+
+
+worker_pool = WorkerPool(
+    settings.WORKER_PROCESSES,
+    settings.WORKER_THREADS,
+    settings.WORKER_MAX_PENDING,
+    settings.WORKER_OFFLOAD_MIN_BYTES,
+    settings.WORKER_MAX_INPUT_BYTES,
+    settings.WORKER_MAX_TASKS_PER_CHILD,
+)
@@ -0,0 +1,207 @@
+"""
+Test script for admission control (services/admission.py), driving the controller directly
+"""
+import asyncio
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.admission import HIGH, LOW, NORMAL, AdmissionController, AdmissionMiddleware
+
+
+def _controller(limit: int = 1, queue_size: int = 2, queue_timeout: float = 5.0,
+                low_priority_share: float = 1.0) -> AdmissionController:
+    return AdmissionController(limit, queue_size, queue_timeout, low_priority_share, [])
+
+
+async def _settle():
+    """Let queued acquire() calls reach their wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_full_queue_evicts_newest_low():
+    """A full queue evicts the newest LOW waiter for a HIGH arrival, and the freed slot goes to HIGH"""
+    async def run():
+        controller = _controller(limit=1, queue_size=2)
+        assert await controller.acquire(NORMAL) is None
+        older = asyncio.create_task(controller.acquire(LOW))
+        newer = asyncio.create_task(controller.acquire(LOW))
+        await _settle()
+        high = asyncio.create_task(controller.acquire(HIGH))
+        await _settle()
+        assert await newer == "evicted"
+        assert not older.done() and not high.done()
+
+        controller.release(NORMAL)
+        assert await high is None
+        assert not older.done()
+        controller.release(HIGH)
+        assert await older is None
+        controller.release(LOW)
+        return controller.status()
+
+    status = asyncio.run(run())
+    print(f"  Status after draining: {status}")
+    assert status["active"] == 0 and status["shed"] == {"low:evicted": 1}
+
+
+def test_queue_full_without_lower_priority():
+    """A full queue with nothing less important to evict sheds the arrival"""
+    async def run():
+        controller = _controller(limit=1, queue_size=1)
+        assert await controller.acquire(NORMAL) is None
+        queued = asyncio.create_task(controller.acquire(HIGH))
+        await _settle()
+        reason = await controller.acquire(HIGH)
+        controller.release(NORMAL)
+        assert await queued is None
+        controller.release(HIGH)
+        return reason
+
+    assert asyncio.run(run()) == "queue_full"
+
+
+def test_timeout_gets_503_with_retry_after():
+    """A request that waits longer than the queue timeout gets a 503 with Retry-After"""
+    async def run():
+        controller = _controller(limit=1, queue_timeout=0.05)
+        assert await controller.acquire(NORMAL) is None
+
+        async def app(scope, receive, send):
+            raise AssertionError("a shed request must not reach the application")
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = AdmissionMiddleware(app, controller)
+        await middleware({"type": "http", "path": "/api/v1/games/tai_xiu/latest"}, None, send)
+        controller.release(NORMAL)
+        return sent, controller
+
+    sent, controller = asyncio.run(run())
+    start, body = sent
+    headers = dict(start["headers"])
+    print(f"  Response: {start['status']} Retry-After {headers[b'retry-after'].decode()} {body['body'].decode()}")
+    assert start["status"] == 503
+    assert int(headers[b"retry-after"]) >= 1
+    assert b'"timeout"' in body["body"]
+    assert controller.status()["queued"]["high"] == 0 and controller.active == 0
+
+
+def test_cancelled_waiter_returns_granted_slot():
+    """A waiter cancelled after it was granted a slot gives the slot back"""
+    async def run():
+        controller = _controller(limit=1)
+        assert await controller.acquire(NORMAL) is None
+        waiter = asyncio.create_task(controller.acquire(NORMAL))
+        await _settle()
+        # The slot is handed over, then the client goes away before the waiter resumes
+        controller.release(NORMAL)
+        assert controller.active == 1
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.active == 0 and controller.queued() == 0, controller.status()
+
+
+def test_cancelled_waiter_leaves_queue():
+    """A waiter cancelled before it got a slot leaves the queue without touching the slots"""
+    async def run():
+        controller = _controller(limit=1)
+        assert await controller.acquire(NORMAL) is None
+        waiter = asyncio.create_task(controller.acquire(LOW))
+        await _settle()
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        queued = controller.queued()
+        controller.release(NORMAL)
+        return queued, controller
+
+    queued, controller = asyncio.run(run())
+    assert queued == 0 and controller.active == 0
+
+
+def test_low_priority_share():
+    """LOW requests hold at most their share of the slots; other priorities still start"""
+    async def run():
+        controller = _controller(limit=4, queue_size=4, low_priority_share=0.5)
+        assert [await controller.acquire(LOW) for _ in range(2)] == [None, None]
+        third = asyncio.create_task(controller.acquire(LOW))
+        await _settle()
+        assert not third.done() and controller.active == 2
+        assert await controller.acquire(NORMAL) is None
+        controller.release(LOW)
+        assert await third is None
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.active == 3 and controller.active_low == 2
+
+
+def test_retry_after():
+    """Retry-After grows with the queue depth and service time, from 1 to 30 seconds"""
+    async def run():
+        controller = _controller(limit=2, queue_size=10)
+        controller.service_time = 0.5
+        assert await controller.acquire(NORMAL) is None and await controller.acquire(NORMAL) is None
+        empty = controller.retry_after()
+        waiters = [asyncio.create_task(controller.acquire(NORMAL)) for _ in range(7)]
+        await _settle()
+        queued = controller.retry_after()
+        controller.service_time = 100.0
+        capped = controller.retry_after()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return empty, queued, capped
+
+    empty, queued, capped = asyncio.run(run())
+    print(f"  Retry-After: empty {empty}s, 7 queued {queued}s, slow service {capped}s")
+    assert (empty, queued, capped) == (1, 2, 30)
+
+
+def main():
+    """Run all admission control tests"""
+    print("🚀 Starting Admission Control Tests")
+    print("=" * 50)
+
+    tests = [
+        test_full_queue_evicts_newest_low,
+        test_queue_full_without_lower_priority,
+        test_timeout_gets_503_with_retry_after,
+        test_cancelled_waiter_returns_granted_slot,
+        test_cancelled_waiter_leaves_queue,
+        test_low_priority_share,
+        test_retry_after,
+    ]
+
+    failed = 0
+    for test in tests:
+        print(f"🔍 {test.__doc__}...")
+        try:
+            test()
+            print("✅ Passed")
+        except Exception as e:
+            failed += 1
+            print(f"❌ Test {test.__name__} failed: {e!r}")
+        print()
+
+    print("=" * 50)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Test script for result deduplication: fallback rounds and the MD5 Bloom filter
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# A throwaway database, before anything reads the settings
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_dedup.db")
+os.environ.setdefault("SNAPSHOT_ENABLED", "false")
+
+from crawler import parsing
+from services.bloom import BloomFilter
+
+GAME_TYPE = "tai_xiu"
+
+
+async def _stored_rows() -> int:
+    from database import get_latest_results
+    return len(await get_latest_results(game_type=GAME_TYPE, limit=100))
+
+
+def test_unchanged_page_polls():
+    """Repeated polls of an unchanged page store one row; a value seen before is stored again after another"""
+    from crawler.game_crawler import GameCrawler
+    from database import init_database
+
+    async def run():
+        await init_database()
+        crawler = GameCrawler()
+        stored = []
+        for text in ["Result 12", "Result 12", "Result 12", "Result 7", "Result 12", "Result 12"]:
+            await crawler._process_game_result(GAME_TYPE, crawler._create_game_data_from_text(text, GAME_TYPE))
+            stored.append(await _stored_rows())
+        return stored
+
+    stored = asyncio.run(run())
+    print(f"  Rows after each poll: {stored}")
+    assert stored == [1, 1, 1, 2, 3, 3], stored
+
+
+def test_fallback_md5_is_stable():
+    """The page-text fallback gives an unchanged page the same MD5 on every parse"""
+    html = "<html><body><p>result: tai</p></body></html>"
+    first = parsing.parse_html_for_game_data(html, GAME_TYPE)
+    second = parsing.parse_html_for_game_data(html, GAME_TYPE)
+    print(f"  MD5s: {first['result_md5']} {second['result_md5']}")
+    assert first[parsing.FALLBACK_FIELD] and first["result_md5"] == second["result_md5"]
+
+
+def test_bloom_filter():
+    """No false negatives after add, and a false-positive rate near the configured one"""
+    capacity, error_rate = 20_000, 0.01
+    bloom = BloomFilter(capacity, error_rate)
+    added = [parsing.generate_md5(f"stored-{i}") for i in range(capacity)]
+    for md5 in added:
+        bloom.add(md5)
+    assert all(md5 in bloom for md5 in added), "false negative"
+
+    probes = 100_000
+    false_positives = sum(parsing.generate_md5(f"absent-{i}") in bloom for i in range(probes))
+    rate = false_positives / probes
+    print(f"  False-positive rate at capacity: {rate:.4f} (target {error_rate})")
+    assert error_rate / 2 <= rate <= error_rate * 1.5, rate
+
+
+def main():
+    """Run all deduplication tests"""
+    print("🚀 Starting Deduplication Tests")
+    print("=" * 50)
+
+    tests = [
+        test_unchanged_page_polls,
+        test_fallback_md5_is_stable,
+        test_bloom_filter,
+    ]
+
+    failed = 0
+    for test in tests:
+        print(f"🔍 {test.__doc__}...")
+        try:
+            test()
+            print("✅ Passed")
+        except Exception as e:
+            failed += 1
+            print(f"❌ Test {test.__name__} failed: {e!r}")
+        print()
+
+    print("=" * 50)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
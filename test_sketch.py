@@ -0,0 +1,136 @@
+"""
+Test script for the DDSketch quantile sketch (services/sketch.py)
+"""
+import json
+import os
+import random
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.sketch import MAX_BINS, DDSketch
+
+QUANTILES = (0.0, 0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1.0)
+
+
+def _latencies(count: int, seed: int = 7):
+    """Seeded latency-like values: log-normal around 20 ms, with some zeros"""
+    generator = random.Random(seed)
+    return [0.0 if generator.random() < 0.01 else generator.lognormvariate(-4, 1.2) for _ in range(count)]
+
+
+def _sketch(values, relative_accuracy: float = 0.01) -> DDSketch:
+    sketch = DDSketch(relative_accuracy)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def _check_quantiles(sketch: DDSketch, values):
+    ordered = sorted(values)
+    worst = 0.0
+    for q in QUANTILES:
+        exact = ordered[int(q * (len(ordered) - 1))]
+        estimate = sketch.quantile(q)
+        if exact == 0:
+            assert estimate == 0, (q, estimate)
+            continue
+        error = abs(estimate - exact) / exact
+        worst = max(worst, error)
+        assert error <= sketch.relative_accuracy + 1e-9, (q, exact, estimate)
+    return worst
+
+
+def test_quantiles_within_relative_accuracy():
+    """Quantiles stay within relative_accuracy of the exact ones"""
+    values = _latencies(50_000)
+    for relative_accuracy in (0.01, 0.05):
+        sketch = _sketch(values, relative_accuracy)
+        worst = _check_quantiles(sketch, values)
+        print(f"  relative_accuracy {relative_accuracy}: worst error {worst:.4f}, {len(sketch.bins)} bins")
+        assert sketch.count == len(values)
+    assert DDSketch().quantile(0.5) is None
+
+
+def test_merge_preserves_counts():
+    """Merging per-worker sketches gives the sketch of all values"""
+    values = _latencies(30_000)
+    whole = _sketch(values)
+    merged = DDSketch()
+    for part in range(3):
+        merged.merge(_sketch(values[part::3]))
+    assert merged.bins == whole.bins and merged.zero_count == whole.zero_count
+    assert merged.count == whole.count == len(values)
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+    assert abs(merged.sum - whole.sum) < 1e-6
+    _check_quantiles(merged, values)
+
+    try:
+        merged.merge(DDSketch(0.05))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("merged sketches with different relative accuracy")
+
+
+def test_collapse_preserves_counts():
+    """Past MAX_BINS the lowest bins collapse: counts are kept and upper quantiles stay accurate"""
+    generator = random.Random(11)
+    values = [10 ** generator.uniform(-8, 30) for _ in range(20_000)]
+    sketch = _sketch(values)
+    print(f"  {len(sketch.bins)} bins after collapsing (max {MAX_BINS})")
+    assert len(sketch.bins) <= MAX_BINS
+    assert sketch.count == sum(sketch.bins.values()) + sketch.zero_count == len(values)
+
+    ordered = sorted(values)
+    for q in (0.75, 0.9, 0.99, 1.0):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= sketch.relative_accuracy * exact, q
+
+
+def test_dict_round_trip():
+    """to_dict/from_dict through JSON keeps bins, counts and quantiles"""
+    values = _latencies(10_000)
+    sketch = _sketch(values)
+    restored = DDSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.bins == sketch.bins
+    assert (restored.count, restored.zero_count, restored.sum) == (sketch.count, sketch.zero_count, sketch.sum)
+    assert (restored.min, restored.max) == (sketch.min, sketch.max)
+    assert [restored.quantile(q) for q in QUANTILES] == [sketch.quantile(q) for q in QUANTILES]
+
+    empty = DDSketch.from_dict(json.loads(json.dumps(DDSketch().to_dict())))
+    assert empty.count == 0 and empty.quantile(0.5) is None
+    empty.merge(restored)
+    assert empty.count == sketch.count and (empty.min, empty.max) == (sketch.min, sketch.max)
+
+
+def main():
+    """Run all sketch tests"""
+    print("🚀 Starting Sketch Tests")
+    print("=" * 50)
+
+    tests = [
+        test_quantiles_within_relative_accuracy,
+        test_merge_preserves_counts,
+        test_collapse_preserves_counts,
+        test_dict_round_trip,
+    ]
+
+    failed = 0
+    for test in tests:
+        print(f"🔍 {test.__doc__}...")
+        try:
+            test()
+            print("✅ Passed")
+        except Exception as e:
+            failed += 1
+            print(f"❌ Test {test.__name__} failed: {e!r}")
+        print()
+
+    print("=" * 50)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()